@@ -3,17 +3,20 @@ Authentication API routes for URL shortener service.
 """
 from fastapi import APIRouter, Depends, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 import logging
+import time
 
-import crud
+import crud_async
 import schemas
-from database import get_db
+from database import get_async_db
 from config import settings
-from .exceptions import AuthenticationError
+from utils.cache import MISSING, TTLCache
+from utils.password_hashing import PasswordHashingBusy
+from .exceptions import AuthenticationError, ServiceUnavailableError
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +24,10 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/auth", tags=["authentication"])
 security = HTTPBearer()
 
+# 検証済みトークンのキャッシュ（署名部 → ユーザーのemail）
+# 署名は header.payload に対するHMACのため、署名を知る＝元のトークンを持つことになる
+token_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """アクセストークン作成"""
@@ -34,10 +41,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    """現在のユーザーを取得"""
+def _verify_token(token: str) -> str:
+    """JWTを検証してユーザーのemailを返す（検証結果はトークンの有効期限内でキャッシュ）"""
+    signature = token.rpartition(".")[2]
+    email = token_cache.get(signature)
+    if email is not MISSING:
+        return email
+    
     try:
-        payload = jwt.decode(credentials.credentials, settings.secret_key, algorithms=[settings.algorithm])
+        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         email: str = payload.get("sub")
         if email is None:
             raise AuthenticationError("トークンに有効なユーザー情報が含まれていません")
@@ -47,7 +59,18 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             details={"jwt_error": str(e)} if settings.debug else None
         )
     
-    user = crud.get_user_by_email(db, email=email)
+    ttl = settings.auth_cache_ttl
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    if ttl > 0:
+        token_cache.set(signature, email, ttl=ttl)
+    return email
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_async_db)):
+    """現在のユーザーを取得（キャッシュヒット時はDBにアクセスしない）"""
+    email = _verify_token(credentials.credentials)
+    user = await crud_async.get_cached_user(db, email=email)
     if user is None:
         raise AuthenticationError(
             "ユーザーが見つかりません",
@@ -57,11 +80,15 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
 
 
 @router.post("/login", response_model=schemas.Token)
-async def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(user: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
     """ユーザーログイン"""
     logger.info(f"Login attempt for email: {user.email}")
     
-    db_user = crud.authenticate_user(db, user.email, user.password)
+    try:
+        db_user = await crud_async.authenticate_user(db, user.email, user.password)
+    except PasswordHashingBusy:
+        logger.warning(f"Password hashing queue is full, rejecting login for email: {user.email}")
+        raise ServiceUnavailableError("ログインが混み合っています。しばらくしてから再度お試しください")
     if not db_user:
         logger.warning(f"Failed login attempt for email: {user.email}")
         raise AuthenticationError(
@@ -0,0 +1,39 @@
+"""
+Debug API routes for URL shortener service (SQL profiles).
+"""
+from fastapi import APIRouter, Depends, Query
+import logging
+
+from utils.sql_profiler import profile_history
+from .auth import get_current_user
+from .exceptions import NotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Create debug router
+router = APIRouter(prefix="/debug", tags=["debug"])
+
+
+@router.get("/sql-profiles")
+async def list_sql_profiles(
+    limit: int = Query(20, ge=1, le=200),
+    current_user = Depends(get_current_user)
+):
+    """直近のSQLプロファイル一覧（認証必須、新しい順・SQL本文なし）"""
+    profiles = profile_history.recent(limit)
+    return {"profiles": [profile.to_dict(include_statements=False) for profile in profiles]}
+
+
+@router.get("/sql-profiles/{profile_id}")
+async def get_sql_profile(
+    profile_id: str,
+    current_user = Depends(get_current_user)
+):
+    """SQLプロファイル詳細（認証必須、X-SQL-Profile-Id ヘッダーのIDを指定）"""
+    profile = profile_history.get(profile_id)
+    if profile is None:
+        raise NotFoundError(
+            "指定されたSQLプロファイルが見つかりません",
+            details={"profile_id": profile_id}
+        )
+    return profile.to_dict()
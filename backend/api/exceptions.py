@@ -104,6 +104,18 @@ class DatabaseError(BaseAPIException):
         )
 
 
+class ServiceUnavailableError(BaseAPIException):
+    """サービス一時利用不可エラー"""
+    
+    def __init__(self, message: str = "サービスが混み合っています。しばらくしてから再度お試しください", details: Optional[Dict[str, Any]] = None):
+        super().__init__(
+            message=message,
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            error_code="SERVICE_UNAVAILABLE",
+            details=details
+        )
+
+
 def create_error_response(
     error: BaseAPIException,
     request: Request,
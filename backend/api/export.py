@@ -0,0 +1,174 @@
+"""
+Click history export API routes for URL shortener service.
+"""
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional, Sequence
+import csv
+import io
+import json
+import logging
+import zlib
+
+import crud_async
+from database import AsyncSessionLocal, get_async_db
+from config import settings
+from utils.packed_ip import unpack_ip
+from .auth import get_current_user
+from .exceptions import ValidationError, NotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Create export router
+router = APIRouter(prefix="/export", tags=["export"])
+
+# 日本時間（夏時間がないため固定オフセットで変換し、行ごとのpytz変換を避ける）
+JST = timezone(timedelta(hours=9))
+
+EXPORT_COLUMNS = ("id", "url_id", "short_code", "clicked_at", "user_agent", "ip_address", "referrer")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """期間指定をDB格納形式（タイムゾーンなしUTC）に変換する（タイムゾーンなしはJSTとして扱う）"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=JST)
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _format_clicked_at(clicked_at: Optional[datetime]) -> Optional[str]:
+    """クリック日時をJSTのISO 8601文字列にする"""
+    if clicked_at is None:
+        return None
+    if clicked_at.tzinfo is None:
+        clicked_at = clicked_at.replace(tzinfo=timezone.utc)
+    return clicked_at.astimezone(JST).isoformat()
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Accept-Encoding がgzipを許容するか（q=0 は拒否、gzip の指定がなければ * に従う）"""
+    qualities = {}
+    for part in accept_encoding.lower().split(","):
+        coding, *params = (token.strip() for token in part.split(";"))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def _csv_chunk(rows: Sequence, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow((
+            row.id, row.url_id, row.short_code, _format_clicked_at(row.clicked_at),
+            row.user_agent, unpack_ip(row.ip), row.referrer,
+        ))
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(rows: Sequence) -> str:
+    return "".join(
+        json.dumps({
+            "id": row.id,
+            "url_id": row.url_id,
+            "short_code": row.short_code,
+            "clicked_at": _format_clicked_at(row.clicked_at),
+            "user_agent": row.user_agent,
+            "ip_address": unpack_ip(row.ip),
+            "referrer": row.referrer,
+        }, ensure_ascii=False) + "\n"
+        for row in rows
+    )
+
+
+async def _export_chunks(
+    export_format: str,
+    url_id: Optional[int],
+    start: Optional[datetime],
+    end: Optional[datetime],
+    compress: bool,
+) -> AsyncIterator[bytes]:
+    """クリック履歴をチャンク単位で整形し、必要に応じてgzip圧縮して返す"""
+    compressor = zlib.compressobj(settings.export_gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    exported = 0
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    if export_format == "csv":
+        yield encode(_csv_chunk((), header=True))
+
+    # レスポンス送信中も接続を保持するため、リクエストのセッションとは別に開く
+    async with AsyncSessionLocal() as db:
+        async for rows in crud_async.stream_clicks(
+            db, url_id=url_id, start=start, end=end, chunk_size=settings.export_chunk_size
+        ):
+            text = _csv_chunk(rows) if export_format == "csv" else _ndjson_chunk(rows)
+            exported += len(rows)
+            data = encode(text)
+            if data:
+                yield data
+
+    if compressor:
+        yield compressor.flush()
+    logger.info(f"Exported {exported} clicks (format={export_format}, url_id={url_id})")
+
+
+@router.get("/clicks")
+async def export_clicks(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$", description="csv または ndjson"),
+    url_id: Optional[int] = Query(None, description="対象URLのID（省略時は全URL）"),
+    start: Optional[datetime] = Query(None, description="期間の開始（この日時を含む。タイムゾーンなしはJST）"),
+    end: Optional[datetime] = Query(None, description="期間の終了（この日時を含まない。タイムゾーンなしはJST）"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """クリック履歴エクスポート（認証必須、クリック日時の古い順にストリーミング）
+
+    Accept-Encoding で gzip が許容されている場合は圧縮して返す。
+    """
+    start_utc, end_utc = _to_utc(start), _to_utc(end)
+    if start_utc and end_utc and start_utc >= end_utc:
+        raise ValidationError(
+            "期間の開始は終了より前である必要があります",
+            details={"start": start.isoformat(), "end": end.isoformat()}
+        )
+    if url_id is not None and await crud_async.get_url_by_id(db, url_id) is None:
+        raise NotFoundError("指定されたURLが見つかりません", details={"url_id": url_id})
+
+    compress = _accepts_gzip(request.headers.get("accept-encoding", ""))
+    logger.info(
+        f"Exporting clicks: format={format}, url_id={url_id}, start={start}, end={end}, "
+        f"gzip={compress} for user: {current_user.email}"
+    )
+
+    filename = f"clicks-{url_id}.{format}" if url_id is not None else f"clicks.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"', "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _export_chunks(format, url_id, start_utc, end_utc, compress),
+        media_type=MEDIA_TYPES[format],
+        headers=headers,
+    )
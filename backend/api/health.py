@@ -3,19 +3,20 @@ Health check endpoints for monitoring service status.
 Provides comprehensive health monitoring including database connectivity.
 """
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from datetime import datetime
 import pytz
 import os
 
-from database import get_db
+from crud import password_hasher
+from database import get_async_db, engine_profile, IS_SQLITE
 from config import settings
 
 router = APIRouter()
 
 @router.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_async_db)):
     """
     包括的ヘルスチェックエンドポイント
     
@@ -28,7 +29,7 @@ async def health_check(db: Session = Depends(get_db)):
     """
     try:
         # データベース接続テスト
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         db_status = "healthy"
     except Exception as e:
         db_status = f"unhealthy: {str(e)}"
@@ -37,6 +38,7 @@ async def health_check(db: Session = Depends(get_db)):
     jst = pytz.timezone('Asia/Tokyo')
     current_time = datetime.now(jst).isoformat()
     
+    profile = engine_profile()
     health_data = {
         "status": "healthy" if db_status == "healthy" else "unhealthy",
         "timestamp": current_time,
@@ -47,8 +49,10 @@ async def health_check(db: Session = Depends(get_db)):
         },
         "database": {
             "status": db_status,
-            "type": "SQLite"
+            "type": "SQLite" if IS_SQLITE else profile["dialect"],
+            "profile": profile
         },
+        "password_hashing": password_hasher.stats(),
         "uptime": "running"
     }
     
@@ -78,7 +82,7 @@ async def simple_health_check():
     }
 
 @router.get("/health/database")
-async def database_health_check(db: Session = Depends(get_db)):
+async def database_health_check(db: AsyncSession = Depends(get_async_db)):
     """
     データベース専用ヘルスチェックエンドポイント
     
@@ -87,16 +91,22 @@ async def database_health_check(db: Session = Depends(get_db)):
     """
     try:
         # より詳細なデータベーステスト
-        result = db.execute(text("SELECT COUNT(*) as count FROM sqlite_master WHERE type='table'"))
+        result = await db.execute(text("SELECT COUNT(*) as count FROM sqlite_master WHERE type='table'"))
         table_count = result.scalar()
         
         db_info = {
             "status": "healthy",
             "connection": "active",
             "tables_count": table_count,
-            "database_file": settings.database_url
+            "database_file": settings.database_url,
+            "profile": engine_profile()
         }
         
+        if IS_SQLITE:
+            # 実際に適用されているジャーナルモードを確認
+            journal_mode = await db.scalar(text("PRAGMA journal_mode"))
+            db_info["journal_mode"] = journal_mode
+        
         return {
             "database": db_info,
             "timestamp": datetime.now(pytz.timezone('Asia/Tokyo')).isoformat()
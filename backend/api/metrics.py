@@ -0,0 +1,58 @@
+"""
+Metrics API routes for URL shortener service (Prometheus text format).
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from crud import redirect_cache, url_count_cache, user_cache, user_agent_ids, referrer_ids, password_hasher
+from utils.click_queue import click_ingestor
+from utils.logging import dropped_records
+from utils.metrics import registry
+from .auth import token_cache
+
+# Create metrics router
+router = APIRouter(tags=["metrics"])
+
+# 計測対象のキャッシュ
+CACHES = {
+    "redirect": redirect_cache,
+    "url_count": url_count_cache,
+    "user": user_cache,
+    "token": token_cache,
+    "user_agent": user_agent_ids,
+    "referrer": referrer_ids,
+}
+
+
+def _cache_values(key: str):
+    """キャッシュ統計から指定項目をラベル付きで返す関数"""
+    def collect():
+        for name, cache in CACHES.items():
+            yield {"cache": name}, cache.stats()[key]
+    return collect
+
+
+registry.counter_callback("cache_hits_total", "Cache lookups that found a live entry.", _cache_values("hits"), ("cache",))
+registry.counter_callback("cache_misses_total", "Cache lookups that found no live entry.", _cache_values("misses"), ("cache",))
+registry.counter_callback("cache_evictions_total", "Entries evicted to stay within maxsize.", _cache_values("evictions"), ("cache",))
+registry.gauge_callback("cache_entries", "Entries currently held (including expired ones not yet purged).", _cache_values("size"), ("cache",))
+registry.gauge_callback("cache_hit_ratio", "Hits divided by lookups since start.", _cache_values("hit_ratio"), ("cache",))
+
+registry.gauge_callback("click_queue_depth", "Click events waiting to be written.", lambda: [({}, click_ingestor.depth)])
+registry.counter_callback("click_ingest_flushed_total", "Click events written by the ingestor.", lambda: [({}, click_ingestor.flushed_clicks)])
+registry.counter_callback("click_ingest_failed_total", "Click events the ingestor dropped after retries.", lambda: [({}, click_ingestor.failed_clicks)])
+registry.counter_callback("click_ingest_retries_total", "Batch writes the ingestor retried.", lambda: [({}, click_ingestor.retried_flushes)])
+registry.counter_callback("click_ingest_flushes_total", "Batches written by the ingestor.", lambda: [({}, click_ingestor.flush_count)])
+
+registry.gauge_callback("password_hash_in_flight", "bcrypt operations running.", lambda: [({}, password_hasher.stats()["in_flight"])])
+registry.gauge_callback("password_hash_queue_depth", "bcrypt operations waiting for a worker.", lambda: [({}, password_hasher.queue_depth)])
+registry.counter_callback("password_hash_completed_total", "bcrypt operations completed.", lambda: [({}, password_hasher.completed)])
+registry.counter_callback("password_hash_rejected_total", "bcrypt operations rejected because the queue was full.", lambda: [({}, password_hasher.rejected)])
+
+registry.counter_callback("log_records_dropped_total", "Log records dropped because the log queue was full.", lambda: [({}, dropped_records())])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """メトリクス取得（Prometheusテキスト形式）"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -1,14 +1,34 @@
 """
 URL redirect API routes for URL shortener service.
+
+Redirects are served by lightweight ASGI routes (fast_routes) that skip
+FastAPI's dependency resolution and response classes: a cache hit costs a
+dictionary lookup, a header scan, one enqueued tuple and a sampled log
+line (settings.log_sample_rates). The FastAPI
+router below is kept as the fallback (settings.fast_redirect_enabled) and
+as the baseline for benchmarks/redirect_fast_path.py.
+
+The status code and Cache-Control header follow the URL's redirect
+policy: "tracked" links are never cached so every click reaches the
+server, "permanent" links may be cached by browsers and nginx at the cost
+of not counting the cached clicks.
 """
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.routing import Match, Route
+from datetime import datetime
+from urllib.parse import quote
 import logging
 
-import crud
-import schemas
-from database import get_db
+import crud_async
+from config import settings
+from crud import redirect_cache
+from database import AsyncSessionLocal, get_async_db
+from utils.cache import MISSING
+from utils.click_queue import click_ingestor
+from utils.logging import log_sampled
+from utils.trending import trending_tracker
 from .exceptions import NotFoundError, DatabaseError
 
 logger = logging.getLogger(__name__)
@@ -16,55 +36,161 @@ logger = logging.getLogger(__name__)
 # Create redirect router (no prefix as it handles root-level short codes)
 router = APIRouter(tags=["redirect"])
 
+# リダイレクト方式ごとの (ステータスコード, Cache-Control)
+REDIRECT_POLICIES = {
+    # 毎回サーバーに到達させてクリックを計測する
+    "tracked": (settings.redirect_tracked_status, "no-store"),
+    # ブラウザ・nginxにキャッシュさせる（キャッシュされている間のクリックは計測されない）
+    "permanent": (settings.redirect_permanent_status, f"public, max-age={settings.redirect_permanent_max_age}"),
+}
+
 
 @router.get("/{short_code}")
-async def redirect_to_original(short_code: str, request: Request, db: Session = Depends(get_db)):
+async def redirect_to_original(short_code: str, request: Request, db: AsyncSession = Depends(get_async_db)):
     """短縮URLから元URLへリダイレクト（直接パス）"""
     return await _perform_redirect(short_code, request, db)
 
 
 @router.get("/r/{short_code}")
-async def redirect_to_original_with_prefix(short_code: str, request: Request, db: Session = Depends(get_db)):
+async def redirect_to_original_with_prefix(short_code: str, request: Request, db: AsyncSession = Depends(get_async_db)):
     """短縮URLから元URLへリダイレクト（/r/プレフィックス付き）"""
     return await _perform_redirect(short_code, request, db)
 
 
-async def _perform_redirect(short_code: str, request: Request, db: Session):
+async def _perform_redirect(short_code: str, request: Request, db: AsyncSession):
     """リダイレクト処理の共通ロジック"""
-    logger.info(f"Redirecting: {short_code} from IP: {request.client.host if request.client else 'unknown'}")
-    
     try:
-        db_url = crud.get_url_by_short_code(db, short_code=short_code)
-        if db_url is None:
-            logger.warning(f"URL not found for redirect: {short_code}")
+        resolved = await crud_async.resolve_short_code(db, short_code=short_code)
+        if resolved is None:
+            logger.warning("URL not found for redirect: %s", short_code)
             raise NotFoundError(
                 "指定された短縮URLが見つかりません",
                 details={"short_code": short_code}
             )
         
+        url_id, original_url, policy = resolved
+        
         # Track click
         client_ip = request.client.host if request.client else "unknown"
         user_agent = request.headers.get("user-agent", "")
         referer = request.headers.get("referer", "")
         
-        click_data = schemas.ClickCreate(
-            user_agent=user_agent,
-            ip_address=client_ip,
-            referrer=referer
+        # クリック記録はバックグラウンドでバッチ書き込み（レスポンスをDB書き込みで待たせない）
+        queued = click_ingestor.running and click_ingestor.enqueue(
+            url_id, user_agent, client_ip, referer
         )
+        if not queued:
+            # ワーカー停止中・キュー満杯時はその場で記録
+            records = [(url_id, datetime.utcnow(), user_agent, client_ip, referer)]
+            await crud_async.record_clicks_bulk(db, records)
+            trending_tracker.record(records)
         
-        # クリック記録とカウント更新
-        crud.create_click(db=db, url_id=db_url.id, click_data=click_data)
-        crud.increment_click_count(db=db, url_id=db_url.id)
-        
-        logger.info(f"Click tracked for {short_code}, redirecting to {db_url.original_url}")
-        return RedirectResponse(url=db_url.original_url)
+        log_sampled(logger, logging.INFO, "Redirecting %s to %s", short_code, original_url,
+                    short_code=short_code, url_id=url_id, client_ip=client_ip)
+        status_code, cache_control = REDIRECT_POLICIES.get(policy, REDIRECT_POLICIES["tracked"])
+        return RedirectResponse(url=original_url, status_code=status_code, headers={"Cache-Control": cache_control})
         
     except NotFoundError:
         raise
     except Exception as e:
-        logger.error(f"Error in redirect for {short_code}: {str(e)}")
+        logger.error("Error in redirect for %s: %s", short_code, e)
         raise DatabaseError(
             "リダイレクト処理中にエラーが発生しました",
             details={"short_code": short_code, "original_error": str(e)}
-        ) 
\ No newline at end of file
+        )
+
+
+# Locationヘッダーで許可する文字（RedirectResponse と同じ）
+_LOCATION_SAFE = ":/%#?=@[]!$&'()*+,;"
+
+# REDIRECT_POLICIES のヘッダー値をバイト列に変換したもの
+_POLICY_HEADERS = {
+    name: (status_code, cache_control.encode("latin-1"))
+    for name, (status_code, cache_control) in REDIRECT_POLICIES.items()
+}
+
+
+class RedirectRoute(Route):
+    """ASGI関数をそのまま呼び出すルート（メトリクス・プロファイラー用に scope["route"] を設定）"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        # 関数を Request/Response 形式でラップせず、ASGIアプリとして直接呼び出す
+        self.app = endpoint
+        # Starlette が自動追加する HEAD は除外（従来どおりクリックを記録しない）
+        self.methods = set(kwargs.get("methods") or ["GET"])
+
+    def matches(self, scope):
+        match, child_scope = super().matches(scope)
+        if match is not Match.NONE:
+            child_scope["route"] = self
+        return match, child_scope
+
+
+async def fast_redirect(scope, receive, send):
+    """短縮URLから元URLへリダイレクト（軽量なASGI実装）"""
+    short_code = scope["path_params"]["short_code"]
+    resolved = redirect_cache.get(short_code)
+    if resolved is MISSING:
+        # キャッシュミス時のみセッションを作成
+        try:
+            async with AsyncSessionLocal() as db:
+                resolved = await crud_async.resolve_short_code(db, short_code=short_code)
+        except Exception as e:
+            logger.error("Error in redirect for %s: %s", short_code, e)
+            raise DatabaseError(
+                "リダイレクト処理中にエラーが発生しました",
+                details={"short_code": short_code, "original_error": str(e)}
+            )
+    if resolved is None:
+        raise NotFoundError(
+            "指定された短縮URLが見つかりません",
+            details={"short_code": short_code}
+        )
+
+    url_id, original_url, policy = resolved
+    user_agent = referer = ""
+    for name, value in scope["headers"]:
+        if name == b"user-agent":
+            user_agent = value.decode("latin-1")
+        elif name == b"referer":
+            referer = value.decode("latin-1")
+    client = scope.get("client")
+    client_ip = client[0] if client else "unknown"
+
+    queued = click_ingestor.running and click_ingestor.enqueue(url_id, user_agent, client_ip, referer)
+    if not queued:
+        # ワーカー停止中・キュー満杯時はその場で記録
+        records = [(url_id, datetime.utcnow(), user_agent, client_ip, referer)]
+        try:
+            async with AsyncSessionLocal() as db:
+                await crud_async.record_clicks_bulk(db, records)
+        except Exception as e:
+            logger.error("Error in redirect for %s: %s", short_code, e)
+            raise DatabaseError(
+                "リダイレクト処理中にエラーが発生しました",
+                details={"short_code": short_code, "original_error": str(e)}
+            )
+        # キュー経由と同様、書き込めたクリックを急上昇URLの集計に加える
+        trending_tracker.record(records)
+
+    log_sampled(logger, logging.INFO, "Redirecting %s to %s", short_code, original_url,
+                short_code=short_code, url_id=url_id, client_ip=client_ip)
+    status_code, cache_control = _POLICY_HEADERS.get(policy, _POLICY_HEADERS["tracked"])
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"location", quote(original_url, safe=_LOCATION_SAFE).encode("latin-1")),
+            (b"cache-control", cache_control),
+            (b"content-length", b"0"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": b""})
+
+
+# main.py で app.router に直接追加する（include_router は Route を作り直すため）
+fast_routes = [
+    RedirectRoute("/{short_code}", fast_redirect, methods=["GET"], include_in_schema=False),
+    RedirectRoute("/r/{short_code}", fast_redirect, methods=["GET"], include_in_schema=False),
+]
@@ -9,6 +9,9 @@ from .auth import router as auth_router
 from .urls import router as urls_router
 from .redirect import router as redirect_router
 from .stats import router as stats_router
+from .export import router as export_router
+from .metrics import router as metrics_router
+from .debug import router as debug_router
 from .health import router as health_router
 
 # Create main API router
@@ -17,6 +20,9 @@ router = APIRouter()
 # Include all feature routers (ヘルスチェックを最優先)
 # Note: redirect_router は main.py で個別に登録（プレフィックスなし）
 router.include_router(health_router)
+router.include_router(metrics_router)
 router.include_router(auth_router)
 router.include_router(urls_router)
-router.include_router(stats_router) 
\ No newline at end of file
+router.include_router(stats_router)
+router.include_router(export_router)
+router.include_router(debug_router) 
\ No newline at end of file
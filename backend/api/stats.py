@@ -1,17 +1,24 @@
 """
 Statistics API routes for URL shortener service.
 """
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import pytz
 import logging
 
-import crud
+import crud_async
 import schemas
-from database import get_db
+from database import get_async_db
 from config import settings
 from .auth import get_current_user
-from .exceptions import DatabaseError
+from utils.http_cache import cached_json_response
+from utils.hyperloglog import HyperLogLog, relative_error
+from utils.trending import trending_checkpointer, trending_tracker
+from utils.timeseries import get_timezone, next_bucket, to_local, to_utc
+from .exceptions import DatabaseError, ValidationError
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +28,13 @@ router = APIRouter(prefix="/stats", tags=["statistics"])
 # 日本のタイムゾーン
 JST = pytz.timezone('Asia/Tokyo')
 
+# 時系列の期間省略時の長さ
+DEFAULT_TIMESERIES_SPANS = {
+    "minute": timedelta(hours=1),
+    "hour": timedelta(days=7),
+    "day": timedelta(days=30),
+}
+
 
 def convert_to_jst(utc_datetime):
     """UTC時刻をJST時刻に変換する"""
@@ -32,16 +46,17 @@ def convert_to_jst(utc_datetime):
 
 @router.get("", response_model=schemas.URLStats)
 async def get_stats(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """統計情報取得（認証必須）"""
     logger.info(f"Fetching application statistics for user: {current_user.email}")
     
     try:
-        total_urls = crud.get_url_count(db)
-        total_clicks = crud.get_total_clicks(db)
-        top_urls_data = crud.get_top_urls(db, limit=5)
+        total_urls = await crud_async.get_urls_count(db)
+        total_clicks = await crud_async.get_total_clicks(db)
+        top_urls_data = await crud_async.get_top_urls(db, limit=5)
         
         # トップURLのレスポンス形式に変換（/r/プレフィックス付き）
         top_urls = []
@@ -52,6 +67,7 @@ async def get_stats(
                 original_url=url.original_url,
                 short_code=url.short_code,
                 click_count=url.click_count,
+                redirect_policy=url.redirect_policy or settings.redirect_default_policy,
                 created_at=convert_to_jst(url.created_at),
                 short_url=short_url
             ))
@@ -63,10 +79,221 @@ async def get_stats(
         )
         
         logger.info(f"Statistics retrieved successfully for user: {current_user.email} - URLs: {total_urls}, Clicks: {total_clicks}")
-        return stats_result
+        return cached_json_response(request, stats_result)
     except Exception as e:
         logger.error(f"Error fetching stats for user: {current_user.email} - {str(e)}")
         raise DatabaseError(
             "統計情報取得中にエラーが発生しました",
             details={"original_error": str(e)} if settings.debug else None
-        ) 
\ No newline at end of file
+        ) 
+
+
+@router.get("/daily", response_model=schemas.DailyClickStats)
+async def get_daily_stats(
+    request: Request,
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """日別クリック推移取得（認証必須、日別集計テーブルから取得）"""
+    logger.info(f"Fetching daily statistics ({days} days) for user: {current_user.email}")
+    
+    try:
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        since = today - timedelta(days=days - 1)
+        counts = {
+            bucket_start.date(): clicks
+            for bucket_start, clicks in await crud_async.get_daily_clicks(db, since=since)
+        }
+        
+        # クリックのない日も0件として返す
+        daily = [
+            schemas.DailyClicks(date=day, clicks=counts.get(day, 0))
+            for day in ((since + timedelta(days=offset)).date() for offset in range(days))
+        ]
+        return cached_json_response(
+            request, schemas.DailyClickStats(days=daily, total_clicks=sum(item.clicks for item in daily))
+        )
+    except Exception as e:
+        logger.error(f"Error fetching daily stats for user: {current_user.email} - {str(e)}")
+        raise DatabaseError(
+            "日別統計情報取得中にエラーが発生しました",
+            details={"original_error": str(e)} if settings.debug else None
+        )
+
+
+def estimate_visitors(sketches: List[Tuple[datetime, bytes]]) -> Tuple[Dict[datetime, int], int, float]:
+    """日別スケッチから日ごとの推定値と、マージした期間全体の推定値を求める
+
+    Returns: (日ごとの推定値, 期間全体の推定値, 相対標準誤差)
+    """
+    daily = {}
+    merged = None
+    for bucket_start, data in sketches:
+        sketch = HyperLogLog.from_bytes(data)
+        daily[bucket_start] = sketch.count()
+        if merged is None:
+            merged = sketch
+        else:
+            merged.merge(sketch)
+    if merged is None:
+        return daily, 0, relative_error(settings.visitor_sketch_precision)
+    return daily, merged.count(), merged.relative_error
+
+
+async def build_visitor_stats(db: AsyncSession, url_id: Optional[int], days: int) -> schemas.UniqueVisitorStats:
+    """直近 days 日（UTC）のユニーク訪問者数の推定値を作成する（URL別・全体で共通）"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    since = today - timedelta(days=days - 1)
+    sketches = await crud_async.get_visitor_sketches(db, url_id, since)
+    # スケッチの展開・マージはCPU処理のためイベントループの外で行う
+    daily, total, error = await asyncio.to_thread(estimate_visitors, sketches)
+    return schemas.UniqueVisitorStats(
+        url_id=url_id,
+        days=[
+            schemas.DailyVisitors(date=day.date(), unique_visitors=daily.get(day, 0))
+            for day in (since + timedelta(days=offset) for offset in range(days))
+        ],
+        unique_visitors=total,
+        relative_error=round(error, 5),
+    )
+
+
+async def build_timeseries(
+    db: AsyncSession,
+    url_id: Optional[int],
+    interval: str,
+    tz_name: Optional[str],
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> schemas.ClickTimeseries:
+    """期間・タイムゾーンを検証してクリック時系列を作成する（URL別・全体で共通）"""
+    tz_name = tz_name or settings.timeseries_default_timezone
+    try:
+        tz = get_timezone(tz_name)
+    except ValueError:
+        raise ValidationError("タイムゾーンが無効です", details={"tz": tz_name})
+
+    # タイムゾーンなしの日時は指定タイムゾーンの時刻として扱う
+    end_utc = to_utc(end, tz) if end else datetime.utcnow()
+    start_utc = to_utc(start, tz) if start else end_utc - DEFAULT_TIMESERIES_SPANS[interval]
+    if start_utc >= end_utc:
+        raise ValidationError("開始日時は終了日時より前を指定してください",
+                              details={"start": str(start), "end": str(end)})
+
+    try:
+        source, counts = await crud_async.get_click_timeseries(
+            db, url_id, interval, tz, start_utc, end_utc, settings.timeseries_max_points
+        )
+    except ValueError:
+        raise ValidationError(
+            "区間数が上限を超えています。期間を短くするか区間を大きくしてください",
+            details={"max_points": settings.timeseries_max_points, "interval": interval}
+        )
+
+    points = [{"bucket_start": to_local(bucket, tz), "clicks": clicks} for bucket, clicks in counts]
+    return schemas.ClickTimeseries(
+        url_id=url_id,
+        interval=interval,
+        timezone=tz_name,
+        start=points[0]["bucket_start"] if points else to_local(start_utc, tz),
+        end=to_local(next_bucket(counts[-1][0], interval, tz), tz) if counts else to_local(end_utc, tz),
+        total_clicks=sum(clicks for _, clicks in counts),
+        source=source,
+        points=points,
+    )
+
+
+@router.get("/timeseries", response_model=schemas.ClickTimeseries)
+async def get_timeseries(
+    request: Request,
+    interval: str = Query("hour", pattern="^(minute|hour|day)$", description="minute / hour / day"),
+    tz: Optional[str] = Query(None, description="タイムゾーン（IANA名、省略時は Asia/Tokyo）"),
+    start: Optional[datetime] = Query(None, description="開始日時（タイムゾーンなしは tz の時刻として扱う）"),
+    end: Optional[datetime] = Query(None, description="終了日時（省略時は現在）"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """全URLのクリック時系列取得（認証必須）"""
+    logger.info("Fetching click timeseries (interval=%s, tz=%s) for user: %s", interval, tz, current_user.email)
+    
+    try:
+        timeseries = await build_timeseries(db, None, interval, tz, start, end)
+        return cached_json_response(request, timeseries)
+    except ValidationError:
+        raise
+    except Exception as e:
+        logger.error("Error fetching click timeseries for user: %s - %s", current_user.email, e)
+        raise DatabaseError(
+            "クリック時系列取得中にエラーが発生しました",
+            details={"original_error": str(e)} if settings.debug else None
+        )
+
+
+@router.get("/visitors", response_model=schemas.UniqueVisitorStats)
+async def get_visitor_stats(
+    request: Request,
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """全URLのユニーク訪問者数取得（認証必須、HyperLogLogによる推定値）"""
+    logger.info("Fetching unique visitor statistics (%d days) for user: %s", days, current_user.email)
+    
+    try:
+        return cached_json_response(request, await build_visitor_stats(db, None, days))
+    except Exception as e:
+        logger.error("Error fetching unique visitor stats for user: %s - %s", current_user.email, e)
+        raise DatabaseError(
+            "ユニーク訪問者数取得中にエラーが発生しました",
+            details={"original_error": str(e)} if settings.debug else None
+        )
+
+
+@router.get("/trending", response_model=schemas.TrendingURLs)
+async def get_trending(
+    request: Request,
+    window: str = Query("1h", pattern="^(5m|1h|24h)$", description="時間窓（5m / 1h / 24h）"),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """急上昇URL取得（認証必須、直近の時間窓でクリック数の多い順）
+
+    各ワーカーのメモリ上の集計（Space-Saving）から求める近似値。他のワーカーの分は
+    直近のチェックポイントから合算する。
+    """
+    logger.info("Fetching trending URLs (window=%s) for user: %s", window, current_user.email)
+    
+    try:
+        peers = await trending_checkpointer.peer_snapshots()
+        # 削除済みのURLを除いても limit 件になるよう多めに取得する
+        top = trending_tracker.top(window, limit * 2, peers)
+        urls = await crud_async.get_urls_by_ids(db, [url_id for url_id, _, _ in top])
+        trending = []
+        for url_id, clicks, error in top:
+            url = urls.get(url_id)
+            if url is None:
+                continue
+            trending.append(schemas.TrendingURL(
+                url=schemas.URLResponse(
+                    id=url.id,
+                    original_url=url.original_url,
+                    short_code=url.short_code,
+                    click_count=url.click_count,
+                    redirect_policy=url.redirect_policy or settings.redirect_default_policy,
+                    created_at=convert_to_jst(url.created_at),
+                    short_url=f"{settings.base_url}/r/{url.short_code}"
+                ),
+                clicks=clicks,
+                error=error,
+            ))
+            if len(trending) >= limit:
+                break
+        return cached_json_response(request, schemas.TrendingURLs(window=window, urls=trending))
+    except Exception as e:
+        logger.error("Error fetching trending URLs for user: %s - %s", current_user.email, e)
+        raise DatabaseError(
+            "急上昇URL取得中にエラーが発生しました",
+            details={"original_error": str(e)} if settings.debug else None
+        )
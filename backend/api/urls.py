@@ -1,17 +1,25 @@
 """
 URL management API routes for URL shortener service.
 """
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError as PydanticValidationError
+from starlette.requests import ClientDisconnect
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from datetime import datetime
+import json
 import pytz
 import logging
 
-import crud
+import crud_async
 import schemas
-from database import get_db
+from database import AsyncSessionLocal, get_async_db
 from config import settings
 from .auth import get_current_user
+from .stats import build_timeseries, build_visitor_stats
+from utils.http_cache import cached_json_response
+from utils.pagination import decode_cursor
 from .exceptions import ValidationError, NotFoundError, DatabaseError
 
 logger = logging.getLogger(__name__)
@@ -31,10 +39,20 @@ def convert_to_jst(utc_datetime):
     return utc_datetime.astimezone(JST)
 
 
+def _validate_cursor(cursor: Optional[str]):
+    """ページングカーソルの形式を検証する"""
+    if cursor is None:
+        return
+    try:
+        decode_cursor(cursor)
+    except ValueError:
+        raise ValidationError("カーソルが無効です", details={"cursor": cursor})
+
+
 @router.post("", response_model=schemas.URLResponse, status_code=status.HTTP_201_CREATED)
 async def create_short_url(
     url: schemas.URLCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """短縮URL作成（認証必須）"""
@@ -50,7 +68,7 @@ async def create_short_url(
         )
     
     try:
-        db_url = crud.create_url(db=db, url_create=url)
+        db_url = await crud_async.create_url(db=db, url_create=url)
         
         # レスポンス用に短縮URLを生成（/r/プレフィックス付き）
         short_url = f"{settings.base_url}/r/{db_url.short_code}"
@@ -60,6 +78,7 @@ async def create_short_url(
             original_url=db_url.original_url,
             short_code=db_url.short_code,
             click_count=db_url.click_count,
+            redirect_policy=db_url.redirect_policy or settings.redirect_default_policy,
             created_at=convert_to_jst(db_url.created_at),
             short_url=short_url
         )
@@ -74,22 +93,236 @@ async def create_short_url(
         )
 
 
+class _MalformedLine:
+    """NDJSONの解析できなかった行"""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+class _BulkStreamingResponse(StreamingResponse):
+    """リクエスト本文を読みながら返すレスポンス
+
+    StreamingResponse は切断検知のため receive を読み続け、本文の受信と競合する。
+    切断は request.stream() が ClientDisconnect として検知する。
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+def _is_ndjson(content_type: str) -> bool:
+    return "ndjson" in content_type or "jsonlines" in content_type
+
+
+async def _read_bulk_json_array(request: Request) -> List[Any]:
+    """JSON配列形式の本文を上限サイズまで読み、要素のリストにする"""
+    limit = settings.bulk_create_max_body_bytes
+    too_large = ValidationError(
+        f"JSON配列形式の本文は{limit}バイトまでです（大量の場合はNDJSONを使用してください）",
+        details={"max_bytes": limit}
+    )
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    try:
+        items = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValidationError("リクエスト本文のJSONが不正です", details={"error": str(e)})
+    if not isinstance(items, list):
+        raise ValidationError("リクエスト本文はURLのJSON配列またはNDJSONである必要があります")
+    if not items:
+        raise ValidationError("URLが指定されていません")
+    if len(items) > settings.bulk_create_max_items:
+        raise ValidationError(
+            f"一度に作成できるURLは{settings.bulk_create_max_items}件までです",
+            details={"count": len(items)}
+        )
+    return items
+
+
+async def _iter_bulk_ndjson(request: Request) -> AsyncIterator[Any]:
+    """NDJSON形式の本文を受信しながら1行ずつ要素にする（解析できない行は _MalformedLine）"""
+    limit = settings.bulk_create_max_body_bytes
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) >= 0:
+            line = bytes(buffer[start:end])
+            start = end + 1
+            if line.strip():
+                yield _parse_ndjson_line(line)
+        del buffer[:start]
+        if len(buffer) > limit:
+            # 改行のない巨大な行はそれ以上読まずに打ち切る
+            yield _MalformedLine(f"1行は{limit}バイトまでです")
+            return
+    if buffer.strip():
+        yield _parse_ndjson_line(bytes(buffer))
+
+
+def _parse_ndjson_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        return _MalformedLine(str(e))
+
+
+async def _chain(head: List[Any], tail: Optional[AsyncIterator[Any]] = None) -> AsyncIterator[Any]:
+    for item in head:
+        yield item
+    if tail is not None:
+        async for item in tail:
+            yield item
+
+
+def _validate_bulk_item(item: Any) -> str:
+    """一括作成の1要素を検証し、元のURLを返す（不正な場合はValueError）"""
+    if isinstance(item, _MalformedLine):
+        raise ValueError(f"JSONが不正です: {item.error}")
+    if isinstance(item, str):
+        item = {"original_url": item}
+    if not isinstance(item, dict):
+        raise ValueError("URL文字列または {\"original_url\": ...} を指定してください")
+    try:
+        url = schemas.URLCreate.model_validate(item)
+    except PydanticValidationError as e:
+        raise ValueError("; ".join(error["msg"] for error in e.errors()))
+    url_str = str(url.original_url)
+    if not url_str.startswith(('http://', 'https://')):
+        raise ValueError("URLは http:// または https:// で始まる必要があります")
+    return url_str
+
+
+async def _bulk_create_results(items: AsyncIterator[Any], user_email: str) -> AsyncIterator[str]:
+    """要素を受け取りながらチャンクごとにURLを作成し、結果をNDJSONの行として返す"""
+    created = failed = 0
+    pending: List[Tuple[int, str]] = []
+
+    def error_line(index: int, item: Any, message: str) -> str:
+        original_url = item if isinstance(item, str) else item.get("original_url") if isinstance(item, dict) else None
+        result = schemas.BulkURLResult(
+            index=index, status="error",
+            original_url=original_url if isinstance(original_url, str) else None,
+            error=message,
+        )
+        return result.model_dump_json(exclude_none=True) + "\n"
+
+    async with AsyncSessionLocal() as db:
+        async def flush() -> AsyncIterator[str]:
+            nonlocal created, failed
+            chunk = pending[:]
+            pending.clear()
+            try:
+                rows = await crud_async.create_urls_bulk(db, [url for _, url in chunk])
+            except Exception as e:
+                logger.error(f"Error creating URL chunk of {len(chunk)}: {str(e)} for user: {user_email}")
+                failed += len(chunk)
+                message = str(e) if settings.debug else "URL作成中にエラーが発生しました"
+                for index, url in chunk:
+                    yield error_line(index, url, message)
+                return
+            created += len(rows)
+            for (index, _), row in zip(chunk, rows):
+                result = schemas.BulkURLResult(
+                    index=index,
+                    status="created",
+                    original_url=row.original_url,
+                    id=row.id,
+                    short_code=row.short_code,
+                    short_url=f"{settings.base_url}/r/{row.short_code}",
+                    created_at=convert_to_jst(row.created_at),
+                )
+                yield result.model_dump_json(exclude_none=True) + "\n"
+
+        try:
+            index = -1
+            async for item in items:
+                index += 1
+                if index >= settings.bulk_create_max_items:
+                    # 上限を超えた分は読まずに打ち切る
+                    failed += 1
+                    yield error_line(index, None, f"一度に作成できるURLは{settings.bulk_create_max_items}件までです")
+                    break
+                try:
+                    pending.append((index, _validate_bulk_item(item)))
+                except ValueError as e:
+                    failed += 1
+                    yield error_line(index, item, str(e))
+                    continue
+                if len(pending) >= settings.bulk_create_chunk_size:
+                    async for line in flush():
+                        yield line
+        except ClientDisconnect:
+            # 受信済みの要素のみ作成する
+            logger.warning(f"Client disconnected during bulk URL creation for user: {user_email}")
+        if pending:
+            async for line in flush():
+                yield line
+
+    logger.info(f"Bulk URL creation finished: created={created}, failed={failed} for user: {user_email}")
+    yield schemas.BulkURLSummary(created=created, failed=failed).model_dump_json() + "\n"
+
+
+@router.post("/bulk")
+async def create_short_urls_bulk(
+    request: Request,
+    current_user = Depends(get_current_user)
+):
+    """短縮URL一括作成（認証必須）
+
+    本文はURLのJSON配列またはNDJSON（Content-Type: application/x-ndjson）。
+    要素はURL文字列または {"original_url": ...}。結果は1件1行のNDJSON
+    （index は入力中の位置）で返し、最終行に件数の集計を付ける。
+    不正な要素はその行のみエラーになる。
+    NDJSONは受信しながら作成し、JSON配列は本文を読み切ってから作成する。
+    """
+    if _is_ndjson(request.headers.get("content-type", "")):
+        items = _iter_bulk_ndjson(request)
+        # 空の本文はストリーミング開始前にエラーにする
+        first = await anext(items, None)
+        if first is None:
+            raise ValidationError("URLが指定されていません")
+        logger.info(f"Bulk creating URLs from NDJSON stream for user: {current_user.email}")
+        return _BulkStreamingResponse(
+            _bulk_create_results(_chain([first], items), current_user.email),
+            media_type="application/x-ndjson",
+        )
+
+    items = await _read_bulk_json_array(request)
+    logger.info(f"Bulk creating {len(items)} URLs for user: {current_user.email}")
+    return StreamingResponse(
+        _bulk_create_results(_chain(items), current_user.email),
+        media_type="application/x-ndjson",
+    )
+
+
 @router.get("", response_model=schemas.URLList)
 async def get_urls(
-    skip: int = 0, 
-    limit: int = 20, 
-    db: Session = Depends(get_db),
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = settings.default_page_size,
+    include_total: bool = True,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    """URL一覧取得（認証必須）"""
-    if limit > 100:
-        limit = 100
+    """URL一覧取得（認証必須、カーソルによるページング）"""
+    limit = min(max(limit, 1), settings.max_page_size)
+    _validate_cursor(cursor)
     
-    logger.info(f"Fetching URLs: skip={skip}, limit={limit} for user: {current_user.email}")
+    logger.info(f"Fetching URLs: cursor={cursor}, limit={limit} for user: {current_user.email}")
     
     try:
-        urls = crud.get_urls(db, skip=skip, limit=limit)
-        total = crud.get_urls_count(db)
+        urls, next_cursor = await crud_async.get_urls_page(db, limit=limit, cursor=cursor)
+        total = await crud_async.get_urls_count(db) if include_total else None
         
         # レスポンス用にshort_urlを追加（/r/プレフィックス付き）
         url_responses = []
@@ -100,12 +333,15 @@ async def get_urls(
                 original_url=url.original_url,
                 short_code=url.short_code,
                 click_count=url.click_count,
+                redirect_policy=url.redirect_policy or settings.redirect_default_policy,
                 created_at=convert_to_jst(url.created_at),
                 short_url=short_url
             ))
         
         logger.info(f"Retrieved {len(url_responses)} URLs for user: {current_user.email}")
-        return schemas.URLList(urls=url_responses, total=total)
+        return cached_json_response(
+            request, schemas.URLList(urls=url_responses, total=total, next_cursor=next_cursor)
+        )
     except Exception as e:
         logger.error(f"Error fetching URLs: {str(e)} for user: {current_user.email}")
         raise DatabaseError(
@@ -114,17 +350,54 @@ async def get_urls(
         )
 
 
+@router.patch("/{url_id}", response_model=schemas.URLResponse)
+async def update_url(
+    url_id: int,
+    url_update: schemas.URLUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """URL更新（認証必須、リダイレクト方式の変更）"""
+    logger.info("Updating redirect policy of URL %s to %s for user: %s",
+                url_id, url_update.redirect_policy, current_user.email)
+    
+    try:
+        url = await crud_async.update_redirect_policy(db, url_id=url_id, redirect_policy=url_update.redirect_policy)
+        if url is None:
+            raise NotFoundError(
+                "指定されたURLが見つかりません",
+                details={"url_id": url_id}
+            )
+        return schemas.URLResponse(
+            id=url.id,
+            original_url=url.original_url,
+            short_code=url.short_code,
+            click_count=url.click_count,
+            redirect_policy=url.redirect_policy or settings.redirect_default_policy,
+            created_at=convert_to_jst(url.created_at),
+            short_url=f"{settings.base_url}/r/{url.short_code}"
+        )
+    except NotFoundError:
+        raise
+    except Exception as e:
+        logger.error("Error updating URL %s: %s for user: %s", url_id, e, current_user.email)
+        raise DatabaseError(
+            "URL更新中にエラーが発生しました",
+            details={"original_error": str(e)} if settings.debug else None
+        )
+
+
 @router.delete("/{url_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_url(
     url_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """URL削除（認証必須）"""
     logger.info(f"Deleting URL: {url_id} for user: {current_user.email}")
     
     try:
-        success = crud.delete_url(db=db, url_id=url_id)
+        success = await crud_async.delete_url(db=db, url_id=url_id)
         if not success:
             logger.warning(f"URL not found for deletion: {url_id} for user: {current_user.email}")
             raise NotFoundError(
@@ -146,14 +419,20 @@ async def delete_url(
 @router.get("/{url_id}/clicks", response_model=List[schemas.ClickResponse])
 async def get_url_clicks(
     url_id: int, 
-    db: Session = Depends(get_db),
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    """URL別クリック履歴取得（認証必須）"""
+    """URL別クリック履歴取得（認証必須、次ページのカーソルは X-Next-Cursor ヘッダーで返す）"""
+    limit = min(max(limit, 1), settings.max_click_page_size)
+    _validate_cursor(cursor)
+    
     logger.info(f"Fetching clicks for URL: {url_id} for user: {current_user.email}")
     
     try:
-        clicks = crud.get_clicks_by_url(db, url_id=url_id)
+        clicks, next_cursor = await crud_async.get_clicks_by_url(db, url_id=url_id, limit=limit, cursor=cursor)
         # クリック時刻もJSTに変換
         click_responses = []
         for click in clicks:
@@ -162,10 +441,74 @@ async def get_url_clicks(
             click_responses.append(click_response)
         
         logger.info(f"Retrieved {len(click_responses)} clicks for URL: {url_id} for user: {current_user.email}")
-        return click_responses
+        # 新しい順のため先頭のクリック時刻が最終更新日時
+        return cached_json_response(
+            request, click_responses,
+            last_modified=clicks[0].clicked_at if clicks else None,
+            headers={"X-Next-Cursor": next_cursor} if next_cursor else None,
+        )
     except Exception as e:
         logger.error(f"Error fetching clicks: {str(e)} for user: {current_user.email}")
         raise DatabaseError(
             "クリック履歴取得中にエラーが発生しました",
             details={"original_error": str(e)} if settings.debug else None
-        ) 
\ No newline at end of file
+        )
+
+
+@router.get("/{url_id}/timeseries", response_model=schemas.ClickTimeseries)
+async def get_url_timeseries(
+    url_id: int,
+    request: Request,
+    interval: str = Query("hour", pattern="^(minute|hour|day)$", description="minute / hour / day"),
+    tz: Optional[str] = Query(None, description="タイムゾーン（IANA名、省略時は Asia/Tokyo）"),
+    start: Optional[datetime] = Query(None, description="開始日時（タイムゾーンなしは tz の時刻として扱う）"),
+    end: Optional[datetime] = Query(None, description="終了日時（省略時は現在）"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """URL別クリック時系列取得（認証必須、集計はSQL・集計テーブルで行う）"""
+    logger.info("Fetching click timeseries for URL: %s (interval=%s, tz=%s) for user: %s",
+                url_id, interval, tz, current_user.email)
+    
+    if await crud_async.get_url_by_id(db, url_id) is None:
+        raise NotFoundError(
+            "指定されたURLが見つかりません",
+            details={"url_id": url_id}
+        )
+    try:
+        timeseries = await build_timeseries(db, url_id, interval, tz, start, end)
+        return cached_json_response(request, timeseries)
+    except ValidationError:
+        raise
+    except Exception as e:
+        logger.error("Error fetching click timeseries: %s for user: %s", e, current_user.email)
+        raise DatabaseError(
+            "クリック時系列取得中にエラーが発生しました",
+            details={"original_error": str(e)} if settings.debug else None
+        )
+
+
+@router.get("/{url_id}/visitors", response_model=schemas.UniqueVisitorStats)
+async def get_url_visitors(
+    url_id: int,
+    request: Request,
+    days: int = Query(30, ge=1, le=366),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """URL別ユニーク訪問者数取得（認証必須、HyperLogLogによる推定値）"""
+    logger.info("Fetching unique visitors for URL: %s (%d days) for user: %s", url_id, days, current_user.email)
+    
+    if await crud_async.get_url_by_id(db, url_id) is None:
+        raise NotFoundError(
+            "指定されたURLが見つかりません",
+            details={"url_id": url_id}
+        )
+    try:
+        return cached_json_response(request, await build_visitor_stats(db, url_id, days))
+    except Exception as e:
+        logger.error("Error fetching unique visitors: %s for user: %s", e, current_user.email)
+        raise DatabaseError(
+            "ユニーク訪問者数取得中にエラーが発生しました",
+            details={"original_error": str(e)} if settings.debug else None
+        )
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+クリック履歴アーカイブスクリプト
+保持期間（CLICK_RETENTION_DAYS）を過ぎたクリックを日別の gzip NDJSON ファイルに
+書き出してから clicks テーブルから削除し、空き領域を解放します。
+時間別・日別の集計とユニーク訪問者スケッチは削除しません。cron 等で1日1回実行してください。
+
+  python archive_clicks.py --dry-run
+  python archive_clicks.py --vacuum   # 既存のSQLiteを incremental vacuum 対応に切り替える（初回のみ）
+"""
+
+import argparse
+import sys
+import os
+
+# プロジェクトルートをパスに追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from database import SessionLocal, engine
+from utils import click_archive
+
+def main():
+    """保持期間を過ぎたクリックのアーカイブ・削除"""
+    parser = argparse.ArgumentParser(description="保持期間を過ぎたクリックをファイルにアーカイブして削除します")
+    parser.add_argument("--retention-days", type=int, default=settings.click_retention_days,
+                        help="クリックの保持日数（0は何もしない）")
+    parser.add_argument("--archive-dir", default=settings.click_archive_dir, help="アーカイブファイルの出力先")
+    parser.add_argument("--batch-size", type=int, default=settings.click_delete_batch_size,
+                        help="1トランザクションで削除する行数")
+    parser.add_argument("--dry-run", action="store_true", help="対象の日と件数を表示するだけで削除しない")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="SQLiteを auto_vacuum=INCREMENTAL に切り替える（VACUUMでDB全体を書き直すため停止中に実行）")
+    args = parser.parse_args()
+    
+    if args.vacuum:
+        print("auto_vacuum=INCREMENTAL に切り替えています（VACUUM）...")
+        click_archive.enable_incremental_vacuum(engine)
+        print("✓ 切り替えが完了しました")
+    
+    if args.retention_days <= 0:
+        print("保持期間が設定されていないため、アーカイブは行いません")
+        return
+    
+    db = SessionLocal()
+    try:
+        cutoff = click_archive.retention_cutoff(args.retention_days)
+        print(f"{cutoff:%Y-%m-%d}（UTC）より前のクリックをアーカイブします")
+        days = click_archive.archive_expired_clicks(
+            db, args.retention_days, args.archive_dir, args.batch_size, dry_run=args.dry_run
+        )
+        for item in days:
+            if args.dry_run:
+                print(f"  {item.day:%Y-%m-%d}: {item.clicks} 件 → {item.path}")
+            else:
+                notes = []
+                if not item.written:
+                    notes.append("前回の続き")
+                if item.rollups_rebuilt:
+                    notes.append("集計を再構築")
+                note = f"（{'、'.join(notes)}）" if notes else ""
+                print(f"  {item.day:%Y-%m-%d}: {item.deleted} 件を削除 → {item.path}{note}")
+        
+        if not days:
+            print("✓ アーカイブ対象のクリックはありません")
+        elif args.dry_run:
+            print(f"対象: {len(days)} 日, {sum(item.clicks for item in days)} 件（--dry-run のため削除していません）")
+        else:
+            print(f"✓ {len(days)} 日分, {sum(item.deleted for item in days)} 件のクリックをアーカイブしました")
+        
+        if not args.dry_run:
+            mode = click_archive.sqlite_auto_vacuum_mode(db)
+            if mode == "INCREMENTAL":
+                freed = click_archive.incremental_vacuum(db, settings.sqlite_vacuum_step_pages)
+                print(f"✓ {freed} ページの空き領域を解放しました")
+            elif mode is not None:
+                print(f"⚠ auto_vacuum={mode} のため空き領域はファイルに残ります（--vacuum で切り替え）")
+    except Exception as e:
+        print(f"✗ エラーが発生しました: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
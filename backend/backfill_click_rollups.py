@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+クリック集計バックフィルスクリプト
+既存の clicks テーブルから時間別・日別の集計テーブルと
+日別のユニーク訪問者スケッチを再構築します。
+"""
+
+import sys
+import os
+
+# プロジェクトルートをパスに追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import SessionLocal, engine
+import models, crud
+
+def backfill_click_rollups():
+    """集計テーブルを再構築"""
+    # 集計テーブルが未作成の場合に備えて作成
+    models.Base.metadata.create_all(bind=engine)
+    
+    db = SessionLocal()
+    try:
+        print("クリック集計を再構築しています...")
+        hourly_rows, daily_rows = crud.rebuild_click_rollups(db)
+        print(f"✓ 集計の再構築が完了しました（時間別: {hourly_rows} 行, 日別: {daily_rows} 行）")
+        print("ユニーク訪問者スケッチを再構築しています...")
+        sketch_rows = crud.rebuild_visitor_sketches(db)
+        print(f"✓ スケッチの再構築が完了しました（{sketch_rows} 行）")
+    except Exception as e:
+        print(f"✗ エラーが発生しました: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill_click_rollups()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+ベンチマーク結果比較スクリプト
+run_benchmark.py の結果JSONを2つ比較し、閾値を超えて悪化した項目を報告します。
+悪化があった場合は終了コード1を返します。
+
+  python benchmarks/compare.py baseline.json candidate.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+
+# 値が大きいほど悪い指標
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+# 値が小さいほど悪い指標
+THROUGHPUT_METRICS = ("throughput_rps",)
+
+
+def compare(baseline, candidate, threshold, min_delta_ms):
+    """シナリオ・指標ごとの変化率と悪化判定を返す"""
+    rows = []
+    for scenario, base in baseline["scenarios"].items():
+        current = candidate["scenarios"].get(scenario)
+        if current is None:
+            continue
+        for metric in LATENCY_METRICS + THROUGHPUT_METRICS:
+            before, after = base.get(metric), current.get(metric)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            if metric in LATENCY_METRICS:
+                # ごく小さな値の揺らぎは悪化として扱わない
+                regressed = change > threshold and after - before >= min_delta_ms
+            else:
+                regressed = change < -threshold
+            rows.append({
+                "scenario": scenario, "metric": metric,
+                "baseline": before, "candidate": after,
+                "change_pct": round(change, 1), "regressed": regressed,
+            })
+        if current.get("errors", 0) > base.get("errors", 0):
+            rows.append({
+                "scenario": scenario, "metric": "errors",
+                "baseline": base.get("errors", 0), "candidate": current["errors"],
+                "change_pct": None, "regressed": True,
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク結果を比較して性能の悪化を検出します")
+    parser.add_argument("baseline", help="基準となる結果JSON")
+    parser.add_argument("candidate", help="比較対象の結果JSON")
+    parser.add_argument("--threshold", type=float, default=10.0, help="悪化とみなす変化率（%%）")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="悪化とみなすレイテンシの最小増加量（ミリ秒）")
+    parser.add_argument("--json", action="store_true", help="比較結果をJSONで出力")
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+
+    rows = compare(baseline, candidate, args.threshold, args.min_delta_ms)
+    regressions = [row for row in rows if row["regressed"]]
+
+    if args.json:
+        print(json.dumps({"threshold_pct": args.threshold, "rows": rows, "regressions": len(regressions)},
+                         indent=2, ensure_ascii=False))
+    else:
+        print(f"基準: {baseline['meta'].get('git_revision')}  比較対象: {candidate['meta'].get('git_revision')}")
+        print(f"{'scenario':<10} {'metric':<15} {'baseline':>12} {'candidate':>12} {'change':>9}")
+        for row in rows:
+            change = f"{row['change_pct']:+.1f}%" if row["change_pct"] is not None else "-"
+            mark = "  ✗ 悪化" if row["regressed"] else ""
+            print(f"{row['scenario']:<10} {row['metric']:<15} {row['baseline']:>12} {row['candidate']:>12} {change:>9}{mark}")
+        if regressions:
+            print(f"✗ {len(regressions)} 件の悪化を検出しました（閾値: {args.threshold}%）")
+        else:
+            print(f"✓ 悪化はありません（閾値: {args.threshold}%）")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
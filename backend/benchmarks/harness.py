@@ -0,0 +1,75 @@
+"""
+Shared helpers for the benchmark scripts: latency percentiles, summaries
+and a closed-loop load driver for the in-process ASGI client.
+"""
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近傍法による百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: List[float], elapsed: Optional[float] = None, errors: int = 0) -> Dict[str, float]:
+    """レイテンシ（秒）のリストを集計する（elapsed指定時はスループットも算出）"""
+    summary = {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+    }
+    if elapsed is not None:
+        summary["throughput_rps"] = round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0
+    return summary
+
+
+async def drive(
+    request: Callable[[int], Awaitable[bool]],
+    concurrency: int,
+    duration: Optional[float] = None,
+    total_requests: Optional[int] = None,
+) -> Dict[str, float]:
+    """concurrency 個のワーカーで request を繰り返し実行し、集計を返す
+
+    request はリクエスト番号を受け取り、成功したかどうかを返す。
+    duration（秒）または total_requests のいずれかで終了する。
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = 0
+    started = time.perf_counter()
+    deadline = started + duration if duration is not None else None
+
+    def next_index() -> Optional[int]:
+        nonlocal counter
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        if total_requests is not None and counter >= total_requests:
+            return None
+        counter += 1
+        return counter - 1
+
+    async def worker():
+        nonlocal errors
+        while True:
+            index = next_index()
+            if index is None:
+                return
+            request_started = time.perf_counter()
+            ok = await request(index)
+            latencies.append(time.perf_counter() - request_started)
+            if not ok:
+                errors += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
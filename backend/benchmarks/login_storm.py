@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+ログイン集中時のリダイレクト遅延ベンチマーク
+一時データベースでアプリケーションをプロセス内（ASGI）で起動し、
+リダイレクトのみの負荷とログインを同時に大量実行した負荷で
+リダイレクトのレイテンシを比較します。
+
+  python benchmarks/login_storm.py --duration 5 --login-concurrency 16
+  python benchmarks/login_storm.py --inline-hashing   # 従来（イベントループ上でbcrypt）との比較
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+# 一時データベースを使用（アプリケーションのimport前に設定）
+_tmpdir = tempfile.mkdtemp(prefix="login-storm-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+
+# プロジェクトルートをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from harness import summarize
+
+import crud
+import init_db
+from database import SessionLocal
+from main import app
+from schemas import URLCreate
+from utils.password_hashing import PasswordHasher
+
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "admin123"
+
+
+class InlinePasswordHasher(PasswordHasher):
+    """比較用: スレッドプールを使わずイベントループ上でbcryptを実行する"""
+
+    async def _submit(self, func, *args):
+        return func(*args)
+
+
+async def redirect_worker(client, path, deadline, latencies):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get(path)
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code in (301, 302, 307, 308), response.status_code
+
+
+async def login_worker(client, deadline, results):
+    payload = {"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD}
+    while time.perf_counter() < deadline:
+        response = await client.post("/api/auth/login", json=payload)
+        results[response.status_code] = results.get(response.status_code, 0) + 1
+
+
+async def run_phase(client, path, duration, redirect_concurrency, login_concurrency):
+    deadline = time.perf_counter() + duration
+    latencies = []
+    logins = {}
+    tasks = [redirect_worker(client, path, deadline, latencies) for _ in range(redirect_concurrency)]
+    tasks += [login_worker(client, deadline, logins) for _ in range(login_concurrency)]
+    await asyncio.gather(*tasks)
+    result = {"redirect": summarize(latencies)}
+    if login_concurrency:
+        result["logins"] = {
+            "by_status": {str(code): count for code, count in sorted(logins.items())},
+            "per_second": round(sum(logins.values()) / duration, 2),
+        }
+    return result
+
+
+async def main(args):
+    if args.inline_hashing:
+        crud.password_hasher = InlinePasswordHasher(crud.pwd_context, 1, 0)
+        import crud_async
+        crud_async.password_hasher = crud.password_hasher
+
+    db = SessionLocal()
+    try:
+        short_code = crud.create_url(db, URLCreate(original_url="https://example.com/benchmark")).short_code
+    finally:
+        db.close()
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            path = f"/r/{short_code}"
+            baseline = await run_phase(client, path, args.duration, args.redirect_concurrency, 0)
+            storm = await run_phase(client, path, args.duration, args.redirect_concurrency, args.login_concurrency)
+
+    report = {
+        "config": {
+            "duration_s": args.duration,
+            "redirect_concurrency": args.redirect_concurrency,
+            "login_concurrency": args.login_concurrency,
+            "hashing": "inline" if args.inline_hashing else "thread_pool",
+            "bcrypt_rounds": crud.settings.bcrypt_rounds,
+            "password_hash_workers": crud.settings.password_hash_workers,
+        },
+        "baseline": baseline,
+        "login_storm": storm,
+        "password_hashing": crud.password_hasher.stats(),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ログイン集中時のリダイレクト遅延を計測します")
+    parser.add_argument("--duration", type=float, default=5.0, help="各フェーズの秒数")
+    parser.add_argument("--redirect-concurrency", type=int, default=8, help="リダイレクトの同時実行数")
+    parser.add_argument("--login-concurrency", type=int, default=16, help="ログインの同時実行数")
+    parser.add_argument("--inline-hashing", action="store_true",
+                        help="bcryptをイベントループ上で実行する（変更前の挙動との比較用）")
+    args = parser.parse_args()
+
+    init_db.init_database()
+    asyncio.run(main(args))
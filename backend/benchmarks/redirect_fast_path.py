@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+リダイレクト処理のレイテンシ・メモリ割り当てベンチマーク
+一時データベースに短縮URLを作成し、従来のFastAPIルート（依存性解決・
+RedirectResponse）と軽量なASGIルート（api.redirect.fast_routes）を
+ミドルウェアなしのアプリで直接呼び出して比較します。
+キャッシュヒット時（通常運用時）の処理コストを計測します。
+
+  python benchmarks/redirect_fast_path.py --requests 20000
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# 一時データベースを使用（アプリケーションのimport前に設定）
+_tmpdir = tempfile.mkdtemp(prefix="redirect-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+
+# プロジェクトルートをパスに追加
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI
+
+from harness import summarize
+
+import crud
+import init_db
+from api.redirect import router as redirect_router, fast_routes
+from database import SessionLocal
+from schemas import URLCreate
+from utils.click_queue import click_ingestor
+
+
+def build_apps():
+    """比較用に、リダイレクトルートのみを持つアプリを2つ作成する"""
+    legacy = FastAPI()
+    legacy.include_router(redirect_router)
+    fast = FastAPI()
+    fast.router.routes.extend(fast_routes)
+    return {"legacy": legacy, "fast": fast}
+
+
+def make_scope(path):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (b"host", b"bench"),
+            (b"user-agent", b"Mozilla/5.0 (benchmark)"),
+            (b"referer", b"https://example.com/"),
+        ],
+        "client": ("10.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+
+async def call(app, path):
+    """ASGIアプリを1回呼び出し、ステータスコードを返す"""
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(make_scope(path), receive, send)
+    return status
+
+
+async def measure_latency(app, path, requests):
+    latencies = []
+    errors = 0
+    gc_before = gc.get_stats()[0]["collections"]
+    started = time.perf_counter()
+    for _ in range(requests):
+        request_started = time.perf_counter()
+        status = await call(app, path)
+        latencies.append(time.perf_counter() - request_started)
+        if status != 307:
+            errors += 1
+    result = summarize(latencies, time.perf_counter() - started, errors)
+    result["gc_gen0_collections"] = gc.get_stats()[0]["collections"] - gc_before
+    return result
+
+
+async def measure_allocations(app, path, requests):
+    """1リクエストあたりの一時的なメモリ割り当て（tracemalloc のピーク）"""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(requests):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await call(app, path)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    return {
+        "requests": requests,
+        "peak_bytes_p50": peaks[len(peaks) // 2],
+        "peak_bytes_mean": round(sum(peaks) / len(peaks), 1),
+    }
+
+
+async def main(args):
+    db = SessionLocal()
+    try:
+        short_code = crud.create_url(db, URLCreate(original_url="https://example.com/benchmark")).short_code
+    finally:
+        db.close()
+
+    apps = build_apps()
+    path = f"/r/{short_code}"
+    report = {
+        "config": {"requests": args.requests, "allocation_requests": args.allocation_requests},
+        "results": {},
+    }
+    click_ingestor.start()
+    try:
+        for name, app in apps.items():
+            # ウォームアップ（リダイレクトキャッシュ・接続プールを温める）
+            for _ in range(args.warmup):
+                await call(app, path)
+            latency = await measure_latency(app, path, args.requests)
+            allocations = await measure_allocations(app, path, args.allocation_requests)
+            report["results"][name] = {"latency": latency, "allocations": allocations}
+            print(f"  {name}: {latency['throughput_rps']} req/s, p50 {latency['p50_ms']} ms, "
+                  f"p99 {latency['p99_ms']} ms, peak {allocations['peak_bytes_p50']} B/req", file=sys.stderr)
+    finally:
+        click_ingestor.stop()
+
+    legacy, fast = report["results"]["legacy"], report["results"]["fast"]
+    report["speedup_p50"] = round(legacy["latency"]["p50_ms"] / fast["latency"]["p50_ms"], 2) if fast["latency"]["p50_ms"] else None
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="リダイレクト処理の従来ルートと軽量ルートを比較します")
+    parser.add_argument("--requests", type=int, default=20000, help="レイテンシ計測のリクエスト数")
+    parser.add_argument("--allocation-requests", type=int, default=2000, help="メモリ割り当て計測のリクエスト数")
+    parser.add_argument("--warmup", type=int, default=500, help="ウォームアップのリクエスト数")
+    args = parser.parse_args()
+
+    init_db.init_database()
+    asyncio.run(main(args))
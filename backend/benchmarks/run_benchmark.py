@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+リダイレクト・API負荷ベンチマーク
+一時データベース（既定はSQLite、--database-url でPostgreSQL等も指定可）に
+URLとクリックを投入し、プロセス内（ASGI）クライアントでリダイレクト・作成・
+一覧・統計の各エンドポイントに負荷をかけ、スループットとp50/p95/p99を
+JSONで出力します。
+
+  python benchmarks/run_benchmark.py --urls 10000 --clicks 200000 --output result.json
+  python benchmarks/compare.py baseline.json result.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from harness import drive
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "admin123"
+
+SCENARIOS = ("redirect", "create", "list", "stats")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def seed(url_count, click_count, days, rng):
+    """URLとクリックを投入し、短縮コードの一覧を返す"""
+    from sqlalchemy import insert, select
+
+    import crud
+    from database import SessionLocal
+    from models import URL
+
+    db = SessionLocal()
+    try:
+        batch_size = 5000
+        for offset in range(0, url_count, batch_size):
+            size = min(batch_size, url_count - offset)
+            codes = crud.short_code_generator.next_codes(size)
+            db.execute(insert(URL.__table__), [
+                {"original_url": f"https://example.com/bench/{offset + i}", "short_code": code, "click_count": 0}
+                for i, code in enumerate(codes)
+            ])
+            db.commit()
+
+        url_rows = db.execute(select(URL.id, URL.short_code)).all()
+        url_ids = [row.id for row in url_rows]
+        now = datetime.utcnow()
+        span = timedelta(days=days).total_seconds()
+        for offset in range(0, click_count, 10000):
+            size = min(10000, click_count - offset)
+            records = [
+                (
+                    rng.choice(url_ids),
+                    now - timedelta(seconds=rng.random() * span),
+                    "Mozilla/5.0 (benchmark)",
+                    f"10.0.{rng.randrange(256)}.{rng.randrange(256)}",
+                    None,
+                )
+                for _ in range(size)
+            ]
+            crud.record_clicks_bulk(db, records)
+        return [row.short_code for row in url_rows]
+    finally:
+        db.close()
+
+
+async def run_scenarios(app, short_codes, args, rng):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            response = await client.post("/api/auth/login", json={"email": ADMIN_EMAIL, "password": ADMIN_PASSWORD})
+            response.raise_for_status()
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            async def redirect(index):
+                response = await client.get(f"/r/{rng.choice(short_codes)}")
+                return response.status_code in (301, 302, 307, 308)
+
+            async def create(index):
+                response = await client.post(
+                    "/api/urls", json={"original_url": f"https://example.com/created/{index}"}, headers=headers
+                )
+                return response.status_code == 201
+
+            async def list_urls(index):
+                response = await client.get("/api/urls", params={"limit": 20}, headers=headers)
+                return response.status_code == 200
+
+            async def stats(index):
+                response = await client.get("/api/stats", headers=headers)
+                return response.status_code == 200
+
+            requests = {"redirect": redirect, "create": create, "list": list_urls, "stats": stats}
+            for name in args.scenarios:
+                # ウォームアップ（キャッシュ・接続プールを温める）
+                if args.warmup:
+                    await drive(requests[name], args.concurrency, total_requests=args.warmup)
+                results[name] = await drive(
+                    requests[name], args.concurrency,
+                    duration=args.duration if args.requests is None else None,
+                    total_requests=args.requests,
+                )
+                print(f"  {name}: {results[name]['throughput_rps']} req/s, "
+                      f"p50 {results[name]['p50_ms']} ms, p99 {results[name]['p99_ms']} ms", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="リダイレクト・APIの負荷ベンチマークを実行します")
+    parser.add_argument("--database-url", help="使用するデータベース（既定: 一時SQLite。空のデータベースを指定すること）")
+    parser.add_argument("--urls", type=int, default=10000, help="投入するURL数")
+    parser.add_argument("--clicks", type=int, default=100000, help="投入するクリック数")
+    parser.add_argument("--days", type=int, default=30, help="クリックを分散させる日数")
+    parser.add_argument("--concurrency", type=int, default=16, help="同時実行数")
+    parser.add_argument("--duration", type=float, default=10.0, help="各シナリオの秒数")
+    parser.add_argument("--requests", type=int, help="各シナリオのリクエスト数（指定時は --duration より優先）")
+    parser.add_argument("--warmup", type=int, default=100, help="各シナリオのウォームアップリクエスト数")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS), help="実行するシナリオ")
+    parser.add_argument("--seed", type=int, default=42, help="乱数シード")
+    parser.add_argument("--output", help="結果JSONの出力先（省略時は標準出力）")
+    args = parser.parse_args()
+
+    # アプリケーションのimport前にデータベースを設定
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmpdir = tempfile.mkdtemp(prefix="benchmark-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmpdir}/bench.db"
+    sys.path.append(BACKEND_DIR)
+
+    import init_db
+    from config import settings
+    from database import engine
+
+    rng = random.Random(args.seed)
+
+    print("データベースを初期化しています...", file=sys.stderr)
+    # 結果JSONを標準出力に出すため、初期化時の出力は標準エラーに回す
+    with contextlib.redirect_stdout(sys.stderr):
+        init_db.init_database()
+    print(f"データを投入しています（URL: {args.urls}, クリック: {args.clicks}）...", file=sys.stderr)
+    seed_started = time.perf_counter()
+    short_codes = seed(args.urls, args.clicks, args.days, rng)
+    seed_seconds = time.perf_counter() - seed_started
+
+    from main import app
+
+    print("ベンチマークを実行しています...", file=sys.stderr)
+    results = asyncio.run(run_scenarios(app, short_codes, args, rng))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "database": engine.dialect.name,
+            "urls": args.urls,
+            "clicks": args.clicks,
+            "seed_seconds": round(seed_seconds, 2),
+            "concurrency": args.concurrency,
+            "duration_s": args.duration if args.requests is None else None,
+            "requests_per_scenario": args.requests,
+            "short_code_strategy": settings.short_code_strategy,
+        },
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"✓ 結果を {args.output} に保存しました", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+インデックス診断スクリプト
+crud.py / crud_async.py のクエリを EXPLAIN QUERY PLAN で調べ、
+行数の多いテーブルの全件走査を検出します。
+"""
+
+import argparse
+import asyncio
+import sys
+import os
+
+# プロジェクトルートをパスに追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import settings
+from utils.index_advisor import run_index_advisor
+
+def main():
+    """インデックス診断"""
+    parser = argparse.ArgumentParser(description="CRUDクエリの全件走査を検出します")
+    parser.add_argument(
+        "--threshold", type=int, default=settings.index_advisor_row_threshold,
+        help=f"警告対象とするテーブル行数（既定: {settings.index_advisor_row_threshold}）"
+    )
+    args = parser.parse_args()
+    
+    report = asyncio.run(run_index_advisor(threshold=args.threshold))
+    if report.skipped:
+        print(f"- {report.skipped}")
+        return
+    
+    print(f"{report.checked_statements} 件のクエリを確認しました（閾値: {report.threshold} 行）")
+    for finding in report.findings:
+        print(f"✗ {finding.source}: {finding.detail}（{finding.rows} 行）")
+        print(f"    {finding.statement}")
+    
+    if report.findings:
+        sys.exit(1)
+    print("✓ 全件走査は検出されませんでした")
+
+if __name__ == "__main__":
+    main()
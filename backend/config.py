@@ -2,7 +2,7 @@
 Configuration management for the URL shortener backend.
 """
 import os
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic_settings import BaseSettings
 
 
@@ -12,6 +12,26 @@ class Settings(BaseSettings):
     # データベース設定
     database_url: str = "sqlite:///./url_shortener.db"
     
+    # データベースエンジン設定
+    db_echo: bool = False  # SQLログ出力
+    db_pool_size: int = 5  # SQLite以外で使用
+    db_max_overflow: int = 10
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800  # 秒
+    
+    # SQLite PRAGMA設定（接続ごとに適用）
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout: int = 5000  # ミリ秒
+    sqlite_cache_size: int = -64000  # 負の値はKiB単位（約64MB）
+    sqlite_mmap_size: int = 268435456  # 256MB
+    sqlite_temp_store: str = "MEMORY"
+    sqlite_auto_vacuum: str = "INCREMENTAL"  # 新規DBのみ有効（既存DBは archive_clicks.py --vacuum で切り替え）
+    
+    # インデックス診断設定（EXPLAIN QUERY PLANで全件走査を検出）
+    index_advisor_on_startup: bool = False
+    index_advisor_row_threshold: int = 10000  # この行数を超えるテーブルの全件走査を警告
+    
     # アプリケーション設定
     app_name: str = "URL短縮サービス"
     app_version: str = "1.0.0"
@@ -32,6 +52,7 @@ class Settings(BaseSettings):
     cors_methods: List[str] = [
         "GET",
         "POST", 
+        "PATCH",  # URLのリダイレクト方式変更用
         "DELETE",
         "OPTIONS"  # プリフライトリクエスト用
     ]
@@ -43,28 +64,124 @@ class Settings(BaseSettings):
         "Content-Language",
         "Content-Type",
         "Authorization",  # JWT認証用
-        "X-Requested-With"  # AJAX識別用
+        "X-Requested-With",  # AJAX識別用
+        "X-SQL-Profile",  # SQLプロファイル要求用
+        "If-None-Match",  # 一覧の条件付きリクエスト用
+        "If-Modified-Since"
+    ]
+    
+    # CORSでクライアントに公開するレスポンスヘッダー
+    cors_expose_headers: List[str] = [
+        "X-Next-Cursor",  # クリック履歴のページング用
+        "ETag",  # 一覧の条件付きリクエスト用
+        "Last-Modified",
+        "X-SQL-Profile",  # SQLプロファイルの要約
+        "X-SQL-Profile-Id"  # SQLプロファイルの詳細取得用ID
     ]
     
     # URL短縮設定 - 環境変数対応
     base_url: str = os.getenv("BASE_URL", "http://localhost:8000")
     short_code_length: int = 8
+    short_code_strategy: str = "random"  # random / counter / pool
+    short_code_secret: str = ""  # counter方式の置換キー（未設定時はsecret_key、運用開始後は変更不可）
+    short_code_block_size: int = 1000  # counter / pool 方式で一度に確保する件数
+    short_code_max_retries: int = 5  # 衝突時の再試行回数
+    
+    # URL一括作成設定
+    bulk_create_max_items: int = 100000  # 1リクエストあたりの最大件数
+    bulk_create_chunk_size: int = 500  # 1トランザクションで挿入する件数
+    bulk_create_max_body_bytes: int = 10 * 1024 * 1024  # JSON配列形式の本文・NDJSONの1行の最大バイト数
+    
+    # クリック履歴エクスポート設定
+    export_chunk_size: int = 5000  # サーバーサイドカーソルから一度に取得する行数
+    export_gzip_level: int = 6  # gzip圧縮レベル（1〜9）
+    
+    # リダイレクトキャッシュ設定（短縮コード → URL）
+    redirect_cache_size: int = 100000
+    redirect_cache_ttl: int = 300  # 秒
+    redirect_cache_negative_ttl: int = 30  # 存在しないコードのキャッシュ秒数
+    fast_redirect_enabled: bool = True  # 依存性解決を経由しない軽量なリダイレクトルートを使用
+    
+    # リダイレクトのHTTPキャッシュ設定（URLごとの redirect_policy が未設定の場合は既定値を使用）
+    # tracked: 毎回サーバーで計測（Cache-Control: no-store）
+    # permanent: ブラウザ・nginxにキャッシュさせる（2回目以降のクリックは計測されない）
+    redirect_default_policy: str = "tracked"
+    redirect_tracked_status: int = 307  # 302 または 307
+    redirect_permanent_status: int = 301  # 301 または 308
+    redirect_permanent_max_age: int = 86400  # 秒
+    
+    # ワーカー間のキャッシュ破棄伝搬設定（cache_invalidations テーブルをポーリング）
+    cache_sync_interval: float = 1.0  # 秒（0で無効）
+    cache_sync_retention: int = 3600  # 破棄ログの保持秒数
+    # 読み取り済みの最大IDより手前を再走査する件数（PostgreSQLではIDの採番順とコミット順が一致しないため）
+    cache_sync_lookback: int = 1000
+    
+    # クリック記録設定（バックグラウンドでバッチ書き込み）
+    click_batch_size: int = 500
+    click_flush_interval: float = 1.0  # 秒
+    click_queue_max_size: int = 100000  # 0は無制限
+    click_flush_retries: int = 3  # 書き込み失敗時の再試行回数（超えたバッチは破棄）
+    click_flush_retry_backoff: float = 0.5  # 最初の再試行までの秒数（再試行ごとに倍）
+    click_drain_timeout: float = 10.0  # 停止時に残りのイベントを書き込む最大待ち時間（秒）
+    # UserAgent・リファラは辞書テーブル（user_agents・referrers）のIDで保存する
+    click_dictionary_cache_size: int = 10000  # 文字列 → IDのキャッシュ件数（種類ごと）
+    click_dictionary_cache_ttl: int = 86400  # 秒
+    
+    # クリック履歴の保持設定（archive_clicks.py を定期実行）
+    # 保持期間を過ぎたクリックは日別の gzip NDJSON ファイルに書き出してから削除する（集計は残る）
+    click_retention_days: int = 90  # 0で無効
+    click_archive_dir: str = "./data/archive/clicks"
+    click_delete_batch_size: int = 5000  # 1トランザクションで削除する行数（URL削除時も使用）
+    sqlite_vacuum_step_pages: int = 1000  # 削除後の incremental_vacuum で1回に解放するページ数
+    
+    # ユニーク訪問者数の推定設定（HyperLogLog、(IPアドレス, UserAgent) を日別に集計）
+    # 相対標準誤差は 1.04/√(2^精度)（14で約0.8%、12で約1.6%）。変更後は backfill_click_rollups.py で再構築すること
+    visitor_sketch_precision: int = 14
+    
+    # 急上昇URL設定（直近5分・1時間・24時間のクリック上位、Space-Saving による近似）
+    trending_capacity: int = 200  # 時間窓のスロットごとに追跡するURL数（表示件数より十分大きくする）
+    trending_checkpoint_interval: float = 30.0  # 集計状態の保存間隔（秒、0で無効）
     
     # JWT認証設定
     secret_key: str = "your-secret-key-change-this-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    auth_cache_size: int = 10000  # 検証済みトークン・ユーザーのキャッシュ件数
+    auth_cache_ttl: int = 60  # 秒（トークンの有効期限を超えてはキャッシュしない）
     
     # セキュリティ設定
-    bcrypt_rounds: int = 12
+    bcrypt_rounds: int = 12  # 変更後は次回ログイン時に再ハッシュ化される
+    password_hash_workers: int = 4  # bcryptを実行するスレッド数（同時実行数の上限）
+    password_hash_max_queue: int = 64  # 実行待ちの上限（超過したログインは503）
     
     # ページネーション設定
     default_page_size: int = 20
     max_page_size: int = 100
+    max_click_page_size: int = 1000
+    url_count_cache_ttl: int = 30  # URL総数のキャッシュ秒数
+    
+    # クリック時系列設定（/api/urls/{id}/timeseries・/api/stats/timeseries）
+    timeseries_default_timezone: str = "Asia/Tokyo"
+    timeseries_max_points: int = 10000  # 1回に返す区間数の上限
+    
+    # メトリクス設定（/api/metrics）
+    metrics_enabled: bool = True
+    
+    # SQLプロファイラー設定（リクエストごとのSQL記録・N+1検出）
+    sql_profiler_enabled: bool = False  # 全リクエストを記録
+    sql_profiler_sample_rate: float = 0.0  # 記録するリクエストの割合（0〜1、本番でのサンプリング用）
+    sql_profiler_allow_header: bool = False  # X-SQL-Profile: 1 での記録を許可（debug時は常に許可）
+    sql_profiler_slow_ms: float = 100.0  # この時間以上のSQLを低速として報告
+    sql_profiler_repeat_threshold: int = 5  # 同じ形のSQLがこの回数以上でN+1として報告
+    sql_profiler_history_size: int = 200  # デバッグAPIで参照できる直近の記録数
     
     # ログ設定
     log_level: str = "INFO"
-    log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    log_format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"  # log_json=False の場合
+    log_json: bool = True  # 1行1レコードのJSONで出力
+    log_queue_size: int = 10000  # 出力待ちの上限（超過したレコードは破棄）
+    # ロガー名（前方一致）ごとのINFO以下の出力割合（WARNING以上は常に出力）
+    log_sample_rates: Dict[str, float] = {"api.redirect": 0.01}
     
     # 環境変数から設定を読み込み
     class Config:
@@ -79,6 +196,7 @@ settings = Settings()
 if os.getenv("ENVIRONMENT") == "development":
     settings.debug = True
     settings.log_level = "DEBUG"
+    settings.db_echo = True
 
 # 本番環境での設定上書き
 if os.getenv("ENVIRONMENT") == "production":
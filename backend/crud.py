@@ -1,14 +1,53 @@
-import secrets
-import string
-from typing import List, Optional
+import hashlib
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
-from models import URL, Click, User
+from sqlalchemy import bindparam, delete, desc, func, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal
+from models import URL, Click, User, ClickRollupHourly, ClickRollupDaily, ClickArchiveCount, ClickVisitorSketch, UserAgent, Referrer, ShortCodeSequence, ReservedShortCode, CacheInvalidation
 from schemas import URLCreate, ClickCreate, UserCreate
 from passlib.context import CryptContext
+from config import settings
+from utils.cache import TTLCache, MISSING
+from utils.hyperloglog import HyperLogLog, hash_item
+from utils.packed_ip import pack_ip, unpack_ip
+from utils.password_hashing import PasswordHasher
+from utils.short_codes import build_short_code_generator
+
+logger = logging.getLogger(__name__)
 
 # パスワードハッシュ化設定
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
+
+# 非同期処理からのハッシュ化・検証はスレッドプールで実行する（イベントループを止めない）
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=settings.password_hash_workers,
+    max_queue=settings.password_hash_max_queue,
+)
+
+# リダイレクト用キャッシュ（short_code → (url_id, original_url)、未登録コードはNone）
+redirect_cache = TTLCache(maxsize=settings.redirect_cache_size, ttl=settings.redirect_cache_ttl)
+
+# URL総数のキャッシュ（一覧取得ごとのCOUNT(*)を避ける）
+url_count_cache = TTLCache(maxsize=1, ttl=settings.url_count_cache_ttl)
+
+# 認証済みユーザーのキャッシュ（email → UserResponse）
+# ユーザー情報を変更する処理ではコミット前に invalidate_user を呼ぶこと
+user_cache = TTLCache(maxsize=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+
+def invalidate_user(db: Session, email: str) -> None:
+    """ユーザーのキャッシュを破棄し、他のワーカーにも伝える（呼び出し側のトランザクションで記録される）"""
+    publish_cache_invalidation(db, "user", email)
+    user_cache.invalidate(email)
+
+def publish_cache_invalidation(db: Session, cache_name: str, cache_key: str) -> None:
+    """他のワーカーにキャッシュ破棄を伝える（呼び出し側のトランザクションで記録される）"""
+    db.add(CacheInvalidation(cache_name=cache_name, cache_key=cache_key))
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """パスワード検証"""
@@ -18,6 +57,11 @@ def get_password_hash(password: str) -> str:
     """パスワードハッシュ化"""
     return pwd_context.hash(password)
 
+# クリックのUserAgent・リファラ辞書（文字列 → 辞書テーブルのID）
+# IDは変わらないため、ワーカー間のキャッシュ破棄は不要
+user_agent_ids = TTLCache(maxsize=settings.click_dictionary_cache_size, ttl=settings.click_dictionary_cache_ttl)
+referrer_ids = TTLCache(maxsize=settings.click_dictionary_cache_size, ttl=settings.click_dictionary_cache_ttl)
+
 # ユーザー関連のCRUD操作
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
     """メールアドレスでユーザーを取得"""
@@ -31,6 +75,7 @@ def create_user(db: Session, user: UserCreate) -> User:
         hashed_password=hashed_password
     )
     db.add(db_user)
+    invalidate_user(db, db_user.email)
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -42,91 +87,598 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
         return None
     return user
 
-def generate_short_code(length: int = 8) -> str:
-    """短縮コードを生成する"""
-    characters = string.ascii_letters + string.digits
-    return ''.join(secrets.choice(characters) for _ in range(length))
+# 短縮コード生成関連の操作
+def allocate_short_code_block(db: Session, name: str, size: int) -> int:
+    """カウンターから size 件分のブロックを確保し、先頭の値を返す"""
+    for _ in range(2):
+        result = db.execute(
+            update(ShortCodeSequence)
+            .where(ShortCodeSequence.name == name)
+            .values(next_value=ShortCodeSequence.next_value + size)
+        )
+        if result.rowcount:
+            next_value = db.query(ShortCodeSequence.next_value).filter(ShortCodeSequence.name == name).scalar()
+            db.commit()
+            return next_value - size
+        # 初回はカウンター行を作成（同時作成時は更新からやり直す）
+        try:
+            db.add(ShortCodeSequence(name=name, next_value=size))
+            db.commit()
+            return 0
+        except IntegrityError:
+            db.rollback()
+    raise RuntimeError(f"failed to allocate short code block: {name}")
+
+def take_reserved_short_codes(db: Session, count: int) -> List[str]:
+    """予約コードのプールから最大 count 件を取り出す"""
+    pool = ReservedShortCode.__table__
+    result = db.execute(
+        delete(pool)
+        .where(pool.c.code.in_(select(pool.c.code).limit(count).scalar_subquery()))
+        .returning(pool.c.code)
+    )
+    codes = list(result.scalars().all())
+    db.commit()
+    return codes
+
+def add_reserved_short_codes(db: Session, codes: Sequence[str]) -> int:
+    """予約コードをプールに追加する（使用済み・登録済みのコードは除外）"""
+    existing = set(db.scalars(select(URL.short_code).where(URL.short_code.in_(codes))))
+    existing.update(db.scalars(select(ReservedShortCode.code).where(ReservedShortCode.code.in_(codes))))
+    new_codes = sorted(set(codes) - existing)
+    if new_codes:
+        db.execute(insert(ReservedShortCode.__table__), [{"code": code} for code in new_codes])
+    db.commit()
+    return len(new_codes)
+
+def _allocate_short_code_block(size: int) -> int:
+    with SessionLocal() as db:
+        return allocate_short_code_block(db, f"short_code:{settings.short_code_length}", size)
 
-def get_unique_short_code(db: Session, length: int = 8) -> str:
-    """重複しない短縮コードを生成する"""
-    while True:
-        short_code = generate_short_code(length)
-        if not get_url_by_short_code(db, short_code):
-            return short_code
+def _take_reserved_short_codes(count: int) -> List[str]:
+    with SessionLocal() as db:
+        return take_reserved_short_codes(db, count)
+
+# 短縮コード生成器（settings.short_code_strategy で方式を選択）
+short_code_generator = build_short_code_generator(
+    strategy=settings.short_code_strategy,
+    length=settings.short_code_length,
+    key=(settings.short_code_secret or settings.secret_key).encode("utf-8"),
+    block_size=settings.short_code_block_size,
+    allocate_block=_allocate_short_code_block,
+    take_codes=_take_reserved_short_codes,
+)
 
 # URL関連のCRUD操作
 def create_url(db: Session, url_create: URLCreate) -> URL:
-    """新しいURLを作成する"""
-    short_code = get_unique_short_code(db)
-    db_url = URL(
-        original_url=str(url_create.original_url),
-        short_code=short_code
-    )
-    db.add(db_url)
-    db.commit()
-    db.refresh(db_url)
-    return db_url
+    """新しいURLを作成する（短縮コード衝突時は再生成して再試行）"""
+    for attempt in range(settings.short_code_max_retries):
+        db_url = URL(
+            original_url=str(url_create.original_url),
+            redirect_policy=url_create.redirect_policy,
+            short_code=short_code_generator.next_code()
+        )
+        db.add(db_url)
+        publish_cache_invalidation(db, "redirect", db_url.short_code)
+        publish_cache_invalidation(db, "url_count", "*")
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            if attempt + 1 >= settings.short_code_max_retries:
+                raise
+            continue
+        db.refresh(db_url)
+        # 生成前に存在しないコードとしてキャッシュされている可能性があるため破棄
+        redirect_cache.invalidate(db_url.short_code)
+        url_count_cache.clear()
+        return db_url
 
 def get_url_by_short_code(db: Session, short_code: str) -> Optional[URL]:
     """短縮コードでURLを取得する"""
     return db.query(URL).filter(URL.short_code == short_code).first()
 
+def resolve_short_code(db: Session, short_code: str) -> Optional[Tuple[int, str, str]]:
+    """短縮コードから (url_id, original_url, redirect_policy) を解決する（キャッシュ経由）"""
+    cached = redirect_cache.get(short_code)
+    if cached is not MISSING:
+        return cached
+    
+    row = db.query(URL.id, URL.original_url, URL.redirect_policy).filter(URL.short_code == short_code).first()
+    if row is None:
+        redirect_cache.set(short_code, None, ttl=settings.redirect_cache_negative_ttl)
+        return None
+    
+    resolved = (row.id, row.original_url, row.redirect_policy or settings.redirect_default_policy)
+    redirect_cache.set(short_code, resolved)
+    return resolved
+
 def get_url_by_id(db: Session, url_id: int) -> Optional[URL]:
     """IDでURLを取得する"""
     return db.query(URL).filter(URL.id == url_id).first()
 
-def get_urls(db: Session, skip: int = 0, limit: int = 100) -> List[URL]:
-    """URL一覧を取得する"""
-    return db.query(URL).order_by(desc(URL.created_at)).offset(skip).limit(limit).all()
-
-def get_urls_count(db: Session) -> int:
-    """URL総数を取得する"""
-    return db.query(URL).count()
-
 def delete_url(db: Session, url_id: int) -> bool:
-    """URLを削除する（関連するクリックも削除）"""
-    # 関連するクリックを先に削除
-    db.query(Click).filter(Click.url_id == url_id).delete()
-    
-    # URLを削除
+    """URLを削除する（関連するクリック・集計も削除）"""
     url = get_url_by_id(db, url_id)
-    if url:
-        db.delete(url)
+    if url is None:
+        return False
+    
+    # ORMのカスケード（クリックの読み込み）を避けるため一括削除する
+    # クリックは一定件数ずつ削除・コミットし、書き込みロックを長時間保持しない
+    short_code = url.short_code
+    batch_size = settings.click_delete_batch_size
+    while db.execute(clicks_batch_delete(Click.url_id == url_id, batch_size)).rowcount >= batch_size:
         db.commit()
-        return True
-    return False
+    db.query(Click).filter(Click.url_id == url_id).delete(synchronize_session=False)
+    db.query(ClickRollupHourly).filter(ClickRollupHourly.url_id == url_id).delete(synchronize_session=False)
+    db.query(ClickRollupDaily).filter(ClickRollupDaily.url_id == url_id).delete(synchronize_session=False)
+    db.query(ClickVisitorSketch).filter(ClickVisitorSketch.url_id == url_id).delete(synchronize_session=False)
+    db.query(ClickArchiveCount).filter(ClickArchiveCount.url_id == url_id).delete(synchronize_session=False)
+    db.query(URL).filter(URL.id == url_id).delete(synchronize_session=False)
+    publish_cache_invalidation(db, "redirect", short_code)
+    publish_cache_invalidation(db, "url_count", "*")
+    db.commit()
+    redirect_cache.invalidate(short_code)
+    url_count_cache.clear()
+    return True
 
 def increment_click_count(db: Session, url_id: int) -> bool:
-    """クリック数をインクリメントする"""
-    url = get_url_by_id(db, url_id)
-    if url:
-        url.click_count += 1
+    """クリック数をインクリメントする（SQL側で原子的に加算）"""
+    result = db.execute(
+        update(URL.__table__)
+        .where(URL.__table__.c.id == url_id)
+        .values(click_count=URL.__table__.c.click_count + 1)
+    )
+    db.commit()
+    return result.rowcount > 0
+
+def find_click_count_mismatches(db: Session) -> List[Tuple[int, int, int]]:
+    """clicksテーブルの件数（アーカイブ済みの件数を含む）と一致しないクリック数を検出する
+
+    Returns: (url_id, 現在のclick_count, 実際のクリック件数) のリスト
+    """
+    actual = (
+        db.query(Click.url_id, func.count().label("clicks"))
+        .group_by(Click.url_id)
+        .subquery()
+    )
+    actual_count = func.coalesce(actual.c.clicks, 0) + func.coalesce(ClickArchiveCount.clicks, 0)
+    rows = (
+        db.query(URL.id, URL.click_count, actual_count)
+        .outerjoin(actual, actual.c.url_id == URL.id)
+        .outerjoin(ClickArchiveCount, ClickArchiveCount.url_id == URL.id)
+        .filter(URL.click_count != actual_count)
+        .order_by(URL.id)
+        .all()
+    )
+    return [(url_id, click_count, clicks) for url_id, click_count, clicks in rows]
+
+def reconcile_click_counts(db: Session) -> List[Tuple[int, int, int]]:
+    """クリック数をclicksテーブルの件数（アーカイブ済みの件数を含む）で再計算して修正する"""
+    mismatches = find_click_count_mismatches(db)
+    if mismatches:
+        urls = URL.__table__
+        db.execute(
+            update(urls)
+            .where(urls.c.id == bindparam("b_url_id"))
+            .values(click_count=bindparam("b_count")),
+            [{"b_url_id": url_id, "b_count": clicks} for url_id, _, clicks in mismatches],
+        )
         db.commit()
-        return True
-    return False
+    return mismatches
 
 # クリック関連のCRUD操作
+def _string_hash(value: str) -> int:
+    """辞書テーブルのキーにする64bitハッシュ値（BIGINTに収まる符号付き整数）"""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+class StringDictionary:
+    """辞書テーブル（UserAgent・リファラ）で文字列をIDに置き換える"""
+
+    def __init__(self, model, cache: TTLCache):
+        self.model = model
+        self.cache = cache
+
+    def _lookup(self, db: Session, by_hash: Dict[int, str], ids: Dict[str, int]) -> None:
+        table = self.model.__table__
+        rows = db.execute(
+            select(table.c.id, table.c.value_hash, table.c.value).where(table.c.value_hash.in_(list(by_hash)))
+        )
+        for row_id, value_hash, value in rows:
+            expected = by_hash.pop(value_hash)
+            if value == expected:
+                ids[value] = row_id
+            else:
+                # 64bitハッシュの衝突（実質的に起こらない）。この文字列は記録しない
+                logger.warning("Hash collision in %s; value not stored", table.name)
+
+    def resolve(self, db: Session, values: Iterable[Optional[str]]) -> Dict[str, int]:
+        """文字列のIDを取得する（未登録の文字列は登録する。コミットは呼び出し側）
+
+        新しく登録したIDはコミット前のため、キャッシュには remember() で後から登録する。
+        """
+        ids: Dict[str, int] = {}
+        missing: Dict[int, str] = {}
+        for value in set(values):
+            if value is None:
+                continue
+            cached = self.cache.get(value)
+            if cached is MISSING:
+                missing[_string_hash(value)] = value
+            else:
+                ids[value] = cached
+        if missing:
+            self._lookup(db, missing, ids)
+        if missing:
+            table = self.model.__table__
+            db.execute(
+                _dialect_insert(db)(table).on_conflict_do_nothing(index_elements=[table.c.value_hash]),
+                [{"value_hash": value_hash, "value": value} for value_hash, value in missing.items()],
+            )
+            self._lookup(db, missing, ids)
+        return ids
+
+    def remember(self, ids: Dict[str, int]) -> None:
+        """コミット済みのIDをキャッシュに登録する"""
+        for value, row_id in ids.items():
+            self.cache.set(value, row_id)
+
+user_agent_dictionary = StringDictionary(UserAgent, user_agent_ids)
+referrer_dictionary = StringDictionary(Referrer, referrer_ids)
+
 def create_click(db: Session, url_id: int, click_data: ClickCreate) -> Click:
     """新しいクリックを記録する"""
+    user_agents = user_agent_dictionary.resolve(db, [click_data.user_agent])
+    referrers = referrer_dictionary.resolve(db, [click_data.referrer])
     db_click = Click(
         url_id=url_id,
-        user_agent=click_data.user_agent,
-        ip_address=click_data.ip_address,
-        referrer=click_data.referrer
+        clicked_at=datetime.utcnow(),
+        user_agent_id=user_agents.get(click_data.user_agent),
+        ip=pack_ip(click_data.ip_address),
+        referrer_id=referrers.get(click_data.referrer)
     )
     db.add(db_click)
+    add_click_rollups(db, [(url_id, db_click.clicked_at)])
+    add_visitor_sketches(db, [(url_id, db_click.clicked_at, click_data.user_agent, click_data.ip_address)])
     db.commit()
+    user_agent_dictionary.remember(user_agents)
+    referrer_dictionary.remember(referrers)
     db.refresh(db_click)
     return db_click
 
-def get_clicks_by_url(db: Session, url_id: int, skip: int = 0, limit: int = 100) -> List[Click]:
-    """特定URLのクリック履歴を取得する"""
-    return db.query(Click).filter(Click.url_id == url_id).order_by(desc(Click.clicked_at)).offset(skip).limit(limit).all()
+def record_clicks_bulk(db: Session, records: Sequence[tuple]) -> None:
+    """クリックをまとめて記録し、URLごとのクリック数を一括加算する
+
+    records: (url_id, clicked_at, user_agent, ip_address, referrer) のタプル列
+    UserAgent・リファラは辞書テーブルのIDに、IPアドレスはバイト列にして保存する。
+    """
+    user_agents = user_agent_dictionary.resolve(db, (record[2] for record in records))
+    referrers = referrer_dictionary.resolve(db, (record[4] for record in records))
+    db.execute(
+        insert(Click.__table__),
+        [
+            {
+                "url_id": url_id,
+                "clicked_at": clicked_at,
+                "user_agent_id": user_agents.get(user_agent),
+                "ip": pack_ip(ip_address),
+                "referrer_id": referrers.get(referrer),
+            }
+            for url_id, clicked_at, user_agent, ip_address, referrer in records
+        ],
+    )
+    
+    counts = Counter(record[0] for record in records)
+    urls = URL.__table__
+    db.execute(
+        update(urls)
+        .where(urls.c.id == bindparam("b_url_id"))
+        .values(click_count=urls.c.click_count + bindparam("b_count")),
+        [{"b_url_id": url_id, "b_count": count} for url_id, count in counts.items()],
+    )
+    add_click_rollups(db, [(record[0], record[1]) for record in records])
+    add_visitor_sketches(db, records)
+    db.commit()
+    # 登録した辞書のIDはコミット後にキャッシュする（ロールバックされたIDを使わないため）
+    user_agent_dictionary.remember(user_agents)
+    referrer_dictionary.remember(referrers)
+
+# クリック集計（ロールアップ）関連の操作
+def _truncate_to_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+def _truncate_to_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _dialect_insert(db: Session):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+def _upsert_rollup_counts(db: Session, model, counts: Dict[Tuple[int, datetime], int]) -> None:
+    """集計テーブルに件数を加算する（存在しない行は作成）"""
+    if not counts:
+        return
+    table = model.__table__
+    stmt = _dialect_insert(db)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.url_id, table.c.bucket_start],
+        set_={"clicks": table.c.clicks + stmt.excluded.clicks},
+    )
+    db.execute(
+        stmt,
+        [
+            {"url_id": url_id, "bucket_start": bucket_start, "clicks": clicks}
+            for (url_id, bucket_start), clicks in counts.items()
+        ],
+    )
+
+def add_click_rollups(db: Session, clicks: Sequence[Tuple[int, datetime]]) -> None:
+    """クリック (url_id, clicked_at) を時間別・日別集計に加算する（コミットは呼び出し側）"""
+    hourly: Counter = Counter()
+    daily: Counter = Counter()
+    for url_id, clicked_at in clicks:
+        hourly[(url_id, _truncate_to_hour(clicked_at))] += 1
+        daily[(url_id, _truncate_to_day(clicked_at))] += 1
+    _upsert_rollup_counts(db, ClickRollupHourly, hourly)
+    _upsert_rollup_counts(db, ClickRollupDaily, daily)
+
+# ユニーク訪問者スケッチ関連の操作
+# 全URL合計のスケッチの url_id
+ALL_URLS_SKETCH_ID = 0
+
+def visitor_key(ip_address: Optional[str], user_agent: Optional[str]) -> str:
+    """訪問者の識別に使う値（IPアドレスとUserAgentの組）"""
+    return f"{ip_address or ''}\x00{user_agent or ''}"
+
+def _merge_visitor_sketches(db: Session, hashes: Dict[Tuple[int, datetime], set]) -> None:
+    """(url_id, 日) ごとの訪問者ハッシュを保存済みのスケッチに加える"""
+    table = ClickVisitorSketch.__table__
+    keys = sorted(hashes)
+    # 未作成の行を空のスケッチで作成してから行ロックを取得する
+    # （スケッチの加算はSQLで表せないため、他のワーカーと読み書きが交差しないようにする）
+    empty = HyperLogLog(settings.visitor_sketch_precision).to_bytes()
+    db.execute(
+        _dialect_insert(db)(table).on_conflict_do_nothing(index_elements=[table.c.url_id, table.c.bucket_start]),
+        [{"url_id": url_id, "bucket_start": bucket_start, "sketch": empty} for url_id, bucket_start in keys],
+    )
+    rows = db.execute(
+        select(table.c.url_id, table.c.bucket_start, table.c.sketch)
+        .where(tuple_(table.c.url_id, table.c.bucket_start).in_(keys))
+        .order_by(table.c.url_id, table.c.bucket_start)
+        .with_for_update()
+    )
+
+    updates = []
+    for url_id, bucket_start, data in rows:
+        sketch = HyperLogLog.from_bytes(data)
+        changed = False
+        for value in hashes[(url_id, bucket_start)]:
+            changed = sketch.add_hash(value) or changed
+        # 既存の訪問者のみの場合はレジスタが変わらないため書き込まない
+        if changed:
+            updates.append({"b_url_id": url_id, "b_bucket_start": bucket_start, "b_sketch": sketch.to_bytes()})
+    if updates:
+        db.execute(
+            update(table)
+            .where(table.c.url_id == bindparam("b_url_id"), table.c.bucket_start == bindparam("b_bucket_start"))
+            .values(sketch=bindparam("b_sketch")),
+            updates,
+        )
+
+def add_visitor_sketches(db: Session, clicks: Sequence[tuple]) -> None:
+    """クリックをURL別・全体の日別ユニーク訪問者スケッチに加える（コミットは呼び出し側）
+
+    clicks: (url_id, clicked_at, user_agent, ip_address, ...) のタプル列
+    """
+    hashes: Dict[Tuple[int, datetime], set] = defaultdict(set)
+    for url_id, clicked_at, user_agent, ip_address, *_ in clicks:
+        value = hash_item(visitor_key(ip_address, user_agent))
+        day = _truncate_to_day(clicked_at)
+        hashes[(url_id, day)].add(value)
+        hashes[(ALL_URLS_SKETCH_ID, day)].add(value)
+    if hashes:
+        _merge_visitor_sketches(db, hashes)
+
+def rebuild_visitor_sketches(db: Session) -> int:
+    """clicksテーブルからユニーク訪問者スケッチを再構築する
+
+    URL順・日時順に読み、URL別のスケッチは1つずつ、全体のスケッチは日ごとに保持する。
+    clicks に残っている最も古い日以降を再構築する（アーカイブ済みの日のスケッチは残す）。
+    Returns: 作成したスケッチの行数
+    """
+    precision = settings.visitor_sketch_precision
+    since = get_first_click_day(db)
+    if since is None:
+        return 0
+    db.execute(delete(ClickVisitorSketch).where(ClickVisitorSketch.bucket_start >= since))
+
+    rows: List[dict] = []
+    totals: Dict[datetime, HyperLogLog] = {}
+    current_key = None
+    current: Optional[HyperLogLog] = None
+    stmt = (
+        select(Click.url_id, Click.clicked_at, Click.ip, UserAgent.value)
+        .outerjoin(UserAgent, UserAgent.id == Click.user_agent_id)
+        .where(Click.clicked_at >= since)
+        .order_by(Click.url_id, Click.clicked_at)
+        .execution_options(yield_per=settings.export_chunk_size)
+    )
+    for url_id, clicked_at, ip, user_agent in db.execute(stmt):
+        key = (url_id, _truncate_to_day(clicked_at))
+        if key != current_key:
+            if current is not None:
+                rows.append({"url_id": current_key[0], "bucket_start": current_key[1], "sketch": current.to_bytes()})
+            current_key, current = key, HyperLogLog(precision)
+        value = hash_item(visitor_key(unpack_ip(ip), user_agent))
+        current.add_hash(value)
+        total = totals.get(key[1])
+        if total is None:
+            total = totals[key[1]] = HyperLogLog(precision)
+        total.add_hash(value)
+    if current is not None:
+        rows.append({"url_id": current_key[0], "bucket_start": current_key[1], "sketch": current.to_bytes()})
+    rows.extend(
+        {"url_id": ALL_URLS_SKETCH_ID, "bucket_start": day, "sketch": sketch.to_bytes()}
+        for day, sketch in totals.items()
+    )
+    if rows:
+        db.execute(insert(ClickVisitorSketch.__table__), rows)
+    db.commit()
+    return len(rows)
+
+# SQLiteで区間の開始時刻を表す書式（SQLAlchemyのSQLite DateTime格納形式に合わせる）
+_SQLITE_BUCKET_PATTERNS = {
+    "minute": "%Y-%m-%d %H:%M:00.000000",
+    "hour": "%Y-%m-%d %H:00:00.000000",
+    "day": "%Y-%m-%d 00:00:00.000000",
+}
+
+def bucket_expression(db: Session, column, unit: str):
+    """SQL側で時刻を分・時・日単位に切り捨てる式"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(unit, column)
+    return func.strftime(_SQLITE_BUCKET_PATTERNS[unit], column)
+
+def bucket_value(value) -> datetime:
+    """SQLの区間開始（SQLiteは文字列）をタイムゾーンなしUTCの datetime にする"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+def get_first_click_day(db: Session) -> Optional[datetime]:
+    """clicksテーブルに残っている最も古いクリックの日（UTC）"""
+    first = db.scalar(select(func.min(Click.clicked_at)))
+    return _truncate_to_day(bucket_value(first)) if first is not None else None
+
+def rebuild_click_rollups(
+    db: Session, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> Tuple[int, int]:
+    """clicksテーブルから集計テーブルを再構築する
+
+    期間省略時は clicks に残っている最も古い日以降を再構築する（アーカイブ済みの日の集計は残す）。
+    since / until は日の境界（UTC）を指定すること。
+    Returns: (時間別の行数, 日別の行数)
+    """
+    if since is None:
+        since = get_first_click_day(db)
+        if since is None:
+            return 0, 0
+    row_counts = []
+    for model, unit in ((ClickRollupHourly, "hour"), (ClickRollupDaily, "day")):
+        bucket = bucket_expression(db, Click.clicked_at, unit)
+        in_range = [Click.clicked_at >= since]
+        stale = delete(model).where(model.bucket_start >= since)
+        if until is not None:
+            in_range.append(Click.clicked_at < until)
+            stale = stale.where(model.bucket_start < until)
+        db.execute(stale)
+        result = db.execute(
+            insert(model.__table__).from_select(
+                ["url_id", "bucket_start", "clicks"],
+                select(Click.url_id, bucket, func.count())
+                .where(*in_range)
+                .group_by(Click.url_id, bucket),
+            )
+        )
+        row_counts.append(result.rowcount)
+    db.commit()
+    return row_counts[0], row_counts[1]
+
+# クリック履歴の保持（アーカイブ）関連の操作
+def clicks_batch_delete(condition, batch_size: int):
+    """条件に合うクリックを最大 batch_size 件削除する文"""
+    return delete(Click).where(Click.id.in_(select(Click.id).where(condition).limit(batch_size)))
+
+def get_click_days_before(db: Session, cutoff: datetime) -> List[Tuple[datetime, int]]:
+    """cutoff より前のクリックがある日（UTC）とその件数（古い順）"""
+    bucket = bucket_expression(db, Click.clicked_at, "day")
+    rows = db.execute(
+        select(bucket, func.count())
+        .where(Click.clicked_at < cutoff)
+        .group_by(bucket)
+        .order_by(bucket)
+    ).all()
+    return [(bucket_value(day), clicks) for day, clicks in rows]
+
+def find_rollup_mismatches(db: Session, day: datetime) -> List[Tuple[int, int, int]]:
+    """指定日（UTC）の日別集計がクリック件数と一致しないURLを検出する
+
+    Returns: (url_id, 集計の件数, 実際のクリック件数) のリスト
+    """
+    next_day = day + timedelta(days=1)
+    actual = dict(db.execute(
+        select(Click.url_id, func.count())
+        .where(Click.clicked_at >= day, Click.clicked_at < next_day)
+        .group_by(Click.url_id)
+    ).all())
+    rolled = dict(db.execute(
+        select(ClickRollupDaily.url_id, ClickRollupDaily.clicks).where(ClickRollupDaily.bucket_start == day)
+    ).all())
+    return [
+        (url_id, rolled.get(url_id, 0), actual.get(url_id, 0))
+        for url_id in sorted(actual.keys() | rolled.keys())
+        if rolled.get(url_id, 0) != actual.get(url_id, 0)
+    ]
+
+def stream_clicks_for_archive(db: Session, start: datetime, end: datetime, chunk_size: int):
+    """期間内のクリックを古い順に取得する（サーバーサイドカーソル）"""
+    stmt = (
+        select(
+            Click.id, Click.url_id, URL.short_code, Click.clicked_at,
+            UserAgent.value.label("user_agent"), Click.ip, Referrer.value.label("referrer"),
+        )
+        .outerjoin(URL, URL.id == Click.url_id)
+        .outerjoin(UserAgent, UserAgent.id == Click.user_agent_id)
+        .outerjoin(Referrer, Referrer.id == Click.referrer_id)
+        .where(Click.clicked_at >= start, Click.clicked_at < end)
+        .order_by(Click.clicked_at, Click.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    return db.execute(stmt)
+
+def purge_archived_clicks(db: Session, start: datetime, end: datetime, batch_size: int) -> int:
+    """アーカイブ済みの期間のクリックを最大 batch_size 件削除し、URL別のアーカイブ件数に加算してコミットする
+
+    Returns: 削除した件数
+    """
+    rows = db.execute(
+        select(Click.id, Click.url_id)
+        .where(Click.clicked_at >= start, Click.clicked_at < end)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return 0
+    db.execute(delete(Click).where(Click.id.in_([click_id for click_id, _ in rows])))
+
+    counts = Counter(url_id for _, url_id in rows)
+    table = ClickArchiveCount.__table__
+    stmt = _dialect_insert(db)(table)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[table.c.url_id],
+            set_={"clicks": table.c.clicks + stmt.excluded.clicks},
+        ),
+        [{"url_id": url_id, "clicks": clicks} for url_id, clicks in counts.items()],
+    )
+    db.commit()
+    return len(rows)
 
 # 統計関連の操作
 def get_total_clicks(db: Session) -> int:
-    """総クリック数を取得する"""
-    return db.query(Click).count()
+    """総クリック数を取得する（日別集計から算出）"""
+    return db.query(func.coalesce(func.sum(ClickRollupDaily.clicks), 0)).scalar()
+
+def get_daily_clicks(db: Session, since: datetime) -> List[Tuple[datetime, int]]:
+    """日別の総クリック数を取得する"""
+    return [
+        (bucket_start, clicks)
+        for bucket_start, clicks in db.query(ClickRollupDaily.bucket_start, func.sum(ClickRollupDaily.clicks))
+        .filter(ClickRollupDaily.bucket_start >= since)
+        .group_by(ClickRollupDaily.bucket_start)
+        .order_by(ClickRollupDaily.bucket_start)
+        .all()
+    ]
 
 def get_top_urls(db: Session, limit: int = 10) -> List[URL]:
     """クリック数上位のURLを取得する"""
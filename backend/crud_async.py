@@ -0,0 +1,416 @@
+"""
+Async CRUD operations (AsyncSession versions of crud.py).
+"""
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Row, delete, desc, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models import URL, Click, User, ClickRollupHourly, ClickRollupDaily, ClickArchiveCount, ClickVisitorSketch, UserAgent, Referrer
+from schemas import URLCreate, ClickCreate, UserCreate, UserResponse
+from config import settings
+from utils.cache import MISSING
+from utils.packed_ip import pack_ip
+from utils.pagination import encode_cursor, keyset_before, keyset_column
+from utils.timeseries import aligned_to_hours, bucket_range, fold_counts, next_bucket
+import crud
+from crud import (
+    redirect_cache, url_count_cache, user_cache, invalidate_user, short_code_generator,
+    password_hasher,
+)
+
+# ユーザー関連のCRUD操作
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    """メールアドレスでユーザーを取得"""
+    result = await db.execute(select(User).where(User.email == email).limit(1))
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, user: UserCreate) -> User:
+    """ユーザー作成"""
+    hashed_password = await password_hasher.hash(user.password)
+    db_user = User(
+        email=user.email,
+        hashed_password=hashed_password
+    )
+    db.add(db_user)
+    invalidate_user(db, db_user.email)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def get_cached_user(db: AsyncSession, email: str) -> Optional[UserResponse]:
+    """認証用の軽量なユーザー情報を取得する（キャッシュ経由）"""
+    cached = user_cache.get(email)
+    if cached is not MISSING:
+        return cached
+    user = await get_user_by_email(db, email)
+    if user is None:
+        return None
+    user_info = UserResponse.model_validate(user)
+    user_cache.set(email, user_info)
+    return user_info
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    """ユーザー認証（bcryptはスレッドプールで実行）"""
+    user = await get_user_by_email(db, email)
+    if not user:
+        return None
+    verified, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not verified:
+        return None
+    if new_hash:
+        # ラウンド数の設定変更などでハッシュが古い場合は更新する
+        user.hashed_password = new_hash
+        invalidate_user(db, user.email)
+        await db.commit()
+    return user
+
+async def next_short_codes(count: int) -> List[str]:
+    """短縮コードを払い出す（DBアクセスを伴う方式はスレッドで実行）"""
+    if short_code_generator.uses_database:
+        return await asyncio.to_thread(short_code_generator.next_codes, count)
+    return short_code_generator.next_codes(count)
+
+# URL関連のCRUD操作
+async def create_url(db: AsyncSession, url_create: URLCreate) -> URL:
+    """新しいURLを作成する（短縮コード衝突時は再生成して再試行）"""
+    for attempt in range(settings.short_code_max_retries):
+        short_code, = await next_short_codes(1)
+        db_url = URL(
+            original_url=str(url_create.original_url),
+            redirect_policy=url_create.redirect_policy,
+            short_code=short_code
+        )
+        db.add(db_url)
+        crud.publish_cache_invalidation(db, "redirect", short_code)
+        crud.publish_cache_invalidation(db, "url_count", "*")
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            if attempt + 1 >= settings.short_code_max_retries:
+                raise
+            continue
+        await db.refresh(db_url)
+        # 生成前に存在しないコードとしてキャッシュされている可能性があるため破棄
+        redirect_cache.invalidate(db_url.short_code)
+        url_count_cache.clear()
+        return db_url
+
+async def create_urls_bulk(db: AsyncSession, original_urls: Sequence[str]) -> List[Row]:
+    """URLをまとめて作成する（1トランザクション、短縮コードは一括で払い出し）
+
+    Returns: 入力順の (id, original_url, short_code, click_count, created_at) の行
+    """
+    table = URL.__table__
+    stmt = insert(table).returning(
+        table.c.id, table.c.original_url, table.c.short_code, table.c.click_count, table.c.created_at,
+        sort_by_parameter_order=True,
+    )
+    for attempt in range(settings.short_code_max_retries):
+        codes = await next_short_codes(len(original_urls))
+        params = [
+            {"original_url": original_url, "short_code": short_code, "click_count": 0}
+            for original_url, short_code in zip(original_urls, codes)
+        ]
+        for short_code in codes:
+            crud.publish_cache_invalidation(db, "redirect", short_code)
+        crud.publish_cache_invalidation(db, "url_count", "*")
+        try:
+            rows = (await db.execute(stmt, params)).all()
+            await db.commit()
+        except IntegrityError:
+            # 衝突したコードを特定せず、チャンク全体のコードを再生成する
+            await db.rollback()
+            if attempt + 1 >= settings.short_code_max_retries:
+                raise
+            continue
+        for short_code in codes:
+            redirect_cache.invalidate(short_code)
+        url_count_cache.clear()
+        return rows
+
+async def get_url_by_short_code(db: AsyncSession, short_code: str) -> Optional[URL]:
+    """短縮コードでURLを取得する"""
+    result = await db.execute(select(URL).where(URL.short_code == short_code).limit(1))
+    return result.scalars().first()
+
+async def resolve_short_code(db: AsyncSession, short_code: str) -> Optional[Tuple[int, str, str]]:
+    """短縮コードから (url_id, original_url, redirect_policy) を解決する（キャッシュ経由）"""
+    cached = redirect_cache.get(short_code)
+    if cached is not MISSING:
+        return cached
+
+    result = await db.execute(
+        select(URL.id, URL.original_url, URL.redirect_policy).where(URL.short_code == short_code).limit(1)
+    )
+    row = result.first()
+    if row is None:
+        redirect_cache.set(short_code, None, ttl=settings.redirect_cache_negative_ttl)
+        return None
+
+    resolved = (row.id, row.original_url, row.redirect_policy or settings.redirect_default_policy)
+    redirect_cache.set(short_code, resolved)
+    return resolved
+
+async def get_url_by_id(db: AsyncSession, url_id: int) -> Optional[URL]:
+    """IDでURLを取得する"""
+    return await db.get(URL, url_id)
+
+async def get_urls_by_ids(db: AsyncSession, url_ids: Sequence[int]) -> Dict[int, URL]:
+    """IDの一覧からURLをまとめて取得する（存在しないIDは含まない）"""
+    if not url_ids:
+        return {}
+    result = await db.execute(select(URL).where(URL.id.in_(url_ids)))
+    return {url.id: url for url in result.scalars().all()}
+
+async def get_urls_page(
+    db: AsyncSession, limit: int = 20, cursor: Optional[str] = None
+) -> Tuple[List[URL], Optional[str]]:
+    """URL一覧をキーセットページングで取得する（新しい順）
+
+    Returns: (URLのリスト, 次ページのカーソル。最終ページの場合はNone)
+    """
+    dialect_name = db.get_bind().dialect.name
+    stmt = (
+        select(URL, keyset_column(URL.created_at, dialect_name).label("keyset_ts"))
+        .order_by(desc(URL.created_at), desc(URL.id))
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(keyset_before(URL.created_at, URL.id, cursor, dialect_name))
+    rows = (await db.execute(stmt)).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_url, last_created_at = rows[-1]
+        next_cursor = encode_cursor(last_created_at, last_url.id)
+    return [url for url, _ in rows], next_cursor
+
+async def get_urls_count(db: AsyncSession) -> int:
+    """URL総数を取得する（短時間キャッシュ）"""
+    cached = url_count_cache.get("total")
+    if cached is not MISSING:
+        return cached
+    total = await db.scalar(select(func.count()).select_from(URL))
+    url_count_cache.set("total", total)
+    return total
+
+async def update_redirect_policy(db: AsyncSession, url_id: int, redirect_policy: Optional[str]) -> Optional[URL]:
+    """URLのリダイレクト方式を変更する（Noneで既定値に戻す）"""
+    url = await get_url_by_id(db, url_id)
+    if url is None:
+        return None
+
+    url.redirect_policy = redirect_policy
+    crud.publish_cache_invalidation(db, "redirect", url.short_code)
+    await db.commit()
+    redirect_cache.invalidate(url.short_code)
+    return url
+
+async def delete_url(db: AsyncSession, url_id: int) -> bool:
+    """URLを削除する（関連するクリック・集計も削除）"""
+    url = await get_url_by_id(db, url_id)
+    if url is None:
+        return False
+
+    # クリックは一定件数ずつ削除・コミットし、書き込みロックを長時間保持しない
+    short_code = url.short_code
+    batch_size = settings.click_delete_batch_size
+    while (await db.execute(crud.clicks_batch_delete(Click.url_id == url_id, batch_size))).rowcount >= batch_size:
+        await db.commit()
+    await db.execute(delete(Click).where(Click.url_id == url_id))
+    await db.execute(delete(ClickRollupHourly).where(ClickRollupHourly.url_id == url_id))
+    await db.execute(delete(ClickRollupDaily).where(ClickRollupDaily.url_id == url_id))
+    # 全URL合計のスケッチからは個別に取り除けないため残る
+    await db.execute(delete(ClickVisitorSketch).where(ClickVisitorSketch.url_id == url_id))
+    await db.execute(delete(ClickArchiveCount).where(ClickArchiveCount.url_id == url_id))
+    await db.execute(delete(URL).where(URL.id == url_id))
+    crud.publish_cache_invalidation(db, "redirect", short_code)
+    crud.publish_cache_invalidation(db, "url_count", "*")
+    await db.commit()
+    redirect_cache.invalidate(short_code)
+    url_count_cache.clear()
+    return True
+
+async def increment_click_count(db: AsyncSession, url_id: int) -> bool:
+    """クリック数をインクリメントする（SQL側で原子的に加算）"""
+    result = await db.execute(
+        update(URL.__table__)
+        .where(URL.__table__.c.id == url_id)
+        .values(click_count=URL.__table__.c.click_count + 1)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+# クリック関連のCRUD操作
+async def create_click(db: AsyncSession, url_id: int, click_data: ClickCreate) -> Click:
+    """新しいクリックを記録する"""
+    user_agents = await db.run_sync(crud.user_agent_dictionary.resolve, [click_data.user_agent])
+    referrers = await db.run_sync(crud.referrer_dictionary.resolve, [click_data.referrer])
+    db_click = Click(
+        url_id=url_id,
+        clicked_at=datetime.utcnow(),
+        user_agent_id=user_agents.get(click_data.user_agent),
+        ip=pack_ip(click_data.ip_address),
+        referrer_id=referrers.get(click_data.referrer)
+    )
+    db.add(db_click)
+    await db.run_sync(crud.add_click_rollups, [(url_id, db_click.clicked_at)])
+    await db.run_sync(
+        crud.add_visitor_sketches,
+        [(url_id, db_click.clicked_at, click_data.user_agent, click_data.ip_address)],
+    )
+    await db.commit()
+    crud.user_agent_dictionary.remember(user_agents)
+    crud.referrer_dictionary.remember(referrers)
+    await db.refresh(db_click)
+    return db_click
+
+async def record_clicks_bulk(db: AsyncSession, records: Sequence[tuple]) -> None:
+    """クリックをまとめて記録する（crud.record_clicks_bulk と同じ処理）"""
+    await db.run_sync(crud.record_clicks_bulk, records)
+
+async def get_clicks_by_url(
+    db: AsyncSession, url_id: int, limit: int = 100, cursor: Optional[str] = None
+) -> Tuple[List[Click], Optional[str]]:
+    """特定URLのクリック履歴をキーセットページングで取得する（新しい順）
+
+    Returns: (クリックのリスト, 次ページのカーソル。最終ページの場合はNone)
+    """
+    dialect_name = db.get_bind().dialect.name
+    stmt = (
+        select(Click, keyset_column(Click.clicked_at, dialect_name).label("keyset_ts"))
+        .where(Click.url_id == url_id)
+        .order_by(desc(Click.clicked_at), desc(Click.id))
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(keyset_before(Click.clicked_at, Click.id, cursor, dialect_name))
+    rows = (await db.execute(stmt)).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_click, last_clicked_at = rows[-1]
+        next_cursor = encode_cursor(last_clicked_at, last_click.id)
+    return [click for click, _ in rows], next_cursor
+
+async def stream_clicks(
+    db: AsyncSession,
+    url_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_size: int = 5000,
+) -> AsyncIterator[Sequence[Row]]:
+    """クリック履歴をサーバーサイドカーソルで chunk_size 行ずつ取得する（古い順）"""
+    stmt = (
+        select(
+            Click.id, Click.url_id, URL.short_code, Click.clicked_at,
+            UserAgent.value.label("user_agent"), Click.ip, Referrer.value.label("referrer"),
+        )
+        .join(URL, URL.id == Click.url_id)
+        .outerjoin(UserAgent, UserAgent.id == Click.user_agent_id)
+        .outerjoin(Referrer, Referrer.id == Click.referrer_id)
+        .order_by(Click.clicked_at, Click.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    if url_id is not None:
+        stmt = stmt.where(Click.url_id == url_id)
+    if start is not None:
+        stmt = stmt.where(Click.clicked_at >= start)
+    if end is not None:
+        stmt = stmt.where(Click.clicked_at < end)
+    result = await db.stream(stmt)
+    async for partition in result.partitions():
+        yield partition
+
+# 統計関連の操作
+async def get_total_clicks(db: AsyncSession) -> int:
+    """総クリック数を取得する（日別集計から算出）"""
+    return await db.scalar(select(func.coalesce(func.sum(ClickRollupDaily.clicks), 0)))
+
+async def get_daily_clicks(db: AsyncSession, since: datetime) -> List[Tuple[datetime, int]]:
+    """日別の総クリック数を取得する"""
+    result = await db.execute(
+        select(ClickRollupDaily.bucket_start, func.sum(ClickRollupDaily.clicks))
+        .where(ClickRollupDaily.bucket_start >= since)
+        .group_by(ClickRollupDaily.bucket_start)
+        .order_by(ClickRollupDaily.bucket_start)
+    )
+    return [(bucket_start, clicks) for bucket_start, clicks in result.all()]
+
+async def get_visitor_sketches(
+    db: AsyncSession, url_id: Optional[int], since: datetime
+) -> List[Tuple[datetime, bytes]]:
+    """日別のユニーク訪問者スケッチを取得する（url_id がNoneの場合は全URL合計）"""
+    sketch_id = crud.ALL_URLS_SKETCH_ID if url_id is None else url_id
+    result = await db.execute(
+        select(ClickVisitorSketch.bucket_start, ClickVisitorSketch.sketch)
+        .where(ClickVisitorSketch.url_id == sketch_id, ClickVisitorSketch.bucket_start >= since)
+        .order_by(ClickVisitorSketch.bucket_start)
+    )
+    return [(bucket_start, sketch) for bucket_start, sketch in result.all()]
+
+async def get_minute_click_counts(
+    db: AsyncSession, url_id: Optional[int], start: datetime, end: datetime
+) -> List[Tuple[datetime, int]]:
+    """クリック数をUTCの分単位でSQL集計する（clicksテーブルから）"""
+    bucket = crud.bucket_expression(db, Click.clicked_at, "minute")
+    stmt = (
+        select(bucket, func.count())
+        .where(Click.clicked_at >= start, Click.clicked_at < end)
+        .group_by(bucket)
+    )
+    if url_id is not None:
+        stmt = stmt.where(Click.url_id == url_id)
+    result = await db.execute(stmt)
+    return [(crud.bucket_value(bucket_start), clicks) for bucket_start, clicks in result.all()]
+
+async def get_hourly_click_counts(
+    db: AsyncSession, url_id: Optional[int], start: datetime, end: datetime
+) -> List[Tuple[datetime, int]]:
+    """UTCの時間別クリック数を取得する（時間別集計テーブルから）"""
+    in_range = (ClickRollupHourly.bucket_start >= start, ClickRollupHourly.bucket_start < end)
+    if url_id is not None:
+        # 主キー (url_id, bucket_start) の範囲走査のみ（集約不要）
+        stmt = select(ClickRollupHourly.bucket_start, ClickRollupHourly.clicks).where(
+            ClickRollupHourly.url_id == url_id, *in_range
+        )
+    else:
+        stmt = (
+            select(ClickRollupHourly.bucket_start, func.sum(ClickRollupHourly.clicks))
+            .where(*in_range)
+            .group_by(ClickRollupHourly.bucket_start)
+        )
+    result = await db.execute(stmt)
+    return [(bucket_start, clicks) for bucket_start, clicks in result.all()]
+
+async def get_click_timeseries(
+    db: AsyncSession, url_id: Optional[int], interval: str, tz, start: datetime, end: datetime, max_points: int
+) -> Tuple[str, List[Tuple[datetime, int]]]:
+    """クリック数をローカル時刻（tz）の分・時・日単位の区間で集計する（件数0の区間を含む）
+
+    start/end はタイムゾーンなしUTC。区間数が max_points を超える場合は ValueError。
+    時・日単位は全ての区間の境界がUTCの正時であれば時間別集計から、
+    それ以外はclicksテーブルを分単位でSQL集計してから区間にまとめる。
+    Returns: (集計元, [(区間開始UTC, クリック数)])
+    """
+    buckets = bucket_range(start, end, interval, tz, max_points)
+    if not buckets:
+        return "clicks", []
+    range_start, range_end = buckets[0], next_bucket(buckets[-1], interval, tz)
+    if interval != "minute" and aligned_to_hours(buckets, range_end):
+        source = "hourly_rollups"
+        counts = await get_hourly_click_counts(db, url_id, range_start, range_end)
+    else:
+        source = "clicks"
+        counts = await get_minute_click_counts(db, url_id, range_start, range_end)
+    return source, fold_counts(counts, buckets, range_end)
+
+async def get_top_urls(db: AsyncSession, limit: int = 10) -> List[URL]:
+    """クリック数上位のURLを取得する"""
+    result = await db.execute(select(URL).order_by(desc(URL.click_count)).limit(limit))
+    return list(result.scalars().all())
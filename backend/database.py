@@ -1,24 +1,101 @@
 import os
-from sqlalchemy import create_engine
+from typing import Any, Dict
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from config import settings
+
 # データベースURL（環境変数から取得、デフォルトはローカルSQLite）
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/app.db")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    """接続ごとに適用するSQLite PRAGMA（適用順）"""
+    return {
+        # 複数プロセスから同時に接続するため、ロック待ちを最初に設定する
+        "busy_timeout": settings.sqlite_busy_timeout,
+        # 空きページを incremental_vacuum で解放できるようにする（テーブル作成前のみ有効）
+        "auto_vacuum": settings.sqlite_auto_vacuum,
+        "journal_mode": settings.sqlite_journal_mode,
+        "synchronous": settings.sqlite_synchronous,
+        "cache_size": settings.sqlite_cache_size,
+        "mmap_size": settings.sqlite_mmap_size,
+        "temp_store": settings.sqlite_temp_store,
+    }
+
+
+def engine_options() -> Dict[str, Any]:
+    """create_engine / create_async_engine 共通のオプション"""
+    if IS_SQLITE:
+        # SQLiteは接続プールのサイズ指定を使用しない
+        return {
+            "echo": settings.db_echo,
+            "connect_args": {"check_same_thread": False},
+        }
+    return {
+        "echo": settings.db_echo,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+
+
+def engine_profile() -> Dict[str, Any]:
+    """有効なエンジン設定（ヘルスチェック表示用）"""
+    options = {key: value for key, value in engine_options().items() if key != "connect_args"}
+    profile: Dict[str, Any] = {"dialect": engine.dialect.name, **options}
+    if IS_SQLITE:
+        profile["pragmas"] = sqlite_pragmas()
+    return profile
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """接続確立時にPRAGMAを適用する"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in sqlite_pragmas().items():
+            if name == "journal_mode":
+                # ジャーナルモードはDBファイル単位で永続化される。変更には排他ロックが
+                # 必要なため、他のワーカーが使用中のDBでは既に一致していれば変更しない
+                cursor.execute("PRAGMA journal_mode")
+                if str(cursor.fetchone()[0]).lower() == str(value).lower():
+                    continue
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
 
-# SQLiteの場合は追加設定
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL, 
-        connect_args={"check_same_thread": False},
-        echo=True  # 開発時はSQLログを出力
-    )
-else:
-    engine = create_engine(DATABASE_URL, echo=True)
+engine = create_engine(DATABASE_URL, **engine_options())
+if IS_SQLITE:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
 
 # セッションファクトリー
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+def to_async_database_url(url: str) -> str:
+    """同期ドライバのURLを非同期ドライバ（aiosqlite / asyncpg）のURLに変換する"""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    for prefix in ("postgresql+psycopg2:", "postgresql:", "postgres:"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg:" + url[len(prefix):]
+    return url
+
+
+# 非同期エンジン（ルートハンドラーでイベントループをブロックしないために使用）
+ASYNC_DATABASE_URL = to_async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options())
+if IS_SQLITE:
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+# 非同期セッションファクトリー（コミット後の遅延ロードを避けるため expire_on_commit=False）
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # ベースクラス
 Base = declarative_base()
 
@@ -28,4 +105,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# 非同期データベースセッションの依存性注入用
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db 
\ No newline at end of file
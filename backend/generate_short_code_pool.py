@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+短縮コードプール補充スクリプト
+short_code_strategy = "pool" で使用する予約コードを事前生成します。
+"""
+
+import argparse
+import sys
+import os
+
+# プロジェクトルートをパスに追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import SessionLocal
+from config import settings
+from utils.short_codes import generate_random_code
+import crud
+
+def generate_short_code_pool(count: int, batch_size: int = 1000):
+    """予約コードを指定件数追加"""
+    db = SessionLocal()
+    try:
+        print(f"予約コードを {count} 件生成しています（長さ: {settings.short_code_length}）...")
+        added = 0
+        while added < count:
+            size = min(batch_size, count - added)
+            codes = {generate_random_code(settings.short_code_length) for _ in range(size)}
+            # 既存コードとの重複分は除外されるため、不足分は次のバッチで補う
+            added += crud.add_reserved_short_codes(db, list(codes))
+        print(f"✓ 予約コードを {added} 件追加しました")
+    except Exception as e:
+        print(f"✗ エラーが発生しました: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="短縮コードの予約プールを補充します")
+    parser.add_argument("--count", type=int, default=10000, help="追加する予約コード数")
+    args = parser.parse_args()
+    generate_short_code_pool(args.count)
@@ -6,23 +6,34 @@
 
 import sys
 import os
+from alembic import command
+from alembic.config import Config
 from sqlalchemy.orm import Session
 
 # プロジェクトルートをパスに追加
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import SessionLocal, engine
-import models, crud
+from database import SessionLocal
+import crud
 from schemas import UserCreate
 
+def run_migrations():
+    """Alembicマイグレーションを最新まで適用"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    config = Config(os.path.join(base_dir, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(base_dir, "migrations"))
+    # アプリケーション側のログ設定を上書きしない
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
 def init_database():
     """データベース初期化"""
     print("=== データベース初期化開始 ===")
     
-    # データベーステーブル作成
-    print("データベーステーブルを作成しています...")
-    models.Base.metadata.create_all(bind=engine)
-    print("✓ データベーステーブル作成完了")
+    # マイグレーション適用（テーブル・インデックス作成）
+    print("データベースマイグレーションを適用しています...")
+    run_migrations()
+    print("✓ データベースマイグレーション完了")
     
     db: Session = SessionLocal()
     
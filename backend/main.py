@@ -1,11 +1,25 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from sqlalchemy.exc import SQLAlchemyError
 
-from database import engine, Base
-from api.routes import router
 from config import settings
+from utils.logging import setup_logging
+
+# ログ設定（ルートのimportより前に適用し、設定したレベルを有効にする）
+setup_logging()
+
+from database import engine, async_engine
+from api.routes import router
+from utils.cache_sync import cache_invalidation_listener
+from utils.click_queue import click_ingestor
+from utils.trending import trending_checkpointer
+from utils.index_advisor import run_index_advisor
+from utils.metrics import MetricsMiddleware, instrument_engine
+from utils import sql_profiler
 
 # 統一エラーハンドリングのインポート
 from api.exceptions import (
@@ -17,14 +31,36 @@ from api.exceptions import (
     general_exception_handler
 )
 
-# データベーステーブルを作成
-Base.metadata.create_all(bind=engine)
+# テーブル作成・マイグレーションは起動前に init_db.py で1回だけ行う（ワーカーごとには行わない）
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """起動・終了処理"""
+    click_ingestor.start()
+    await cache_invalidation_listener.start()
+    # 停止したワーカーの急上昇URL集計を引き継ぐ
+    await trending_checkpointer.start()
+    if settings.index_advisor_on_startup:
+        # 全件走査の検出結果は警告ログに出力される
+        await run_index_advisor()
+    try:
+        yield
+    finally:
+        await cache_invalidation_listener.stop()
+        # 未書き込みのクリックを書き込んでから終了（待つ間もイベントループを止めない）
+        await asyncio.to_thread(click_ingestor.stop, settings.click_drain_timeout)
+        # 書き込み済みのクリックまで含めた集計状態を保存
+        await trending_checkpointer.stop()
+        await async_engine.dispose()
+
 
 # FastAPIアプリケーションの初期化
 app = FastAPI(
     title=settings.app_name,
     description="URL短縮サービスAPI",
-    version=settings.app_version
+    version=settings.app_version,
+    lifespan=lifespan
 )
 
 # CORS設定（セキュリティ強化：必要な設定のみ許可）
@@ -34,8 +70,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=settings.cors_methods,
     allow_headers=settings.cors_headers,
+    expose_headers=settings.cors_expose_headers,
 )
 
+# メトリクス計測（リクエスト数・レイテンシ・DBクエリ数）
+if settings.metrics_enabled:
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    app.add_middleware(MetricsMiddleware)
+
+# SQLプロファイラー（設定・サンプリング・X-SQL-Profileヘッダーで有効化）
+sql_profiler.instrument_engine(engine)
+sql_profiler.instrument_engine(async_engine.sync_engine)
+app.add_middleware(sql_profiler.SQLProfilerMiddleware)
+
 # 統一エラーハンドラーの登録
 app.add_exception_handler(BaseAPIException, base_api_exception_handler)
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
@@ -46,8 +94,11 @@ app.add_exception_handler(Exception, general_exception_handler)
 app.include_router(router, prefix="/api")
 
 # リダイレクト機能を個別に登録（プレフィックスなし）
-from api.redirect import router as redirect_router
-app.include_router(redirect_router)
+from api.redirect import router as redirect_router, fast_routes as fast_redirect_routes
+if settings.fast_redirect_enabled:
+    app.router.routes.extend(fast_redirect_routes)
+else:
+    app.include_router(redirect_router)
 
 @app.get("/")
 async def root():
@@ -56,4 +107,7 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    from init_db import run_migrations
+    run_migrations()
+    # ログ設定は setup_logging() で適用済み
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None) 
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+既存環境では Base.metadata.create_all で作成済みのため、未作成のテーブルのみ作成する。
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _existing_tables():
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    existing = _existing_tables()
+
+    if "users" not in existing:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("email", sa.String(255), nullable=False, comment="メールアドレス"),
+            sa.Column("hashed_password", sa.String(255), nullable=False, comment="ハッシュ化パスワード"),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), comment="登録日時"),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "urls" not in existing:
+        op.create_table(
+            "urls",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("original_url", sa.Text(), nullable=False, comment="元のURL"),
+            sa.Column("short_code", sa.String(16), nullable=False, comment="短縮コード"),
+            sa.Column("click_count", sa.Integer(), nullable=False, comment="クリック数"),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), comment="登録日時"),
+        )
+        op.create_index("ix_urls_id", "urls", ["id"])
+        op.create_index("ix_urls_short_code", "urls", ["short_code"], unique=True)
+
+    if "clicks" not in existing:
+        op.create_table(
+            "clicks",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("url_id", sa.Integer(), sa.ForeignKey("urls.id"), nullable=False, comment="URLテーブルへの外部キー"),
+            sa.Column("clicked_at", sa.DateTime(timezone=True), server_default=sa.func.now(), comment="クリック日時"),
+            sa.Column("user_agent", sa.Text(), comment="アクセス元UserAgent"),
+            sa.Column("ip_address", sa.String(45), comment="アクセス元IP"),
+            sa.Column("referrer", sa.Text(), comment="リファラ"),
+        )
+        op.create_index("ix_clicks_id", "clicks", ["id"])
+
+    for table_name, unit in (("click_rollups_hourly", "時"), ("click_rollups_daily", "日")):
+        if table_name not in existing:
+            op.create_table(
+                table_name,
+                sa.Column("url_id", sa.Integer(), sa.ForeignKey("urls.id"), primary_key=True, comment="URLテーブルへの外部キー"),
+                sa.Column("bucket_start", sa.DateTime(), primary_key=True, comment=f"集計開始時刻（UTC、{unit}単位）"),
+                sa.Column("clicks", sa.Integer(), nullable=False, comment="クリック数"),
+            )
+            op.create_index(f"ix_{table_name}_bucket_start", table_name, ["bucket_start"])
+
+
+def downgrade() -> None:
+    op.drop_table("click_rollups_daily")
+    op.drop_table("click_rollups_hourly")
+    op.drop_table("clicks")
+    op.drop_table("urls")
+    op.drop_table("users")
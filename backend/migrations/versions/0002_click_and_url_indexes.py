@@ -0,0 +1,37 @@
+"""click and url indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+- clicks(url_id, clicked_at, id): URL別クリック履歴・URL削除時のクリック削除
+- clicks(clicked_at): 期間指定の集計・エクスポート
+- urls(created_at, id): URL一覧のキーセットページング
+- urls(click_count): クリック数上位URL
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_clicks_url_id_clicked_at_id", "clicks", ["url_id", "clicked_at", "id"]),
+    ("ix_clicks_clicked_at", "clicks", ["clicked_at"]),
+    ("ix_urls_created_at_id", "urls", ["created_at", "id"]),
+    ("ix_urls_click_count", "urls", ["click_count"]),
+]
+
+
+def upgrade() -> None:
+    for name, table_name, columns in INDEXES:
+        op.create_index(name, table_name, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table_name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table_name, if_exists=True)
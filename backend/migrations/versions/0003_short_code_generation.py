@@ -0,0 +1,40 @@
+"""short code generation tables
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+- short_code_sequences: counter方式のブロック割り当て用カウンター
+- reserved_short_codes: pool方式の予約コード
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "short_code_sequences" not in existing:
+        op.create_table(
+            "short_code_sequences",
+            sa.Column("name", sa.String(64), primary_key=True, comment="カウンター名"),
+            sa.Column("next_value", sa.BigInteger(), nullable=False, comment="次に払い出す値"),
+        )
+
+    if "reserved_short_codes" not in existing:
+        op.create_table(
+            "reserved_short_codes",
+            sa.Column("code", sa.String(16), primary_key=True, comment="短縮コード"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("reserved_short_codes")
+    op.drop_table("short_code_sequences")
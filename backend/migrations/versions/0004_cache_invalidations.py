@@ -0,0 +1,36 @@
+"""cache invalidation log
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+- cache_invalidations: 複数ワーカー間でキャッシュ破棄を伝搬するためのログ
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "cache_invalidations" not in existing:
+        op.create_table(
+            "cache_invalidations",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("cache_name", sa.String(32), nullable=False, comment="キャッシュ名"),
+            sa.Column("cache_key", sa.String(255), nullable=False, comment="破棄するキー（*は全件）"),
+            sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), comment="登録日時"),
+        )
+        op.create_index("ix_cache_invalidations_created_at", "cache_invalidations", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_cache_invalidations_created_at", table_name="cache_invalidations")
+    op.drop_table("cache_invalidations")
@@ -0,0 +1,34 @@
+"""url redirect policy
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+- urls.redirect_policy: URLごとのリダイレクト方式（tracked / permanent、NULLは既定値）
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("urls")}
+
+    if "redirect_policy" not in columns:
+        op.add_column(
+            "urls",
+            sa.Column("redirect_policy", sa.String(16), nullable=True,
+                      comment="リダイレクト方式（tracked / permanent、NULLは既定値）"),
+        )
+
+
+def downgrade() -> None:
+    # SQLiteは列の削除にテーブルの再作成が必要
+    with op.batch_alter_table("urls") as batch_op:
+        batch_op.drop_column("redirect_policy")
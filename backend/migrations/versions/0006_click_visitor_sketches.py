@@ -0,0 +1,37 @@
+"""click visitor sketches
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+- click_visitor_sketches: URL別・全体の日別ユニーク訪問者スケッチ（HyperLogLog）
+  既存のクリックからの作成は backfill_click_rollups.py で行う
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "click_visitor_sketches" not in existing:
+        op.create_table(
+            "click_visitor_sketches",
+            sa.Column("url_id", sa.Integer(), primary_key=True, comment="URLのID（0は全URL）"),
+            sa.Column("bucket_start", sa.DateTime(), primary_key=True, comment="集計開始時刻（UTC、日単位）"),
+            sa.Column("sketch", sa.LargeBinary(), nullable=False,
+                      comment="HyperLogLogスケッチ（ヘッダーとzlib圧縮したレジスタ）"),
+        )
+        op.create_index("ix_click_visitor_sketches_bucket_start", "click_visitor_sketches", ["bucket_start"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_click_visitor_sketches_bucket_start", table_name="click_visitor_sketches")
+    op.drop_table("click_visitor_sketches")
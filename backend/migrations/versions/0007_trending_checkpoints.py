@@ -0,0 +1,35 @@
+"""trending checkpoints
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:00
+
+- trending_checkpoints: ワーカーごとの急上昇URL集計の状態（再起動時に引き継ぐ）
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "trending_checkpoints" not in existing:
+        op.create_table(
+            "trending_checkpoints",
+            sa.Column("worker_id", sa.String(32), primary_key=True, comment="ワーカーID（起動ごとに生成）"),
+            sa.Column("state", sa.LargeBinary(), nullable=False, comment="時間窓ごとの集計状態（zlib圧縮したJSON）"),
+            sa.Column("saved_at", sa.DateTime(), nullable=False, comment="保存日時（UTC）"),
+            sa.Column("released", sa.Boolean(), nullable=False, server_default=sa.false(),
+                      comment="停止時に保存され、引き継ぎ可能か"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("trending_checkpoints")
@@ -0,0 +1,34 @@
+"""click archive counts
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 00:00:00
+
+- click_archive_counts: 保持期間を過ぎてファイルにアーカイブしたクリックのURL別件数
+  （urls.click_count の照合で clicks テーブルの件数に加える）
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "click_archive_counts" not in existing:
+        op.create_table(
+            "click_archive_counts",
+            sa.Column("url_id", sa.Integer(), sa.ForeignKey("urls.id"), primary_key=True,
+                      comment="URLテーブルへの外部キー"),
+            sa.Column("clicks", sa.Integer(), nullable=False, server_default="0", comment="アーカイブ済みのクリック数"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("click_archive_counts")
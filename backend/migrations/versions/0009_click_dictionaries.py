@@ -0,0 +1,183 @@
+"""click dictionaries
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 00:00:00
+
+- user_agents・referrers: クリックのUserAgent・リファラ文字列の辞書（64bitハッシュで一意）
+- clicks: user_agent・referrer を辞書テーブルのID、ip_address (VARCHAR(45)) をバイト列の ip に置き換える
+  既存のクリックは BATCH_SIZE 行ずつ変換する。IPアドレスでない値（"unknown" 等）はNULLになる
+  SQLiteでは削除した列の領域は incremental_vacuum（archive_clicks.py）で解放される
+"""
+import hashlib
+import ipaddress
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+
+def _string_hash(value):
+    # crud._string_hash と同じ値であること
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def _pack_ip(value):
+    if not value:
+        return None
+    try:
+        return ipaddress.ip_address(value).packed
+    except ValueError:
+        return None
+
+
+def _unpack_ip(value):
+    if value is None:
+        return None
+    address = ipaddress.ip_address(bytes(value))
+    if address.version == 6 and address.ipv4_mapped is not None:
+        return f"::ffff:{address.ipv4_mapped}"
+    return str(address)
+
+
+def _dictionary_table(name, comment):
+    return op.create_table(
+        name,
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("value_hash", sa.BigInteger(), nullable=False, unique=True, comment="文字列のハッシュ値（64bit）"),
+        sa.Column("value", sa.Text(), nullable=False, comment=comment),
+    )
+
+
+class _Interner:
+    """移行中の文字列 → 辞書テーブルのID"""
+
+    def __init__(self, conn, table):
+        self.conn = conn
+        self.table = table
+        self.ids = {value: row_id for row_id, value in conn.execute(sa.select(table.c.id, table.c.value))}
+
+    def get(self, value):
+        if value is None:
+            return None
+        row_id = self.ids.get(value)
+        if row_id is None:
+            row_id = self.conn.execute(
+                self.table.insert().values(value_hash=_string_hash(value), value=value)
+            ).inserted_primary_key[0]
+            self.ids[value] = row_id
+        return row_id
+
+
+def _batches(conn, stmt, id_column):
+    """id順に BATCH_SIZE 行ずつ取得する"""
+    last_id = 0
+    while True:
+        rows = conn.execute(stmt.where(id_column > last_id).order_by(id_column).limit(BATCH_SIZE)).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    existing = set(inspector.get_table_names())
+
+    if "user_agents" not in existing:
+        _dictionary_table("user_agents", "UserAgent")
+    if "referrers" not in existing:
+        _dictionary_table("referrers", "リファラ")
+
+    click_columns = {column["name"] for column in inspector.get_columns("clicks")}
+    if "user_agent_id" in click_columns:
+        return
+
+    op.add_column("clicks", sa.Column("user_agent_id", sa.Integer(), comment="アクセス元UserAgent（辞書テーブルへの外部キー）"))
+    op.add_column("clicks", sa.Column("ip", sa.LargeBinary(16), comment="アクセス元IP（IPv4は4バイト、IPv6は16バイト）"))
+    op.add_column("clicks", sa.Column("referrer_id", sa.Integer(), comment="リファラ（辞書テーブルへの外部キー）"))
+
+    metadata = sa.MetaData()
+    clicks = sa.Table("clicks", metadata, autoload_with=conn)
+    user_agents = _Interner(conn, sa.Table("user_agents", metadata, autoload_with=conn))
+    referrers = _Interner(conn, sa.Table("referrers", metadata, autoload_with=conn))
+
+    stmt = sa.select(clicks.c.id, clicks.c.user_agent, clicks.c.ip_address, clicks.c.referrer)
+    update = (
+        clicks.update()
+        .where(clicks.c.id == sa.bindparam("b_id"))
+        .values(user_agent_id=sa.bindparam("b_user_agent_id"), ip=sa.bindparam("b_ip"),
+                referrer_id=sa.bindparam("b_referrer_id"))
+    )
+    for rows in _batches(conn, stmt, clicks.c.id):
+        conn.execute(update, [
+            {
+                "b_id": row.id,
+                "b_user_agent_id": user_agents.get(row.user_agent),
+                "b_ip": _pack_ip(row.ip_address),
+                "b_referrer_id": referrers.get(row.referrer),
+            }
+            for row in rows
+        ])
+
+    with op.batch_alter_table("clicks") as batch_op:
+        batch_op.create_foreign_key("fk_clicks_user_agent_id", "user_agents", ["user_agent_id"], ["id"])
+        batch_op.create_foreign_key("fk_clicks_referrer_id", "referrers", ["referrer_id"], ["id"])
+        batch_op.drop_column("user_agent")
+        batch_op.drop_column("ip_address")
+        batch_op.drop_column("referrer")
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    op.add_column("clicks", sa.Column("user_agent", sa.Text(), comment="アクセス元UserAgent"))
+    op.add_column("clicks", sa.Column("ip_address", sa.String(45), comment="アクセス元IP"))
+    op.add_column("clicks", sa.Column("referrer", sa.Text(), comment="リファラ"))
+
+    metadata = sa.MetaData()
+    clicks = sa.Table("clicks", metadata, autoload_with=conn)
+    user_agents = sa.Table("user_agents", metadata, autoload_with=conn)
+    referrers = sa.Table("referrers", metadata, autoload_with=conn)
+
+    stmt = (
+        sa.select(clicks.c.id, user_agents.c.value.label("user_agent"), clicks.c.ip,
+                  referrers.c.value.label("referrer"))
+        .select_from(clicks)
+        .outerjoin(user_agents, user_agents.c.id == clicks.c.user_agent_id)
+        .outerjoin(referrers, referrers.c.id == clicks.c.referrer_id)
+    )
+    update = (
+        clicks.update()
+        .where(clicks.c.id == sa.bindparam("b_id"))
+        .values(user_agent=sa.bindparam("b_user_agent"), ip_address=sa.bindparam("b_ip_address"),
+                referrer=sa.bindparam("b_referrer"))
+    )
+    for rows in _batches(conn, stmt, clicks.c.id):
+        conn.execute(update, [
+            {
+                "b_id": row.id,
+                "b_user_agent": row.user_agent,
+                "b_ip_address": _unpack_ip(row.ip),
+                "b_referrer": row.referrer,
+            }
+            for row in rows
+        ])
+
+    with op.batch_alter_table("clicks") as batch_op:
+        batch_op.drop_constraint("fk_clicks_user_agent_id", type_="foreignkey")
+        batch_op.drop_constraint("fk_clicks_referrer_id", type_="foreignkey")
+        batch_op.drop_column("user_agent_id")
+        batch_op.drop_column("ip")
+        batch_op.drop_column("referrer_id")
+
+    op.drop_table("referrers")
+    op.drop_table("user_agents")
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from typing import Optional
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, Index, LargeBinary, Boolean
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
+from utils.packed_ip import unpack_ip
 
 class User(Base):
     """ユーザーテーブル - 認証管理"""
@@ -20,10 +22,34 @@ class URL(Base):
     original_url = Column(Text, nullable=False, comment="元のURL")
     short_code = Column(String(16), unique=True, nullable=False, index=True, comment="短縮コード")
     click_count = Column(Integer, default=0, nullable=False, comment="クリック数")
+    redirect_policy = Column(String(16), nullable=True, comment="リダイレクト方式（tracked / permanent、NULLは既定値）")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="登録日時")
     
     # リレーション
     clicks = relationship("Click", back_populates="url", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # 一覧のキーセットページング用（created_at DESC, id DESC）
+        Index("ix_urls_created_at_id", "created_at", "id"),
+        # クリック数上位URLの取得用
+        Index("ix_urls_click_count", "click_count"),
+    )
+
+class UserAgent(Base):
+    """UserAgent辞書テーブル - クリックのUserAgent文字列を重複なく保持"""
+    __tablename__ = "user_agents"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    value_hash = Column(BigInteger, nullable=False, unique=True, comment="文字列のハッシュ値（64bit）")
+    value = Column(Text, nullable=False, comment="UserAgent")
+
+class Referrer(Base):
+    """リファラ辞書テーブル - クリックのリファラ文字列を重複なく保持"""
+    __tablename__ = "referrers"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    value_hash = Column(BigInteger, nullable=False, unique=True, comment="文字列のハッシュ値（64bit）")
+    value = Column(Text, nullable=False, comment="リファラ")
 
 class Click(Base):
     """クリックテーブル - アクセス履歴の管理"""
@@ -32,9 +58,107 @@ class Click(Base):
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     url_id = Column(Integer, ForeignKey("urls.id"), nullable=False, comment="URLテーブルへの外部キー")
     clicked_at = Column(DateTime(timezone=True), server_default=func.now(), comment="クリック日時")
-    user_agent = Column(Text, comment="アクセス元UserAgent")
-    ip_address = Column(String(45), comment="アクセス元IP")
-    referrer = Column(Text, comment="リファラ")
+    user_agent_id = Column(Integer, ForeignKey("user_agents.id"), comment="アクセス元UserAgent（辞書テーブルへの外部キー）")
+    ip = Column(LargeBinary(16), comment="アクセス元IP（IPv4は4バイト、IPv6は16バイト）")
+    referrer_id = Column(Integer, ForeignKey("referrers.id"), comment="リファラ（辞書テーブルへの外部キー）")
     
     # リレーション
-    url = relationship("URL", back_populates="clicks") 
\ No newline at end of file
+    url = relationship("URL", back_populates="clicks")
+    # 辞書の文字列はクリックと同時に取得する（非同期セッションでは遅延読み込みできないため）
+    user_agent_entry = relationship(UserAgent, lazy="joined")
+    referrer_entry = relationship(Referrer, lazy="joined")
+    
+    @property
+    def user_agent(self) -> Optional[str]:
+        return self.user_agent_entry.value if self.user_agent_entry is not None else None
+    
+    @property
+    def referrer(self) -> Optional[str]:
+        return self.referrer_entry.value if self.referrer_entry is not None else None
+    
+    @property
+    def ip_address(self) -> Optional[str]:
+        return unpack_ip(self.ip)
+    
+    __table_args__ = (
+        # URL別クリック履歴のキーセットページング用（clicked_at DESC, id DESC）
+        Index("ix_clicks_url_id_clicked_at_id", "url_id", "clicked_at", "id"),
+        # 期間指定の集計・エクスポート用
+        Index("ix_clicks_clicked_at", "clicked_at"),
+    )
+
+class ClickRollupHourly(Base):
+    """時間別クリック集計テーブル - 統計表示用"""
+    __tablename__ = "click_rollups_hourly"
+    
+    url_id = Column(Integer, ForeignKey("urls.id"), primary_key=True, comment="URLテーブルへの外部キー")
+    bucket_start = Column(DateTime, primary_key=True, comment="集計開始時刻（UTC、時単位）")
+    clicks = Column(Integer, default=0, nullable=False, comment="クリック数")
+    
+    __table_args__ = (
+        Index("ix_click_rollups_hourly_bucket_start", "bucket_start"),
+    )
+
+class ClickRollupDaily(Base):
+    """日別クリック集計テーブル - 統計表示用"""
+    __tablename__ = "click_rollups_daily"
+    
+    url_id = Column(Integer, ForeignKey("urls.id"), primary_key=True, comment="URLテーブルへの外部キー")
+    bucket_start = Column(DateTime, primary_key=True, comment="集計開始時刻（UTC、日単位）")
+    clicks = Column(Integer, default=0, nullable=False, comment="クリック数")
+    
+    __table_args__ = (
+        Index("ix_click_rollups_daily_bucket_start", "bucket_start"),
+    )
+
+class ClickArchiveCount(Base):
+    """アーカイブ済みクリック数テーブル - 保持期間を過ぎて削除したクリックのURL別件数"""
+    __tablename__ = "click_archive_counts"
+    
+    url_id = Column(Integer, ForeignKey("urls.id"), primary_key=True, comment="URLテーブルへの外部キー")
+    clicks = Column(Integer, default=0, nullable=False, comment="アーカイブ済みのクリック数")
+
+class ClickVisitorSketch(Base):
+    """日別ユニーク訪問者スケッチテーブル - HyperLogLogによる訪問者数の推定用"""
+    __tablename__ = "click_visitor_sketches"
+    
+    # 全URL合計のスケッチも同じテーブルに持つため外部キーは設定しない
+    url_id = Column(Integer, primary_key=True, comment="URLのID（0は全URL）")
+    bucket_start = Column(DateTime, primary_key=True, comment="集計開始時刻（UTC、日単位）")
+    sketch = Column(LargeBinary, nullable=False, comment="HyperLogLogスケッチ（ヘッダーとzlib圧縮したレジスタ）")
+    
+    __table_args__ = (
+        Index("ix_click_visitor_sketches_bucket_start", "bucket_start"),
+    )
+
+
+class ShortCodeSequence(Base):
+    """短縮コード用カウンターテーブル - ブロック単位で払い出す"""
+    __tablename__ = "short_code_sequences"
+    
+    name = Column(String(64), primary_key=True, comment="カウンター名")
+    next_value = Column(BigInteger, nullable=False, default=0, comment="次に払い出す値")
+
+class ReservedShortCode(Base):
+    """予約済み短縮コードテーブル - 事前生成したコードのプール"""
+    __tablename__ = "reserved_short_codes"
+    
+    code = Column(String(16), primary_key=True, comment="短縮コード")
+
+class CacheInvalidation(Base):
+    """キャッシュ無効化ログ - 複数ワーカー間でのキャッシュ破棄の伝搬"""
+    __tablename__ = "cache_invalidations"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cache_name = Column(String(32), nullable=False, comment="キャッシュ名")
+    cache_key = Column(String(255), nullable=False, comment="破棄するキー（*は全件）")
+    created_at = Column(DateTime, server_default=func.now(), index=True, comment="登録日時")
+
+class TrendingCheckpoint(Base):
+    """急上昇URL集計のチェックポイント - ワーカーごとの時間窓の集計状態"""
+    __tablename__ = "trending_checkpoints"
+    
+    worker_id = Column(String(32), primary_key=True, comment="ワーカーID（起動ごとに生成）")
+    state = Column(LargeBinary, nullable=False, comment="時間窓ごとの集計状態（zlib圧縮したJSON）")
+    saved_at = Column(DateTime, nullable=False, comment="保存日時（UTC）")
+    released = Column(Boolean, nullable=False, default=False, comment="停止時に保存され、引き継ぎ可能か")
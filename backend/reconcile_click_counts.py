@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+クリック数整合性チェックスクリプト
+urls.click_count を clicks テーブルの件数と照合し、必要に応じて修正します。
+"""
+
+import argparse
+import sys
+import os
+
+# プロジェクトルートをパスに追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from database import SessionLocal
+import crud
+
+def main():
+    """クリック数の照合・修正"""
+    parser = argparse.ArgumentParser(description="urls.click_count を clicks テーブルと照合します")
+    parser.add_argument("--fix", action="store_true", help="不一致のクリック数を修正する")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        if args.fix:
+            mismatches = crud.reconcile_click_counts(db)
+        else:
+            mismatches = crud.find_click_count_mismatches(db)
+        
+        for url_id, click_count, clicks in mismatches:
+            print(f"URL {url_id}: click_count={click_count}, clicks={clicks}")
+        
+        if not mismatches:
+            print("✓ すべてのクリック数は整合しています")
+        elif args.fix:
+            print(f"✓ {len(mismatches)} 件のクリック数を修正しました")
+        else:
+            print(f"✗ {len(mismatches)} 件の不一致があります（--fix で修正）")
+            sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
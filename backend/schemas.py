@@ -1,5 +1,5 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime
+from typing import List, Literal, Optional
 from pydantic import BaseModel, HttpUrl, Field, EmailStr
 
 # 認証関連のスキーマ
@@ -29,9 +29,17 @@ class Token(BaseModel):
     user: UserResponse
 
 # URL関連のスキーマ
+# リダイレクト方式（tracked: 毎回計測・キャッシュ不可 / permanent: ブラウザ・プロキシでキャッシュ可）
+RedirectPolicy = Literal["tracked", "permanent"]
+
 class URLCreate(BaseModel):
     """URL作成用スキーマ"""
     original_url: HttpUrl = Field(..., description="短縮したい元のURL")
+    redirect_policy: Optional[RedirectPolicy] = Field(None, description="リダイレクト方式（省略時は既定値）")
+
+class URLUpdate(BaseModel):
+    """URL更新用スキーマ"""
+    redirect_policy: Optional[RedirectPolicy] = Field(..., description="リダイレクト方式（nullで既定値に戻す）")
 
 class URLResponse(BaseModel):
     """URL応答用スキーマ"""
@@ -39,6 +47,7 @@ class URLResponse(BaseModel):
     original_url: str
     short_code: str
     click_count: int
+    redirect_policy: str = Field(..., description="適用されるリダイレクト方式")
     created_at: datetime
     short_url: str = Field(..., description="完全な短縮URL")
     
@@ -48,7 +57,25 @@ class URLResponse(BaseModel):
 class URLList(BaseModel):
     """URL一覧用スキーマ"""
     urls: List[URLResponse]
-    total: int
+    total: Optional[int] = Field(None, description="URL総数（include_total=false の場合は省略）")
+    next_cursor: Optional[str] = Field(None, description="次ページ取得用カーソル（最終ページの場合はnull）")
+
+class BulkURLResult(BaseModel):
+    """URL一括作成の結果（NDJSONの1行）"""
+    index: int = Field(..., description="入力中の位置（0始まり）")
+    status: str = Field(..., description="created / error")
+    original_url: Optional[str] = None
+    id: Optional[int] = None
+    short_code: Optional[str] = None
+    short_url: Optional[str] = None
+    created_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+class BulkURLSummary(BaseModel):
+    """URL一括作成の集計（NDJSONの最終行）"""
+    status: str = "summary"
+    created: int
+    failed: int
 
 # クリック関連のスキーマ
 class ClickCreate(BaseModel):
@@ -80,4 +107,55 @@ class URLStats(BaseModel):
     """URL統計情報用スキーマ"""
     total_urls: int
     total_clicks: int
-    top_urls: List[URLResponse] 
\ No newline at end of file
+    top_urls: List[URLResponse] 
+
+class DailyClicks(BaseModel):
+    """日別クリック数"""
+    date: date
+    clicks: int
+
+class DailyClickStats(BaseModel):
+    """日別クリック推移（UTC日単位）"""
+    days: List[DailyClicks]
+    total_clicks: int
+
+class TrendingURL(BaseModel):
+    """急上昇URL（時間窓内のクリック数の推定値）"""
+    url: URLResponse
+    clicks: int = Field(..., description="時間窓内のクリック数の推定値（実際の値以上）")
+    error: int = Field(..., description="推定値の誤差の上限（clicks - error 以上であることが保証される）")
+
+class TrendingURLs(BaseModel):
+    """急上昇URL一覧"""
+    window: str = Field(..., description="5m / 1h / 24h")
+    urls: List[TrendingURL]
+
+class DailyVisitors(BaseModel):
+    """日別ユニーク訪問者数（推定値）"""
+    date: date
+    unique_visitors: int
+
+class UniqueVisitorStats(BaseModel):
+    """ユニーク訪問者数（IPアドレスとUserAgentの組、HyperLogLogによる推定値、UTC日単位）"""
+    url_id: Optional[int] = Field(None, description="対象URLのID（全体の場合はnull）")
+    days: List[DailyVisitors]
+    unique_visitors: int = Field(..., description="期間全体のユニーク訪問者数（複数日に訪れた訪問者は1件）")
+    relative_error: float = Field(
+        ..., description="推定値の相対標準誤差（約68%の確率でこの範囲内、2倍で約95%）"
+    )
+
+class TimeseriesPoint(BaseModel):
+    """時系列の1区間"""
+    bucket_start: datetime = Field(..., description="区間の開始時刻（指定タイムゾーン）")
+    clicks: int
+
+class ClickTimeseries(BaseModel):
+    """クリック数の時系列"""
+    url_id: Optional[int] = Field(None, description="対象URLのID（全体の場合はnull）")
+    interval: str = Field(..., description="minute / hour / day")
+    timezone: str
+    start: datetime = Field(..., description="最初の区間の開始時刻")
+    end: datetime = Field(..., description="最後の区間の終了時刻")
+    total_clicks: int
+    source: str = Field(..., description="集計元（hourly_rollups: 時間別集計 / clicks: クリック履歴）")
+    points: List[TimeseriesPoint]
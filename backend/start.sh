@@ -1,9 +1,25 @@
 #!/bin/bash
+set -e
 
-# データベース初期化
+# データベース初期化（マイグレーション・管理者作成）
+# ワーカー起動前に1回だけ実行する
 echo "Initializing database..."
 python init_db.py
 
-# FastAPIサーバー起動
-echo "Starting FastAPI server..."
-exec uvicorn main:app --host 0.0.0.0 --port 8000 --reload 
\ No newline at end of file
+# 開発モード: ファイル変更時に自動再起動（単一プロセス）
+if [ "${ENVIRONMENT}" = "development" ] || [ "${RELOAD}" = "true" ]; then
+    echo "Starting FastAPI server (reload mode)..."
+    exec uvicorn main:app --host 0.0.0.0 --port 8000 --reload
+fi
+
+# 本番モード: CPU数に応じた複数ワーカー（WEB_CONCURRENCYで上書き可）
+WORKERS="${WEB_CONCURRENCY:-$(nproc)}"
+echo "Starting FastAPI server (${WORKERS} workers)..."
+exec uvicorn main:app \
+    --host 0.0.0.0 \
+    --port 8000 \
+    --workers "${WORKERS}" \
+    --loop uvloop \
+    --http httptools \
+    --timeout-keep-alive 5 \
+    --timeout-graceful-shutdown "${GRACEFUL_TIMEOUT:-30}"
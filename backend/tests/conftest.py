@@ -1,55 +1,124 @@
 """
 Pytest configuration and fixtures for backend tests.
+
+The application modules read their settings and create their database
+engines at import time, so the environment is prepared here before any
+of them is imported: a temporary SQLite file database (shared by the sync
+and async engines), low bcrypt cost and no background pollers. The schema
+is created once with the Alembic migrations; every test then starts from
+empty tables and empty in-process caches.
 """
+import asyncio
+import os
+import sys
+import tempfile
+
 import pytest
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
 
-from backend.database import Base, get_db
-from backend.main import app
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="url-shortener-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DATA_DIR}/test.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("CACHE_SYNC_INTERVAL", "0")
+os.environ.setdefault("TRENDING_CHECKPOINT_INTERVAL", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
 
+import crud  # noqa: E402
+import init_db  # noqa: E402
+from api.auth import token_cache  # noqa: E402
+from database import Base, SessionLocal, async_engine, engine  # noqa: E402
+from main import app  # noqa: E402
+from schemas import UserCreate  # noqa: E402
+from utils.click_queue import click_ingestor  # noqa: E402
+from utils.trending import trending_tracker  # noqa: E402
 
-# Test database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+TEST_EMAIL = "admin@example.com"
+TEST_PASSWORD = "admin123"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+CACHES = (
+    crud.redirect_cache, crud.url_count_cache, crud.user_cache,
+    crud.user_agent_ids, crud.referrer_ids, token_cache,
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
-def override_get_db():
-    """Override database dependency for testing."""
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    """Create the schema once with the Alembic migrations."""
+    init_db.run_migrations()
+    yield
+    engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def clean_state(migrated_database):
+    """Empty every table and in-process cache before each test."""
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(delete(table))
+    for cache in CACHES:
+        cache.clear()
+    for window in trending_tracker.windows.values():
+        window.summaries.clear()
+    yield
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture
 def db_session():
-    """Create a fresh database session for each test."""
-    Base.metadata.create_all(bind=engine)
-    db = TestingSessionLocal()
+    """Sync database session."""
+    db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
-        Base.metadata.drop_all(bind=engine)
 
 
-@pytest.fixture(scope="function")
-def client(db_session):
-    """Create a test client with database override."""
-    app.dependency_overrides[get_db] = override_get_db
+@pytest.fixture
+def run_async():
+    """Run a coroutine on a fresh event loop (async engine connections are bound to the loop)."""
+    def run(coro):
+        async def wrapper():
+            try:
+                return await coro
+            finally:
+                await async_engine.dispose()
+        return asyncio.run(wrapper())
+    return run
+
+
+@pytest.fixture
+def client():
+    """Test client with the application lifespan (click ingestor running)."""
     with TestClient(app) as test_client:
         yield test_client
-    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def test_user(db_session):
+    """The user the authenticated tests log in as."""
+    return crud.create_user(db_session, UserCreate(email=TEST_EMAIL, password=TEST_PASSWORD))
+
+
+@pytest.fixture
+def auth_headers(client, test_user):
+    """Authorization header for the test user."""
+    response = client.post("/api/auth/login", json={"email": TEST_EMAIL, "password": TEST_PASSWORD})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def flush_clicks():
+    """Write every queued click event to the database."""
+    def flush():
+        click_ingestor.stop()
+        click_ingestor.start()
+    return flush
 
 
 @pytest.fixture
@@ -65,4 +134,4 @@ def invalid_url_data():
     """Invalid URL data for testing."""
     return {
         "original_url": "not-a-valid-url"
-    } 
\ No newline at end of file
+    }
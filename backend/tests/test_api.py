@@ -7,133 +7,144 @@ from fastapi.testclient import TestClient
 
 class TestURLAPI:
     """Test URL API endpoints."""
-    
-    def test_create_url_success(self, client: TestClient, sample_url_data):
-        """Test successful URL creation."""
+
+    def test_create_url_requires_auth(self, client: TestClient, sample_url_data):
+        """Test that URL creation is rejected without a token."""
         response = client.post("/api/urls", json=sample_url_data)
-        assert response.status_code == 200
-        
+        assert response.status_code in (401, 403)
+
+    def test_create_url_success(self, client: TestClient, auth_headers, sample_url_data):
+        """Test successful URL creation."""
+        response = client.post("/api/urls", json=sample_url_data, headers=auth_headers)
+        assert response.status_code == 201
+
         data = response.json()
         assert "id" in data
         assert "short_code" in data
-        assert "original_url" in data
-        assert data["original_url"] == sample_url_data["original_url"]
+        assert data["original_url"].rstrip("/") == sample_url_data["original_url"]
         assert data["click_count"] == 0
-    
-    def test_create_url_invalid(self, client: TestClient, invalid_url_data):
+        assert data["short_url"].endswith(f"/r/{data['short_code']}")
+
+    def test_create_url_invalid(self, client: TestClient, auth_headers, invalid_url_data):
         """Test URL creation with invalid URL."""
-        response = client.post("/api/urls", json=invalid_url_data)
+        response = client.post("/api/urls", json=invalid_url_data, headers=auth_headers)
         assert response.status_code == 400
-        assert "Invalid URL format" in response.json()["detail"]
-    
-    def test_get_urls_empty(self, client: TestClient):
-        """Test getting URLs when none exist."""
+        assert response.json()["error"]["code"] == "VALIDATION_ERROR"
+
+    def test_get_urls_requires_auth(self, client: TestClient):
+        """Test that the URL list is rejected without a token."""
         response = client.get("/api/urls")
+        assert response.status_code in (401, 403)
+
+    def test_get_urls_empty(self, client: TestClient, auth_headers):
+        """Test getting URLs when none exist."""
+        response = client.get("/api/urls", headers=auth_headers)
         assert response.status_code == 200
-        assert response.json() == []
-    
-    def test_get_urls_with_data(self, client: TestClient, sample_url_data):
+        assert response.json() == {"urls": [], "total": 0, "next_cursor": None}
+
+    def test_get_urls_with_data(self, client: TestClient, auth_headers, sample_url_data):
         """Test getting URLs after creating one."""
-        # Create a URL first
-        create_response = client.post("/api/urls", json=sample_url_data)
-        assert create_response.status_code == 200
-        
-        # Get URLs
-        response = client.get("/api/urls")
-        assert response.status_code == 200
-        
-        data = response.json()
-        assert len(data) == 1
-        assert data[0]["original_url"] == sample_url_data["original_url"]
-    
-    def test_get_url_by_short_code(self, client: TestClient, sample_url_data):
-        """Test getting URL by short code."""
-        # Create a URL first
-        create_response = client.post("/api/urls", json=sample_url_data)
-        short_code = create_response.json()["short_code"]
-        
-        # Get URL by short code
-        response = client.get(f"/api/urls/{short_code}")
+        create_response = client.post("/api/urls", json=sample_url_data, headers=auth_headers)
+        assert create_response.status_code == 201
+
+        response = client.get("/api/urls", headers=auth_headers)
         assert response.status_code == 200
-        
+
         data = response.json()
-        assert data["short_code"] == short_code
-        assert data["original_url"] == sample_url_data["original_url"]
-    
-    def test_get_url_not_found(self, client: TestClient):
-        """Test getting non-existent URL."""
-        response = client.get("/api/urls/nonexistent")
-        assert response.status_code == 404
-        assert "URL not found" in response.json()["detail"]
-    
-    def test_redirect_url(self, client: TestClient, sample_url_data):
+        assert data["total"] == 1
+        assert [url["id"] for url in data["urls"]] == [create_response.json()["id"]]
+
+    def test_delete_url(self, client: TestClient, auth_headers, sample_url_data):
+        """Test that a deleted URL no longer redirects."""
+        created = client.post("/api/urls", json=sample_url_data, headers=auth_headers).json()
+        assert client.get(f"/r/{created['short_code']}", follow_redirects=False).status_code == 307
+
+        response = client.delete(f"/api/urls/{created['id']}", headers=auth_headers)
+        assert response.status_code == 204
+        assert client.get(f"/r/{created['short_code']}", follow_redirects=False).status_code == 404
+
+    def test_redirect_url(self, client: TestClient, auth_headers, sample_url_data):
         """Test URL redirection."""
-        # Create a URL first
-        create_response = client.post("/api/urls", json=sample_url_data)
-        short_code = create_response.json()["short_code"]
-        
-        # Test redirect (don't follow redirects to test the response)
-        response = client.get(f"/r/{short_code}", follow_redirects=False)
-        assert response.status_code == 307  # Temporary redirect
-        assert response.headers["location"] == sample_url_data["original_url"]
-    
+        created = client.post("/api/urls", json=sample_url_data, headers=auth_headers).json()
+
+        response = client.get(f"/r/{created['short_code']}", follow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers["location"] == created["original_url"]
+
     def test_redirect_not_found(self, client: TestClient):
         """Test redirect for non-existent URL."""
         response = client.get("/r/nonexistent")
         assert response.status_code == 404
-        assert "URL not found" in response.json()["detail"]
-    
-    def test_get_clicks(self, client: TestClient, sample_url_data):
+        assert response.json()["error"]["code"] == "NOT_FOUND_ERROR"
+
+    def test_get_clicks(self, client: TestClient, auth_headers, sample_url_data, flush_clicks):
         """Test getting click history."""
-        # Create a URL first
-        create_response = client.post("/api/urls", json=sample_url_data)
-        short_code = create_response.json()["short_code"]
-        
-        # Get clicks (should be empty initially)
-        response = client.get(f"/api/urls/{short_code}/clicks")
+        created = client.post("/api/urls", json=sample_url_data, headers=auth_headers).json()
+
+        response = client.get(f"/api/urls/{created['id']}/clicks", headers=auth_headers)
         assert response.status_code == 200
         assert response.json() == []
-        
-        # Make a redirect to create a click
-        client.get(f"/r/{short_code}", follow_redirects=False)
-        
-        # Get clicks again (should have one click now)
-        response = client.get(f"/api/urls/{short_code}/clicks")
+
+        client.get(f"/r/{created['short_code']}", follow_redirects=False,
+                   headers={"User-Agent": "pytest", "Referer": "https://ref.example"})
+        flush_clicks()
+
+        response = client.get(f"/api/urls/{created['id']}/clicks", headers=auth_headers)
         assert response.status_code == 200
-        
+
         clicks = response.json()
         assert len(clicks) == 1
-        assert "timestamp" in clicks[0]
-        assert "client_ip" in clicks[0]
-    
-    def test_get_stats(self, client: TestClient, sample_url_data):
+        assert clicks[0]["url_id"] == created["id"]
+        assert clicks[0]["user_agent"] == "pytest"
+        assert clicks[0]["referrer"] == "https://ref.example"
+        assert "clicked_at" in clicks[0]
+
+    def test_get_stats(self, client: TestClient, auth_headers, sample_url_data, flush_clicks):
         """Test getting application statistics."""
-        # Get stats when empty
-        response = client.get("/api/stats")
+        response = client.get("/api/stats", headers=auth_headers)
         assert response.status_code == 200
-        
+
         stats = response.json()
-        assert "total_urls" in stats
-        assert "total_clicks" in stats
         assert stats["total_urls"] == 0
         assert stats["total_clicks"] == 0
-        
-        # Create a URL and check stats again
-        client.post("/api/urls", json=sample_url_data)
-        
-        response = client.get("/api/stats")
+
+        created = client.post("/api/urls", json=sample_url_data, headers=auth_headers).json()
+        client.get(f"/r/{created['short_code']}", follow_redirects=False)
+        flush_clicks()
+
+        response = client.get("/api/stats", headers=auth_headers)
         assert response.status_code == 200
-        
+
         stats = response.json()
         assert stats["total_urls"] == 1
-        assert stats["total_clicks"] == 0
+        assert stats["total_clicks"] == 1
+
+
+class TestAuthAPI:
+    """Test authentication endpoints."""
+
+    def test_login_wrong_password(self, client: TestClient, test_user):
+        """Test that a wrong password is rejected."""
+        response = client.post("/api/auth/login", json={"email": test_user.email, "password": "wrong"})
+        assert response.status_code == 401
+
+    def test_me(self, client: TestClient, auth_headers, test_user):
+        """Test getting the current user."""
+        response = client.get("/api/auth/me", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["email"] == test_user.email
 
 
 class TestHealthCheck:
     """Test health check endpoint."""
-    
+
+    def test_root(self, client: TestClient):
+        """Test root endpoint."""
+        response = client.get("/")
+        assert response.status_code == 200
+        assert "message" in response.json()
+
     def test_health_check(self, client: TestClient):
         """Test health check endpoint."""
-        response = client.get("/")
+        response = client.get("/api/health")
         assert response.status_code == 200
-        assert "message" in response.json() 
\ No newline at end of file
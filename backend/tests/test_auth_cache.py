@@ -0,0 +1,109 @@
+"""
+Tests for cached JWT verification and user resolution.
+"""
+import time
+from datetime import timedelta
+
+import pytest
+
+import crud
+import crud_async
+from api import auth
+from api.auth import create_access_token, token_cache
+from api.exceptions import AuthenticationError
+from database import AsyncSessionLocal
+from models import CacheInvalidation, User
+from utils import cache as cache_module
+from utils.cache import MISSING
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    calls = []
+    decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    return calls
+
+
+class TestVerifyToken:
+    """Test _verify_token."""
+
+    def test_signature_is_verified_once(self, decode_calls):
+        token = create_access_token({"sub": "user@example.com"}, expires_delta=timedelta(minutes=5))
+        assert auth._verify_token(token) == "user@example.com"
+        assert auth._verify_token(token) == "user@example.com"
+        assert len(decode_calls) == 1
+
+    def test_cache_ttl_is_bounded_by_expiry(self, monkeypatch):
+        monkeypatch.setattr(auth.settings, "auth_cache_ttl", 3600)
+        now = time.monotonic()
+        monkeypatch.setattr(cache_module.time, "monotonic", lambda: now)
+        token = create_access_token({"sub": "user@example.com"}, expires_delta=timedelta(seconds=30))
+        auth._verify_token(token)
+
+        now += 31
+        assert token_cache.get(token.rpartition(".")[2]) is MISSING
+
+    def test_expired_token_is_rejected(self):
+        token = create_access_token({"sub": "user@example.com"}, expires_delta=timedelta(seconds=-1))
+        with pytest.raises(AuthenticationError):
+            auth._verify_token(token)
+        assert token_cache.get(token.rpartition(".")[2]) is MISSING
+
+    def test_cached_signature_is_bound_to_its_user(self):
+        """A cached signature paired with another payload still resolves to the signature's owner."""
+        token = create_access_token({"sub": "user@example.com"}, expires_delta=timedelta(minutes=5))
+        auth._verify_token(token)
+        other = create_access_token({"sub": "admin@example.com"}, expires_delta=timedelta(minutes=5))
+        header, _, signature = token.split(".")
+        assert auth._verify_token(".".join([header, other.split(".")[1], signature])) == "user@example.com"
+
+    def test_invalid_signature(self):
+        token = create_access_token({"sub": "user@example.com"}, expires_delta=timedelta(minutes=5))
+        with pytest.raises(AuthenticationError):
+            auth._verify_token(token[:-2] + ("AA" if token[-2:] != "AA" else "BB"))
+
+
+class TestCachedUser:
+    """Test user resolution through the user cache."""
+
+    def test_user_is_cached(self, db_session, test_user, run_async, monkeypatch):
+        async def resolve():
+            async with AsyncSessionLocal() as db:
+                return await crud_async.get_cached_user(db, test_user.email)
+
+        first = run_async(resolve())
+        calls = []
+        monkeypatch.setattr(crud_async, "get_user_by_email", lambda *args: calls.append(args))
+        second = run_async(resolve())
+        assert second == first
+        assert calls == []
+
+    def test_invalidate_user(self, db_session, test_user, run_async):
+        async def resolve():
+            async with AsyncSessionLocal() as db:
+                return await crud_async.get_cached_user(db, test_user.email)
+
+        published = db_session.query(CacheInvalidation).filter_by(cache_name="user", cache_key=test_user.email)
+        run_async(resolve())
+        before = published.count()
+        db_session.query(User).delete()
+        crud.invalidate_user(db_session, test_user.email)
+        db_session.commit()
+        assert run_async(resolve()) is None
+        assert published.count() == before + 1
+
+    def test_me_with_cached_token(self, client, auth_headers, decode_calls):
+        for _ in range(3):
+            assert client.get("/api/auth/me", headers=auth_headers).status_code == 200
+        assert len(decode_calls) == 1
+
+    def test_unknown_user_is_rejected(self, client):
+        token = create_access_token({"sub": "nobody@example.com"}, expires_delta=timedelta(minutes=5))
+        response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 401
@@ -0,0 +1,148 @@
+"""
+Tests for bulk URL creation.
+"""
+import json
+
+import crud_async
+from api import urls as urls_api
+from config import settings
+from models import URL
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+class ChunkedRequest:
+    """A Request stand-in whose body arrives in the given chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def collect(run_async, iterator):
+    async def drain():
+        return [item async for item in iterator]
+    return run_async(drain())
+
+
+def post_bulk(client, headers, **kwargs):
+    response = client.post("/api/urls/bulk", headers=headers, **kwargs)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    return lines[:-1], lines[-1]
+
+
+class TestBulkCreate:
+    """Test POST /api/urls/bulk."""
+
+    def test_json_array_with_invalid_items(self, client, auth_headers):
+        """Invalid items produce an error line at their index; the rest are created."""
+        items = ["https://a.example", {"original_url": "https://b.example"}, "not-a-url", 5, "ftp://c.example"]
+        results, summary = post_bulk(client, auth_headers, json=items)
+        # 不正な要素の行はチャンクの書き込みを待たずに返る
+        results.sort(key=lambda result: result["index"])
+
+        assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+        assert [result["status"] for result in results] == ["created", "created", "error", "error", "error"]
+        assert results[2]["original_url"] == "not-a-url"
+        assert "original_url" not in results[3]
+        assert all(result["error"] for result in results[2:])
+        assert all(result["short_code"] and result["id"] for result in results[:2])
+        assert summary == {"status": "summary", "created": 2, "failed": 3}
+
+    def test_ndjson_across_chunks(self, client, auth_headers, monkeypatch):
+        monkeypatch.setattr(settings, "bulk_create_chunk_size", 3)
+        body = "\n".join(json.dumps({"original_url": f"https://e.example/{i}"}) for i in range(8))
+        results, summary = post_bulk(
+            client, {**auth_headers, "Content-Type": "application/x-ndjson"}, content=body
+        )
+
+        assert summary == {"status": "summary", "created": 8, "failed": 0}
+        assert [result["index"] for result in results] == list(range(8))
+        assert len({result["short_code"] for result in results}) == 8
+        listed = client.get("/api/urls", params={"limit": 100}, headers=auth_headers).json()
+        assert listed["total"] == 8
+
+    def test_failed_chunk_reports_each_item(self, client, auth_headers, monkeypatch):
+        async def broken(db, urls):
+            raise RuntimeError("insert failed")
+
+        monkeypatch.setattr(crud_async, "create_urls_bulk", broken)
+        results, summary = post_bulk(client, auth_headers, json=["https://a.example", "https://b.example"])
+        assert [(result["index"], result["status"]) for result in results] == [(0, "error"), (1, "error")]
+        assert summary == {"status": "summary", "created": 0, "failed": 2}
+
+    def test_malformed_body(self, client, auth_headers):
+        response = client.post("/api/urls/bulk", content="{", headers=auth_headers)
+        assert response.status_code == 400
+        response = client.post("/api/urls/bulk", json={"original_url": "https://a.example"}, headers=auth_headers)
+        assert response.status_code == 400
+        response = client.post("/api/urls/bulk", json=[], headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_too_many_items(self, client, auth_headers, monkeypatch):
+        monkeypatch.setattr(settings, "bulk_create_max_items", 2)
+        response = client.post("/api/urls/bulk", json=["https://a.example"] * 3, headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_requires_auth(self, client):
+        response = client.post("/api/urls/bulk", json=["https://a.example"])
+        assert response.status_code in (401, 403)
+
+
+class TestBulkCreateStreaming:
+    """Test that NDJSON bodies are processed while they are received."""
+
+    def test_lines_split_across_chunks(self, run_async):
+        request = ChunkedRequest([b'"https://a.ex', b'ample"\n{"original_url": "https://b.example"}\n\n', b'{bad\n"https://c.example"'])
+        items = collect(run_async, urls_api._iter_bulk_ndjson(request))
+        assert items[:2] == ["https://a.example", {"original_url": "https://b.example"}]
+        assert isinstance(items[2], urls_api._MalformedLine)
+        assert items[3] == "https://c.example"
+
+    def test_line_too_long(self, run_async, monkeypatch):
+        monkeypatch.setattr(settings, "bulk_create_max_body_bytes", 8)
+        items = collect(run_async, urls_api._iter_bulk_ndjson(ChunkedRequest([b'"https://a', b'.example"'] * 3)))
+        assert len(items) == 1 and isinstance(items[0], urls_api._MalformedLine)
+
+    def test_chunks_are_created_while_receiving(self, db_session, run_async, monkeypatch):
+        monkeypatch.setattr(settings, "bulk_create_chunk_size", 3)
+        seen = []
+
+        async def items():
+            for i in range(7):
+                if i and i % 3 == 0:
+                    seen.append(db_session.query(URL).count())
+                yield f"https://e.example/{i}"
+
+        lines = collect(run_async, urls_api._bulk_create_results(items(), "user@example.com"))
+        assert seen == [3, 6]
+        assert json.loads(lines[-1]) == {"status": "summary", "created": 7, "failed": 0}
+
+    def test_malformed_line_is_an_error_line(self, client, auth_headers):
+        body = '"https://a.example"\n{bad\n"https://b.example"\n'
+        results, summary = post_bulk(client, {**auth_headers, **NDJSON}, content=body)
+        results.sort(key=lambda result: result["index"])
+        assert [result["status"] for result in results] == ["created", "error", "created"]
+        assert summary == {"status": "summary", "created": 2, "failed": 1}
+
+    def test_empty_ndjson(self, client, auth_headers):
+        response = client.post("/api/urls/bulk", content="\n\n", headers={**auth_headers, **NDJSON})
+        assert response.status_code == 400
+
+    def test_too_many_ndjson_items(self, client, auth_headers, monkeypatch):
+        monkeypatch.setattr(settings, "bulk_create_max_items", 2)
+        body = "\n".join(f'"https://e.example/{i}"' for i in range(5))
+        results, summary = post_bulk(client, {**auth_headers, **NDJSON}, content=body)
+        assert [(result["index"], result["status"]) for result in results] == [(2, "error"), (0, "created"), (1, "created")]
+        assert summary == {"status": "summary", "created": 2, "failed": 1}
+
+    def test_json_array_body_is_capped(self, client, auth_headers, monkeypatch):
+        monkeypatch.setattr(settings, "bulk_create_max_body_bytes", 32)
+        response = client.post("/api/urls/bulk", json=["https://a.example"] * 5, headers=auth_headers)
+        assert response.status_code == 400
+        assert response.json()["error"]["code"] == "VALIDATION_ERROR"
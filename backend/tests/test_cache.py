@@ -0,0 +1,115 @@
+"""
+Tests for the in-process TTL/LRU cache and the redirect cache.
+"""
+import pytest
+
+import crud
+from schemas import URLCreate
+from utils import cache as cache_module
+from utils.cache import MISSING, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", fake)
+    return fake
+
+
+class TestTTLCache:
+    """Test TTLCache."""
+
+    def test_get_missing(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        assert cache.get("a") is MISSING
+        assert cache.stats()["misses"] == 1
+
+    def test_none_is_a_value(self):
+        """None is cached (negative entries), only MISSING means a miss."""
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", None)
+        assert cache.get("a") is None
+        assert cache.stats()["hits"] == 1
+
+    def test_expiry(self, clock):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=5)
+        clock.now += 10
+        assert cache.get("a") == 1
+        assert cache.get("b") is MISSING
+        clock.now += 60
+        assert cache.get("a") is MISSING
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # a を最近参照に
+        cache.set("c", 3)
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_zero_maxsize_disables(self):
+        cache = TTLCache(maxsize=0, ttl=60)
+        cache.set("a", 1)
+        assert cache.get("a") is MISSING
+
+    def test_invalidate_and_clear(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.invalidate("a")
+        cache.invalidate("missing")
+        assert cache.get("a") is MISSING
+        cache.clear()
+        assert cache.get("b") is MISSING
+
+    def test_hit_ratio(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+        assert cache.stats()["hit_ratio"] == 0.5
+
+
+class TestRedirectCache:
+    """Test short-code resolution through the redirect cache."""
+
+    def test_resolve_is_cached(self, db_session):
+        url = crud.create_url(db_session, URLCreate(original_url="https://example.com/a"))
+        resolved = crud.resolve_short_code(db_session, url.short_code)
+        assert resolved[:2] == (url.id, "https://example.com/a")
+
+        # 2回目はDBを参照しない
+        db_session.query(crud.URL).delete()
+        db_session.commit()
+        assert crud.resolve_short_code(db_session, url.short_code) == resolved
+
+    def test_unknown_code_is_negatively_cached(self, db_session):
+        assert crud.resolve_short_code(db_session, "nosuch") is None
+        assert crud.redirect_cache.get("nosuch") is None
+
+    def test_delete_invalidates(self, db_session):
+        url = crud.create_url(db_session, URLCreate(original_url="https://example.com/a"))
+        short_code = url.short_code
+        crud.resolve_short_code(db_session, short_code)
+        assert crud.delete_url(db_session, url.id)
+        assert crud.resolve_short_code(db_session, short_code) is None
+
+    def test_create_clears_negative_entry(self, db_session, monkeypatch):
+        crud.redirect_cache.set("taken", None)
+        monkeypatch.setattr(crud.short_code_generator, "next_code", lambda: "taken")
+        url = crud.create_url(db_session, URLCreate(original_url="https://example.com/a"))
+        assert crud.resolve_short_code(db_session, url.short_code) is not None
@@ -0,0 +1,135 @@
+"""
+Tests for cross-worker cache invalidation.
+"""
+import pytest
+
+import crud
+import crud_async
+from database import AsyncSessionLocal
+from models import CacheInvalidation
+from schemas import URLCreate, UserCreate
+from utils.cache import MISSING, TTLCache
+from utils import cache_sync
+from utils.cache_sync import CacheInvalidationListener
+
+
+@pytest.fixture
+def cache():
+    return TTLCache(maxsize=100, ttl=60)
+
+
+@pytest.fixture
+def listener(cache):
+    return CacheInvalidationListener({"redirect": cache}, interval=3600, retention=3600, lookback=10)
+
+
+def log(db_session, row_id, key, cache_name="redirect"):
+    db_session.add(CacheInvalidation(id=row_id, cache_name=cache_name, cache_key=key))
+    db_session.commit()
+
+
+class TestCacheInvalidationListener:
+    """Test CacheInvalidationListener."""
+
+    def test_applies_new_rows(self, db_session, listener, cache, run_async):
+        cache.set("a", 1)
+        cache.set("b", 2)
+        log(db_session, 1, "a")
+        assert run_async(listener.poll()) == 1
+        assert cache.get("a") is MISSING
+        assert cache.get("b") == 2
+
+    def test_rows_are_applied_once(self, db_session, listener, cache, run_async):
+        log(db_session, 1, "a")
+        run_async(listener.poll())
+        cache.set("a", 1)
+        assert run_async(listener.poll()) == 0
+        assert cache.get("a") == 1
+
+    def test_lower_id_committed_late(self, db_session, listener, cache, run_async):
+        """A row whose id is below one already read (out-of-order commit) is still applied."""
+        log(db_session, 5, "a")
+        run_async(listener.poll())
+
+        cache.set("b", 2)
+        log(db_session, 3, "b")
+        assert run_async(listener.poll()) == 1
+        assert cache.get("b") is MISSING
+
+    def test_progress_when_window_is_full(self, db_session, listener, cache, run_async, monkeypatch):
+        """Already-applied rows in the window do not stop newer rows from being read."""
+        monkeypatch.setattr(cache_sync, "_BATCH_SIZE", 2)
+        for row_id in range(1, 11):
+            log(db_session, row_id, f"k{row_id}")
+        applied = 0
+        for _ in range(5):
+            applied += run_async(listener.poll())
+        assert applied == 10
+
+        for row_id in range(11, 14):
+            log(db_session, row_id, f"k{row_id}")
+        assert run_async(listener.poll()) == 2
+        assert run_async(listener.poll()) == 1
+
+    def test_clear_all(self, db_session, listener, cache, run_async):
+        cache.set("a", 1)
+        log(db_session, 1, "*")
+        run_async(listener.poll())
+        assert len(cache) == 0
+
+    def test_unknown_cache_is_ignored(self, db_session, listener, cache, run_async):
+        cache.set("a", 1)
+        log(db_session, 1, "a", cache_name="other")
+        assert run_async(listener.poll()) == 1
+        assert cache.get("a") == 1
+
+    def test_start_skips_existing_rows(self, db_session, cache, run_async):
+        listener = CacheInvalidationListener({"redirect": cache}, interval=3600, retention=3600, lookback=10)
+        log(db_session, 1, "a")
+
+        async def start_and_poll():
+            await listener.start()
+            try:
+                cache.set("a", 1)
+                return await listener.poll()
+            finally:
+                await listener.stop()
+
+        assert run_async(start_and_poll()) == 0
+        assert cache.get("a") == 1
+
+
+class TestPublishedInvalidations:
+    """Test that writes record invalidations for the other workers."""
+
+    def published(self, db_session, cache_name):
+        db_session.expire_all()
+        return sorted(row.cache_key for row in db_session.query(CacheInvalidation).filter_by(cache_name=cache_name))
+
+    def test_create_url(self, client, auth_headers, db_session):
+        response = client.post("/api/urls", json={"original_url": "https://example.com/"}, headers=auth_headers)
+        assert response.status_code == 201
+        assert self.published(db_session, "redirect") == [response.json()["short_code"]]
+        assert self.published(db_session, "url_count") == ["*"]
+
+    def test_create_url_sync(self, db_session):
+        db_url = crud.create_url(db_session, URLCreate(original_url="https://example.com/"))
+        assert self.published(db_session, "redirect") == [db_url.short_code]
+        assert self.published(db_session, "url_count") == ["*"]
+
+    def test_create_urls_bulk(self, db_session, run_async):
+        async def create():
+            async with AsyncSessionLocal() as db:
+                return await crud_async.create_urls_bulk(db, ["https://example.com/1", "https://example.com/2"])
+
+        rows = run_async(create())
+        assert self.published(db_session, "redirect") == sorted(row.short_code for row in rows)
+        assert self.published(db_session, "url_count") == ["*"]
+
+    def test_create_user(self, db_session, run_async):
+        async def create():
+            async with AsyncSessionLocal() as db:
+                await crud_async.create_user(db, UserCreate(email="new@example.com", password="password123"))
+
+        run_async(create())
+        assert self.published(db_session, "user") == ["new@example.com"]
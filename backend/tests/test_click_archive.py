@@ -0,0 +1,159 @@
+"""
+Tests for raw click archival and purging.
+"""
+import gzip
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+import crud
+from models import URL, Click, ClickArchiveCount, ClickRollupDaily
+from utils import click_archive
+from utils.click_archive import archive_expired_clicks, archive_path, retention_cutoff
+
+RETENTION_DAYS = 30
+
+
+@pytest.fixture
+def url(db_session):
+    url = URL(original_url="https://example.com", short_code="abc123")
+    db_session.add(url)
+    db_session.commit()
+    return url
+
+
+@pytest.fixture
+def old_day():
+    """A whole UTC day before the retention cutoff."""
+    return retention_cutoff(RETENTION_DAYS) - timedelta(days=2)
+
+
+def add_clicks(db_session, url_id, start, count, user_agent="ua", ip="192.0.2.1", referrer=None):
+    crud.record_clicks_bulk(db_session, [
+        (url_id, start + timedelta(minutes=i), user_agent, ip, referrer) for i in range(count)
+    ])
+
+
+def read_archive(path):
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        return [json.loads(line) for line in archive]
+
+
+def remaining_clicks(db_session):
+    db_session.expire_all()
+    return db_session.query(Click).count()
+
+
+class TestRetentionCutoff:
+    """Test retention_cutoff."""
+
+    def test_day_boundary(self):
+        assert retention_cutoff(30, now=datetime(2026, 10, 17, 15, 30)) == datetime(2026, 9, 17)
+
+
+class TestArchiveExpiredClicks:
+    """Test archive_expired_clicks."""
+
+    def test_writes_gzip_ndjson_per_day(self, db_session, url, old_day, tmp_path):
+        add_clicks(db_session, url.id, old_day + timedelta(hours=1), 3,
+                   user_agent="Mozilla/5.0", ip="2001:db8::1", referrer="https://ref.example")
+        add_clicks(db_session, url.id, old_day + timedelta(days=1), 2)
+
+        days = archive_expired_clicks(db_session, RETENTION_DAYS, str(tmp_path), batch_size=100)
+
+        assert [(item.day, item.clicks, item.deleted, item.written) for item in days] == [
+            (old_day, 3, 3, True), (old_day + timedelta(days=1), 2, 2, True),
+        ]
+        rows = read_archive(archive_path(str(tmp_path), old_day))
+        assert len(rows) == 3
+        assert rows[0]["short_code"] == "abc123"
+        assert rows[0]["user_agent"] == "Mozilla/5.0"
+        assert rows[0]["ip_address"] == "2001:db8::1"
+        assert rows[0]["referrer"] == "https://ref.example"
+        assert rows[0]["clicked_at"] == (old_day + timedelta(hours=1)).isoformat() + "+00:00"
+        assert not os.path.exists(archive_path(str(tmp_path), old_day) + ".tmp")
+
+    def test_keeps_recent_clicks(self, db_session, url, old_day, tmp_path):
+        add_clicks(db_session, url.id, old_day, 2)
+        add_clicks(db_session, url.id, datetime.utcnow() - timedelta(hours=1), 4)
+        archive_expired_clicks(db_session, RETENTION_DAYS, str(tmp_path), batch_size=100)
+        assert remaining_clicks(db_session) == 4
+
+    def test_deletes_in_batches(self, db_session, url, old_day, tmp_path, monkeypatch):
+        batches = []
+        purge = crud.purge_archived_clicks
+
+        def recording_purge(db, start, end, batch_size):
+            deleted = purge(db, start, end, batch_size)
+            batches.append(deleted)
+            return deleted
+
+        monkeypatch.setattr(crud, "purge_archived_clicks", recording_purge)
+        add_clicks(db_session, url.id, old_day, 7)
+        archive_expired_clicks(db_session, RETENTION_DAYS, str(tmp_path), batch_size=3)
+        assert batches == [3, 3, 1]
+        assert remaining_clicks(db_session) == 0
+
+    def test_resumes_when_file_exists(self, db_session, url, old_day, tmp_path, monkeypatch):
+        """An interrupted run left the file behind: the next run only finishes the deletion."""
+        add_clicks(db_session, url.id, old_day, 5)
+        path = archive_path(str(tmp_path), old_day)
+        click_archive.write_day(db_session, old_day, path)
+        db_session.commit()
+        crud.purge_archived_clicks(db_session, old_day, old_day + timedelta(days=1), 2)
+
+        def fail(*args):
+            raise AssertionError("the archive file must not be rewritten")
+
+        monkeypatch.setattr(click_archive, "write_day", fail)
+        days = archive_expired_clicks(db_session, RETENTION_DAYS, str(tmp_path), batch_size=100)
+        assert [(item.written, item.deleted) for item in days] == [(False, 3)]
+        assert len(read_archive(path)) == 5
+        assert remaining_clicks(db_session) == 0
+
+    def test_dry_run(self, db_session, url, old_day, tmp_path):
+        add_clicks(db_session, url.id, old_day, 3)
+        days = archive_expired_clicks(db_session, RETENTION_DAYS, str(tmp_path), batch_size=100, dry_run=True)
+        assert [(item.day, item.clicks, item.deleted) for item in days] == [(old_day, 3, 0)]
+        assert not os.path.exists(days[0].path)
+        assert remaining_clicks(db_session) == 3
+
+    def test_reconciliation_stays_balanced(self, db_session, url, old_day, tmp_path):
+        add_clicks(db_session, url.id, old_day, 4)
+        add_clicks(db_session, url.id, datetime.utcnow() - timedelta(hours=1), 1)
+        archive_expired_clicks(db_session, RETENTION_DAYS, str(tmp_path), batch_size=3)
+
+        assert db_session.get(ClickArchiveCount, url.id).clicks == 4
+        assert crud.find_click_count_mismatches(db_session) == []
+
+    def test_rollups_are_kept(self, db_session, url, old_day, tmp_path):
+        add_clicks(db_session, url.id, old_day, 4)
+        archive_expired_clicks(db_session, RETENTION_DAYS, str(tmp_path), batch_size=100)
+        rollup = db_session.query(ClickRollupDaily).filter(ClickRollupDaily.url_id == url.id).one()
+        assert (rollup.bucket_start, rollup.clicks) == (old_day, 4)
+
+    def test_mismatched_rollups_are_rebuilt(self, db_session, url, old_day, tmp_path):
+        add_clicks(db_session, url.id, old_day, 4)
+        db_session.query(ClickRollupDaily).update({ClickRollupDaily.clicks: 1})
+        db_session.commit()
+        assert crud.find_rollup_mismatches(db_session, old_day) == [(url.id, 1, 4)]
+
+        days = archive_expired_clicks(db_session, RETENTION_DAYS, str(tmp_path), batch_size=100)
+        assert days[0].rollups_rebuilt
+        db_session.expire_all()
+        assert db_session.query(ClickRollupDaily.clicks).filter(ClickRollupDaily.url_id == url.id).scalar() == 4
+
+
+class TestIncrementalVacuum:
+    """Test incremental_vacuum."""
+
+    def test_frees_pages_after_purge(self, db_session, url, old_day, tmp_path):
+        if click_archive.sqlite_auto_vacuum_mode(db_session) != "INCREMENTAL":
+            pytest.skip("auto_vacuum=INCREMENTAL is only set on new SQLite databases")
+        add_clicks(db_session, url.id, old_day, 2000)
+        archive_expired_clicks(db_session, RETENTION_DAYS, str(tmp_path), batch_size=500)
+        assert click_archive.incremental_vacuum(db_session, step_pages=5) > 0
+        assert db_session.execute(text("PRAGMA freelist_count")).scalar() == 0
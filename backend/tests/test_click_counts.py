@@ -0,0 +1,85 @@
+"""
+Tests for the atomic click counter and click-count reconciliation.
+"""
+import threading
+from datetime import datetime
+
+import pytest
+
+import crud
+import crud_async
+from database import AsyncSessionLocal, SessionLocal
+from models import URL, Click
+
+
+@pytest.fixture
+def url(db_session):
+    url = URL(original_url="https://example.com", short_code="abc123")
+    db_session.add(url)
+    db_session.commit()
+    return url
+
+
+def click_count(db_session, url_id):
+    db_session.expire_all()
+    return db_session.get(URL, url_id).click_count
+
+
+class TestIncrementClickCount:
+    """Test increment_click_count."""
+
+    def test_unknown_url(self, db_session):
+        assert not crud.increment_click_count(db_session, 999)
+
+    def test_concurrent_increments_are_not_lost(self, db_session, url):
+        """Each increment is a single UPDATE, so concurrent sessions never overwrite each other."""
+        def worker():
+            db = SessionLocal()
+            try:
+                for _ in range(25):
+                    crud.increment_click_count(db, url.id)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert click_count(db_session, url.id) == 100
+
+    def test_async_increment(self, db_session, url, run_async):
+        async def increment():
+            async with AsyncSessionLocal() as db:
+                return await crud_async.increment_click_count(db, url.id)
+
+        assert run_async(increment())
+        assert click_count(db_session, url.id) == 1
+
+
+class TestReconcileClickCounts:
+    """Test find_click_count_mismatches and reconcile_click_counts."""
+
+    def test_consistent(self, db_session, url):
+        crud.record_clicks_bulk(db_session, [(url.id, datetime.utcnow(), None, None, None)] * 3)
+        assert crud.find_click_count_mismatches(db_session) == []
+
+    def test_detects_and_fixes_drift(self, db_session, url):
+        crud.record_clicks_bulk(db_session, [(url.id, datetime.utcnow(), None, None, None)] * 3)
+        crud.increment_click_count(db_session, url.id)
+        other = URL(original_url="https://example.com/other", short_code="other1", click_count=5)
+        db_session.add(other)
+        db_session.commit()
+
+        expected = [(url.id, 4, 3), (other.id, 5, 0)]
+        assert crud.find_click_count_mismatches(db_session) == expected
+        assert crud.reconcile_click_counts(db_session) == expected
+        assert crud.find_click_count_mismatches(db_session) == []
+        assert click_count(db_session, url.id) == 3
+        assert click_count(db_session, other.id) == 0
+
+    def test_counts_deleted_clicks_as_drift(self, db_session, url):
+        crud.record_clicks_bulk(db_session, [(url.id, datetime.utcnow(), None, None, None)] * 2)
+        db_session.query(Click).delete()
+        db_session.commit()
+        assert crud.reconcile_click_counts(db_session) == [(url.id, 2, 0)]
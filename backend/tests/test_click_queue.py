@@ -0,0 +1,121 @@
+"""
+Tests for the background click ingestor.
+"""
+import logging
+import threading
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import crud
+from models import URL, Click
+from utils.click_queue import ClickIngestor
+
+
+@pytest.fixture
+def url(db_session):
+    url = URL(original_url="https://example.com", short_code="abc123")
+    db_session.add(url)
+    db_session.commit()
+    return url
+
+
+def click_count(db_session, url_id):
+    db_session.expire_all()
+    return db_session.query(Click).filter(Click.url_id == url_id).count()
+
+
+class TestClickIngestor:
+    """Test ClickIngestor."""
+
+    def test_stop_drains_queue(self, db_session, url):
+        """Events still queued when stop() is called are written before it returns."""
+        ingestor = ClickIngestor(batch_size=1000, flush_interval=3600)
+        ingestor.start()
+        for _ in range(25):
+            assert ingestor.enqueue(url.id, "ua", "192.0.2.1", None)
+        ingestor.stop()
+
+        assert not ingestor.running
+        assert ingestor.flushed_clicks == 25
+        assert click_count(db_session, url.id) == 25
+        db_session.refresh(url)
+        assert url.click_count == 25
+
+    def test_stop_timeout(self, db_session, url, monkeypatch, caplog):
+        """stop() gives up after the timeout, even with a full queue, and reports what is left."""
+        record_clicks_bulk = crud.record_clicks_bulk
+        started, release = threading.Event(), threading.Event()
+
+        def blocked(db, records):
+            started.set()
+            assert release.wait(5)
+            record_clicks_bulk(db, records)
+
+        monkeypatch.setattr(crud, "record_clicks_bulk", blocked)
+        ingestor = ClickIngestor(batch_size=1, flush_interval=3600, max_queue_size=2)
+        ingestor.start()
+        ingestor.enqueue(url.id, None, None, None)
+        assert started.wait(5)
+        for _ in range(2):
+            assert ingestor.enqueue(url.id, None, None, None)
+
+        with caplog.at_level(logging.WARNING, logger="utils.click_queue"):
+            assert not ingestor.stop(timeout=0.1)
+        assert "2 events left in queue" in caplog.text
+        assert ingestor.running
+
+        release.set()
+        assert ingestor.stop()
+        assert click_count(db_session, url.id) == 3
+
+    def test_flushes_by_batch_size(self, db_session, url):
+        ingestor = ClickIngestor(batch_size=10, flush_interval=3600)
+        ingestor.start()
+        for _ in range(20):
+            ingestor.enqueue(url.id, None, None, None)
+        ingestor.stop()
+        assert ingestor.flush_count == 2
+
+    def test_full_queue_rejects(self, url):
+        ingestor = ClickIngestor(batch_size=10, flush_interval=1, max_queue_size=1)
+        assert ingestor.enqueue(url.id, None, None, None)
+        assert not ingestor.enqueue(url.id, None, None, None)
+
+    def test_transient_error_is_retried(self, db_session, url, monkeypatch):
+        record_clicks_bulk = crud.record_clicks_bulk
+        calls = []
+
+        def flaky(db, records):
+            calls.append(len(records))
+            if len(calls) == 1:
+                raise OperationalError("INSERT", {}, Exception("database is locked"))
+            record_clicks_bulk(db, records)
+
+        monkeypatch.setattr(crud, "record_clicks_bulk", flaky)
+        ingestor = ClickIngestor(batch_size=100, flush_interval=3600, retries=2, retry_backoff=0)
+        ingestor.start()
+        for _ in range(5):
+            ingestor.enqueue(url.id, None, None, None)
+        ingestor.stop()
+
+        assert calls == [5, 5]
+        assert ingestor.retried_flushes == 1
+        assert ingestor.failed_clicks == 0
+        assert click_count(db_session, url.id) == 5
+
+    def test_batch_dropped_after_retries(self, db_session, url, monkeypatch):
+        def broken(db, records):
+            raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+        monkeypatch.setattr(crud, "record_clicks_bulk", broken)
+        ingestor = ClickIngestor(batch_size=100, flush_interval=3600, retries=2, retry_backoff=0)
+        ingestor.start()
+        for _ in range(5):
+            ingestor.enqueue(url.id, None, None, None)
+        ingestor.stop()
+
+        assert ingestor.retried_flushes == 2
+        assert ingestor.failed_clicks == 5
+        assert ingestor.flushed_clicks == 0
+        assert click_count(db_session, url.id) == 0
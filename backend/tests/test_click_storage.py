@@ -0,0 +1,177 @@
+"""
+Tests for compact click storage: packed IPs, string dictionaries and migration 0009.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+import crud
+from models import URL, Click, UserAgent
+from utils.cache import MISSING
+from utils.packed_ip import pack_ip, unpack_ip
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def url(db_session):
+    url = URL(original_url="https://example.com", short_code="abc123")
+    db_session.add(url)
+    db_session.commit()
+    return url
+
+
+class TestPackedIP:
+    """Test pack_ip and unpack_ip."""
+
+    @pytest.mark.parametrize("value, size", [
+        ("192.0.2.1", 4),
+        ("2001:db8::1", 16),
+        ("::ffff:192.0.2.1", 16),
+    ])
+    def test_round_trip(self, value, size):
+        packed = pack_ip(value)
+        assert len(packed) == size
+        assert unpack_ip(packed) == value
+
+    def test_ipv6_is_normalized(self):
+        assert unpack_ip(pack_ip("2001:DB8:0:0:0:0:0:1")) == "2001:db8::1"
+
+    @pytest.mark.parametrize("value", [None, "", "unknown", "999.0.0.1", "testclient"])
+    def test_not_an_address(self, value):
+        assert pack_ip(value) is None
+
+    def test_unpack_none(self):
+        assert unpack_ip(None) is None
+
+
+class TestStringDictionary:
+    """Test the user agent / referrer dictionaries."""
+
+    def test_same_string_same_id(self, db_session):
+        first = crud.user_agent_dictionary.resolve(db_session, ["a", "b", None, "a"])
+        db_session.commit()
+        second = crud.user_agent_dictionary.resolve(db_session, ["b", "c"])
+        db_session.commit()
+        assert set(first) == {"a", "b"}
+        assert second["b"] == first["b"]
+        assert len({*first.values(), *second.values()}) == 3
+        assert db_session.query(UserAgent).count() == 3
+
+    def test_cache_only_after_remember(self, db_session):
+        ids = crud.user_agent_dictionary.resolve(db_session, ["a"])
+        assert crud.user_agent_ids.get("a") is MISSING
+        db_session.commit()
+        crud.user_agent_dictionary.remember(ids)
+        assert crud.user_agent_ids.get("a") == ids["a"]
+
+    def test_rolled_back_ids_are_not_cached(self, db_session):
+        """A failed click write leaves no dictionary id in the cache."""
+        crud.user_agent_dictionary.resolve(db_session, ["a"])
+        db_session.rollback()
+        assert crud.user_agent_ids.get("a") is MISSING
+        assert db_session.query(UserAgent).count() == 0
+
+    def test_clicks_share_dictionary_rows(self, db_session, url):
+        crud.record_clicks_bulk(db_session, [
+            (url.id, datetime.utcnow(), "Mozilla/5.0", "192.0.2.1", "https://ref.example")
+            for _ in range(3)
+        ])
+        clicks = db_session.query(Click).all()
+        assert len({click.user_agent_id for click in clicks}) == 1
+        assert len({click.referrer_id for click in clicks}) == 1
+        assert clicks[0].ip == pack_ip("192.0.2.1")
+
+
+class TestClicksAPI:
+    """Test that the click history still returns plain strings."""
+
+    def test_click_fields(self, client, auth_headers, db_session, url):
+        crud.record_clicks_bulk(db_session, [
+            (url.id, datetime.utcnow(), "Mozilla/5.0", "2001:db8::1", "https://ref.example"),
+            (url.id, datetime.utcnow(), None, "unknown", None),
+        ])
+        response = client.get(f"/api/urls/{url.id}/clicks", headers=auth_headers)
+        assert response.status_code == 200
+        fields = sorted(
+            ((click["user_agent"], click["ip_address"], click["referrer"]) for click in response.json()),
+            key=repr,
+        )
+        assert fields == [
+            ("Mozilla/5.0", "2001:db8::1", "https://ref.example"),
+            (None, None, None),
+        ]
+
+
+def alembic(database_path, *args):
+    """Run alembic against a separate SQLite database."""
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database_path}")
+    subprocess.run(
+        [sys.executable, "-m", "alembic", *args],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True,
+    )
+
+
+class TestMigration0009:
+    """Test upgrading and downgrading old-format click rows."""
+
+    OLD_ROWS = [
+        (1, "Mozilla/5.0", "192.0.2.1", "https://ref.example"),
+        (2, "Mozilla/5.0", "2001:db8::1", None),
+        (3, None, "unknown", "https://ref.example"),
+        (4, "curl/8.0", None, None),
+    ]
+
+    @pytest.fixture
+    def database(self, tmp_path):
+        path = tmp_path / "migration.db"
+        alembic(path, "upgrade", "0008")
+        conn = sqlite3.connect(path)
+        conn.execute("INSERT INTO urls (id, original_url, short_code, click_count) VALUES (1, 'https://example.com', 'abc123', 4)")
+        conn.executemany(
+            "INSERT INTO clicks (id, url_id, clicked_at, user_agent, ip_address, referrer) "
+            "VALUES (?, 1, '2026-10-01 12:00:00', ?, ?, ?)",
+            self.OLD_ROWS,
+        )
+        conn.commit()
+        conn.close()
+        return path
+
+    def test_upgrade_converts_rows(self, database):
+        alembic(database, "upgrade", "0009")
+        conn = sqlite3.connect(database)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(clicks)")}
+        assert {"user_agent_id", "ip", "referrer_id"} <= columns
+        assert not {"user_agent", "ip_address", "referrer"} & columns
+
+        rows = conn.execute(
+            "SELECT clicks.id, user_agents.value, clicks.ip, referrers.value FROM clicks "
+            "LEFT JOIN user_agents ON user_agents.id = clicks.user_agent_id "
+            "LEFT JOIN referrers ON referrers.id = clicks.referrer_id ORDER BY clicks.id"
+        ).fetchall()
+        assert rows == [
+            (click_id, user_agent, pack_ip(ip), referrer) for click_id, user_agent, ip, referrer in self.OLD_ROWS
+        ]
+        assert conn.execute("SELECT COUNT(*) FROM user_agents").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM referrers").fetchone()[0] == 1
+        hashes = dict(conn.execute("SELECT value, value_hash FROM user_agents"))
+        assert hashes["curl/8.0"] == crud._string_hash("curl/8.0")
+        conn.close()
+
+    def test_downgrade_restores_rows(self, database):
+        alembic(database, "upgrade", "0009")
+        alembic(database, "downgrade", "0008")
+        conn = sqlite3.connect(database)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert not {"user_agents", "referrers"} & tables
+        rows = conn.execute("SELECT id, user_agent, ip_address, referrer FROM clicks ORDER BY id").fetchall()
+        # IPアドレスでない値はNULLとして保存されるため戻らない
+        assert rows == [
+            (click_id, user_agent, ip if pack_ip(ip) else None, referrer)
+            for click_id, user_agent, ip, referrer in self.OLD_ROWS
+        ]
+        conn.close()
@@ -0,0 +1,95 @@
+"""
+Tests for database URL and engine configuration.
+"""
+import os
+
+import pytest
+
+import database
+from config import settings
+from database import to_async_database_url
+
+
+class TestAsyncDatabaseURL:
+    """Test to_async_database_url."""
+
+    @pytest.mark.parametrize("url, expected", [
+        ("sqlite:///./data/app.db", "sqlite+aiosqlite:///./data/app.db"),
+        ("sqlite:///:memory:", "sqlite+aiosqlite:///:memory:"),
+        ("postgresql://u:p@db:5432/app", "postgresql+asyncpg://u:p@db:5432/app"),
+        ("postgresql+psycopg2://u:p@db/app", "postgresql+asyncpg://u:p@db/app"),
+        ("postgres://u:p@db/app", "postgresql+asyncpg://u:p@db/app"),
+        ("postgresql+asyncpg://u:p@db/app", "postgresql+asyncpg://u:p@db/app"),
+    ])
+    def test_conversion(self, url, expected):
+        assert to_async_database_url(url) == expected
+
+    def test_async_drivers_are_pinned(self):
+        """Every driver the conversion can select is a pinned requirement."""
+        with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), "requirements.txt")) as f:
+            requirements = {line.split("==")[0].strip().lower() for line in f if "==" in line}
+        assert {"aiosqlite", "asyncpg", "psycopg2-binary"} <= requirements
+
+
+class FakeCursor:
+    """Records executed statements; PRAGMA journal_mode reports `journal_mode`."""
+
+    def __init__(self, journal_mode):
+        self.journal_mode = journal_mode
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+    def fetchone(self):
+        return (self.journal_mode,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, journal_mode):
+        self.cursor_ = FakeCursor(journal_mode)
+
+    def cursor(self):
+        return self.cursor_
+
+
+class TestSQLiteProfile:
+    """Test the SQLite engine profile."""
+
+    def test_pragmas_are_applied(self):
+        with database.engine.connect() as conn:
+            values = {
+                name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in ("journal_mode", "busy_timeout", "synchronous", "temp_store", "cache_size")
+            }
+        assert values == {
+            "journal_mode": settings.sqlite_journal_mode.lower(),
+            "busy_timeout": settings.sqlite_busy_timeout,
+            "synchronous": 1,  # NORMAL
+            "temp_store": 2,  # MEMORY
+            "cache_size": settings.sqlite_cache_size,
+        }
+
+    def test_busy_timeout_comes_first(self):
+        assert list(database.sqlite_pragmas())[0] == "busy_timeout"
+
+    def test_journal_mode_is_not_reset_when_already_set(self):
+        """Changing journal_mode needs an exclusive lock, so it is skipped when it already matches."""
+        conn = FakeConnection(settings.sqlite_journal_mode.lower())
+        database._set_sqlite_pragmas(conn, None)
+        assert "PRAGMA journal_mode" in conn.cursor_.statements
+        assert not any(statement.startswith("PRAGMA journal_mode=") for statement in conn.cursor_.statements)
+
+        conn = FakeConnection("delete")
+        database._set_sqlite_pragmas(conn, None)
+        assert f"PRAGMA journal_mode={settings.sqlite_journal_mode}" in conn.cursor_.statements
+
+    def test_no_pool_sizing_for_sqlite(self):
+        options = database.engine_options()
+        assert "pool_size" not in options and "max_overflow" not in options
+        profile = database.engine_profile()
+        assert profile["dialect"] == "sqlite"
+        assert profile["pragmas"]["journal_mode"] == settings.sqlite_journal_mode
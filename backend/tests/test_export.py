@@ -0,0 +1,101 @@
+"""
+Tests for the streaming click export.
+"""
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+import crud
+from api import export
+from models import URL
+
+
+@pytest.fixture
+def urls(db_session):
+    urls = [URL(original_url=f"https://example.com/{i}", short_code=f"code{i}") for i in range(2)]
+    db_session.add_all(urls)
+    db_session.commit()
+    crud.record_clicks_bulk(db_session, [
+        (urls[0].id, datetime(2026, 10, 1, 14, 0), "Mozilla/5.0", "192.0.2.1", "https://ref.example"),
+        (urls[1].id, datetime(2026, 10, 1, 15, 0), None, "unknown", None),
+        (urls[0].id, datetime(2026, 10, 1, 16, 0), 'say "hi", ok', "2001:db8::1", None),
+    ])
+    return urls
+
+
+def export_clicks(client, headers, **params):
+    response = client.get("/api/export/clicks", params=params, headers=headers)
+    assert response.status_code == 200
+    return response
+
+
+class TestExportClicks:
+    """Test GET /api/export/clicks."""
+
+    def test_csv(self, client, auth_headers, urls):
+        response = export_clicks(client, auth_headers)
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.headers["content-disposition"] == 'attachment; filename="clicks.csv"'
+
+        rows = list(csv.reader(io.StringIO(response.text)))
+        assert tuple(rows[0]) == export.EXPORT_COLUMNS
+        assert [row[2] for row in rows[1:]] == ["code0", "code1", "code0"]
+        # 日時はJST、IPアドレスでない値は空欄
+        assert rows[1][3:] == ["2026-10-01T23:00:00+09:00", "Mozilla/5.0", "192.0.2.1", "https://ref.example"]
+        assert rows[2][4:] == ["", "", ""]
+        assert rows[3][4:6] == ['say "hi", ok', "2001:db8::1"]
+
+    def test_ndjson(self, client, auth_headers, urls):
+        response = export_clicks(client, auth_headers, format="ndjson")
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["url_id"] for row in rows] == [urls[0].id, urls[1].id, urls[0].id]
+        assert rows[1]["ip_address"] is None
+        assert rows[2]["clicked_at"] == "2026-10-02T01:00:00+09:00"
+
+    def test_filters(self, client, auth_headers, urls):
+        response = export_clicks(client, auth_headers, format="ndjson", url_id=urls[0].id,
+                                 start="2026-10-01T23:30:00", end="2026-10-02T02:00:00")
+        assert response.headers["content-disposition"] == f'attachment; filename="clicks-{urls[0].id}.ndjson"'
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["clicked_at"] for row in rows] == ["2026-10-02T01:00:00+09:00"]
+
+    def test_streams_in_chunks(self, client, auth_headers, urls, monkeypatch):
+        monkeypatch.setattr(export.settings, "export_chunk_size", 1)
+        response = export_clicks(client, auth_headers, format="ndjson")
+        assert len(response.text.splitlines()) == 3
+
+    def test_gzip(self, client, auth_headers, urls):
+        with client.stream("GET", "/api/export/clicks", headers={**auth_headers, "Accept-Encoding": "gzip"}) as response:
+            assert response.headers["content-encoding"] == "gzip"
+            assert response.headers["vary"] == "Accept-Encoding"
+            body = gzip.decompress(b"".join(response.iter_raw()))
+        assert len(body.decode("utf-8").splitlines()) == 4
+
+    @pytest.mark.parametrize("accept_encoding", ["gzip;q=0", "br, gzip; q=0.0", "*;q=0", "identity"])
+    def test_gzip_refused(self, client, auth_headers, urls, accept_encoding):
+        with client.stream("GET", "/api/export/clicks",
+                           headers={**auth_headers, "Accept-Encoding": accept_encoding}) as response:
+            assert "content-encoding" not in response.headers
+            body = b"".join(response.iter_raw())
+        assert len(body.decode("utf-8").splitlines()) == 4
+
+    @pytest.mark.parametrize("accept_encoding", ["GZIP;q=0.5", "br;q=1, *;q=0.1", "deflate, gzip"])
+    def test_accepts_gzip(self, accept_encoding):
+        assert export._accepts_gzip(accept_encoding)
+
+    def test_invalid_range(self, client, auth_headers, urls):
+        response = client.get("/api/export/clicks", params={"start": "2026-10-02", "end": "2026-10-01"},
+                              headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_unknown_url(self, client, auth_headers):
+        response = client.get("/api/export/clicks", params={"url_id": 999}, headers=auth_headers)
+        assert response.status_code == 404
+
+    def test_requires_auth(self, client):
+        assert client.get("/api/export/clicks").status_code in (401, 403)
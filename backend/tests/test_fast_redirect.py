@@ -0,0 +1,63 @@
+"""
+Tests for the lightweight ASGI redirect route.
+"""
+import pytest
+from fastapi.responses import RedirectResponse
+
+from api.redirect import RedirectRoute, fast_routes
+from main import app
+from models import Click
+
+
+@pytest.fixture
+def created(client, auth_headers):
+    def create(original_url):
+        response = client.post("/api/urls", json={"original_url": original_url}, headers=auth_headers)
+        assert response.status_code == 201
+        return response.json()
+    return create
+
+
+class TestFastRedirect:
+    """Test fast_redirect."""
+
+    def test_routes_are_registered(self):
+        paths = {route.path for route in app.router.routes if isinstance(route, RedirectRoute)}
+        assert paths == {route.path for route in fast_routes} == {"/{short_code}", "/r/{short_code}"}
+
+    @pytest.mark.parametrize("prefix", ["/", "/r/"])
+    def test_redirect(self, client, created, prefix):
+        url = created("https://example.com/page?q=1")
+        response = client.get(f"{prefix}{url['short_code']}", follow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers["location"] == "https://example.com/page?q=1"
+        assert response.headers["cache-control"] == "no-store"
+        assert response.content == b""
+
+    def test_location_is_encoded_like_redirect_response(self, client, created):
+        original_url = "https://example.com/パス?q=値"
+        url = created(original_url)
+        response = client.get(f"/r/{url['short_code']}", follow_redirects=False)
+        assert response.headers["location"] == RedirectResponse(original_url).headers["location"]
+
+    def test_not_found_uses_error_format(self, client):
+        response = client.get("/r/nosuch", follow_redirects=False)
+        assert response.status_code == 404
+        assert response.json()["error"]["code"] == "NOT_FOUND_ERROR"
+
+    def test_click_is_recorded(self, client, created, db_session, flush_clicks):
+        url = created("https://example.com/")
+        client.get(f"/r/{url['short_code']}", follow_redirects=False,
+                   headers={"User-Agent": "pytest-agent", "Referer": "https://ref.example"})
+        flush_clicks()
+        db_session.expire_all()
+        click = db_session.query(Click).filter(Click.url_id == url["id"]).one()
+        assert click.user_agent == "pytest-agent"
+        assert click.referrer == "https://ref.example"
+
+    def test_head_is_not_a_click(self, client, created, db_session, flush_clicks):
+        url = created("https://example.com/")
+        response = client.head(f"/r/{url['short_code']}", follow_redirects=False)
+        assert response.status_code == 405
+        flush_clicks()
+        assert db_session.query(Click).count() == 0
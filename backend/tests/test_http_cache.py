@@ -0,0 +1,104 @@
+"""
+Tests for conditional GETs on the JSON API and redirect caching policies.
+"""
+from datetime import datetime
+
+import crud
+from config import settings
+
+
+def create_url(client, headers, **extra):
+    response = client.post("/api/urls", json={"original_url": "https://example.com/a", **extra}, headers=headers)
+    assert response.status_code == 201
+    return response.json()
+
+
+class TestConditionalGet:
+    """Test ETag / Last-Modified handling on the JSON API."""
+
+    def test_etag_revalidation(self, client, auth_headers):
+        create_url(client, auth_headers)
+        first = client.get("/api/urls", headers=auth_headers)
+        assert first.status_code == 200
+        etag = first.headers["ETag"]
+        assert etag.startswith('W/"')
+        assert first.headers["Cache-Control"] == "private, no-cache"
+
+        second = client.get("/api/urls", headers={**auth_headers, "If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["ETag"] == etag
+
+        # 強いETagとして送られても弱い比較で一致する
+        strong = client.get("/api/urls", headers={**auth_headers, "If-None-Match": etag[2:]})
+        assert strong.status_code == 304
+
+    def test_etag_changes_with_content(self, client, auth_headers):
+        create_url(client, auth_headers)
+        etag = client.get("/api/urls", headers=auth_headers).headers["ETag"]
+        create_url(client, auth_headers)
+
+        response = client.get("/api/urls", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert len(response.json()["urls"]) == 2
+
+    def test_if_modified_since(self, client, auth_headers, db_session):
+        url = create_url(client, auth_headers)
+        clicked_at = datetime(2026, 10, 1, 12, 0, 0)
+        crud.record_clicks_bulk(db_session, [(url["id"], clicked_at, None, None, None)])
+
+        path = f"/api/urls/{url['id']}/clicks"
+        last_modified = client.get(path, headers=auth_headers).headers["Last-Modified"]
+        assert last_modified == "Thu, 01 Oct 2026 12:00:00 GMT"
+
+        not_modified = client.get(path, headers={**auth_headers, "If-Modified-Since": last_modified})
+        assert not_modified.status_code == 304
+
+        earlier = "Thu, 01 Oct 2026 11:59:59 GMT"
+        assert client.get(path, headers={**auth_headers, "If-Modified-Since": earlier}).status_code == 200
+
+    def test_if_none_match_takes_precedence(self, client, auth_headers, db_session):
+        url = create_url(client, auth_headers)
+        crud.record_clicks_bulk(db_session, [(url["id"], datetime(2026, 10, 1), None, None, None)])
+        path = f"/api/urls/{url['id']}/clicks"
+        response = client.get(path, headers={
+            **auth_headers, "If-None-Match": 'W/"other"', "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT",
+        })
+        assert response.status_code == 200
+
+
+class TestRedirectPolicy:
+    """Test per-URL redirect caching policy."""
+
+    def test_tracked_by_default(self, client, auth_headers):
+        url = create_url(client, auth_headers)
+        assert url["redirect_policy"] == settings.redirect_default_policy == "tracked"
+        response = client.get(f"/r/{url['short_code']}", follow_redirects=False)
+        assert response.status_code == settings.redirect_tracked_status
+        assert response.headers["Cache-Control"] == "no-store"
+
+    def test_permanent(self, client, auth_headers):
+        url = create_url(client, auth_headers, redirect_policy="permanent")
+        response = client.get(f"/r/{url['short_code']}", follow_redirects=False)
+        assert response.status_code == settings.redirect_permanent_status
+        assert response.headers["Cache-Control"] == f"public, max-age={settings.redirect_permanent_max_age}"
+
+    def test_policy_change_invalidates_cached_redirect(self, client, auth_headers):
+        url = create_url(client, auth_headers)
+        client.get(f"/r/{url['short_code']}", follow_redirects=False)
+
+        response = client.patch(f"/api/urls/{url['id']}", json={"redirect_policy": "permanent"}, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["redirect_policy"] == "permanent"
+        response = client.get(f"/r/{url['short_code']}", follow_redirects=False)
+        assert response.status_code == settings.redirect_permanent_status
+
+        client.patch(f"/api/urls/{url['id']}", json={"redirect_policy": None}, headers=auth_headers)
+        response = client.get(f"/r/{url['short_code']}", follow_redirects=False)
+        assert response.status_code == settings.redirect_tracked_status
+
+    def test_invalid_policy(self, client, auth_headers):
+        response = client.post("/api/urls", json={"original_url": "https://example.com", "redirect_policy": "forever"},
+                               headers=auth_headers)
+        assert response.status_code == 400
@@ -0,0 +1,127 @@
+"""
+Tests for HyperLogLog sketches and daily unique-visitor estimates.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import crud
+from api.stats import estimate_visitors
+from models import URL, ClickVisitorSketch
+from utils.hyperloglog import HyperLogLog, relative_error
+
+
+def sketch_of(items, precision=12):
+    sketch = HyperLogLog(precision)
+    sketch.update(items)
+    return sketch
+
+
+class TestHyperLogLog:
+    """Test HyperLogLog."""
+
+    def test_empty(self):
+        assert HyperLogLog(12).count() == 0
+
+    def test_duplicates_do_not_count(self):
+        sketch = HyperLogLog(12)
+        assert sketch.add("a")
+        assert not sketch.add("a")
+        sketch.update(["a"] * 100)
+        assert sketch.count() == 1
+
+    @pytest.mark.parametrize("n", [10, 1000, 50000])
+    def test_estimate_within_error(self, n):
+        sketch = sketch_of(f"visitor-{i}" for i in range(n))
+        # 相対標準誤差の4倍以内（p=12で約6.5%）
+        assert abs(sketch.count() - n) <= max(1, 4 * relative_error(12) * n)
+
+    def test_merge_is_union(self):
+        a = sketch_of(f"v{i}" for i in range(0, 6000))
+        b = sketch_of(f"v{i}" for i in range(4000, 10000))
+        union = sketch_of(f"v{i}" for i in range(0, 10000))
+        a.merge(b)
+        assert a.registers == union.registers
+        assert abs(a.count() - 10000) <= 4 * relative_error(12) * 10000
+
+    def test_merge_is_idempotent_and_commutative(self):
+        a = sketch_of(f"a{i}" for i in range(500))
+        b = sketch_of(f"b{i}" for i in range(500))
+        ab = HyperLogLog.from_bytes(a.to_bytes())
+        ab.merge(b)
+        ba = HyperLogLog.from_bytes(b.to_bytes())
+        ba.merge(a)
+        assert ab.registers == ba.registers
+        before = bytes(ab.registers)
+        ab.merge(b)
+        assert bytes(ab.registers) == before
+
+    def test_merge_requires_same_precision(self):
+        with pytest.raises(ValueError):
+            HyperLogLog(10).merge(HyperLogLog(12))
+
+    def test_serialization(self):
+        sketch = sketch_of(f"v{i}" for i in range(300))
+        restored = HyperLogLog.from_bytes(sketch.to_bytes())
+        assert restored.precision == 12
+        assert restored.registers == sketch.registers
+        # 少数の要素しか見ていないスケッチは小さい
+        assert len(HyperLogLog(14).to_bytes()) < 100
+
+    @pytest.mark.parametrize("data", [b"", b"\x02\x0c", b"\x01\x0c" + b"not zlib"])
+    def test_invalid_bytes(self, data):
+        with pytest.raises(Exception):
+            HyperLogLog.from_bytes(data)
+
+    def test_invalid_precision(self):
+        with pytest.raises(ValueError):
+            HyperLogLog(3)
+
+
+class TestVisitorSketches:
+    """Test daily visitor sketches in the database."""
+
+    def test_incremental_matches_rebuild(self, db_session):
+        url = URL(original_url="https://example.com", short_code="hll001")
+        db_session.add(url)
+        db_session.commit()
+        day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        clicks = [
+            (url.id, day + timedelta(minutes=i), f"ua{i % 7}", f"192.0.2.{i % 50}", None)
+            for i in range(400)
+        ] + [(url.id, day + timedelta(days=1, minutes=i), "ua0", f"198.51.100.{i % 30}", None) for i in range(60)]
+        crud.record_clicks_bulk(db_session, clicks[:200])
+        crud.record_clicks_bulk(db_session, clicks[200:])
+
+        def stored():
+            db_session.expire_all()
+            return {(row.url_id, row.bucket_start): row.sketch for row in db_session.query(ClickVisitorSketch)}
+
+        incremental = stored()
+        assert set(incremental) == {
+            (url.id, day), (url.id, day + timedelta(days=1)),
+            (crud.ALL_URLS_SKETCH_ID, day), (crud.ALL_URLS_SKETCH_ID, day + timedelta(days=1)),
+        }
+        crud.rebuild_visitor_sketches(db_session)
+        assert stored() == incremental
+
+        sketches = sorted((bucket, data) for (url_id, bucket), data in incremental.items() if url_id == url.id)
+        daily, total, _ = estimate_visitors(sketches)
+        # 1日目: 50 IP × 7 UA の組のうち出現した組（lcm(7, 50) = 350 通り）、2日目: 30
+        assert abs(daily[day] - 350) <= 10
+        assert abs(daily[day + timedelta(days=1)] - 30) <= 2
+        assert abs(total - 380) <= 12
+
+    def test_visitor_endpoint(self, client, auth_headers, db_session):
+        url = client.post("/api/urls", json={"original_url": "https://example.com"}, headers=auth_headers).json()
+        now = datetime.utcnow()
+        crud.record_clicks_bulk(db_session, [(url["id"], now, "ua", f"203.0.113.{i}", None) for i in range(5)] * 3)
+
+        response = client.get(f"/api/urls/{url['id']}/visitors", params={"days": 3}, headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["unique_visitors"] == 5
+        assert [day["unique_visitors"] for day in data["days"]] == [0, 0, 5]
+
+        overall = client.get("/api/stats/visitors", params={"days": 1}, headers=auth_headers).json()
+        assert overall["unique_visitors"] == 5
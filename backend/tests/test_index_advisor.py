@@ -0,0 +1,62 @@
+"""
+Tests for the index advisor.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+import crud
+from database import engine
+from models import URL
+from utils.index_advisor import run_index_advisor
+
+# 集計のため全件を読むことが前提のクエリ
+AGGREGATE_SOURCES = {"crud.find_click_count_mismatches", "crud.get_total_clicks", "crud_async.get_total_clicks"}
+
+
+@pytest.fixture
+def urls(db_session, test_user):
+    urls = [URL(original_url=f"https://example.com/{i}", short_code=f"code{i}") for i in range(30)]
+    db_session.add_all(urls)
+    db_session.commit()
+    crud.record_clicks_bulk(db_session, [(urls[0].id, datetime.utcnow(), "ua", "192.0.2.1", None)] * 30)
+    return urls
+
+
+@pytest.fixture
+def without_click_count_index():
+    """Drop ix_urls_click_count for one test and restore it afterwards."""
+    with engine.begin() as conn:
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'ix_urls_click_count'")).scalar()
+        conn.execute(text("DROP INDEX ix_urls_click_count"))
+    yield
+    # プール内の接続は削除前のスキーマを保持しているため、新しい接続で作り直す
+    engine.dispose()
+    with engine.begin() as conn:
+        conn.execute(text(sql))
+    engine.dispose()
+
+
+class TestIndexAdvisor:
+    """Test run_index_advisor."""
+
+    def test_hot_queries_use_indexes(self, urls, run_async):
+        report = run_async(run_index_advisor(threshold=0))
+        assert report.checked_statements > 0
+        assert {finding.source for finding in report.findings} <= AGGREGATE_SOURCES
+
+    def test_threshold(self, urls, run_async):
+        report = run_async(run_index_advisor(threshold=1000))
+        assert report.findings == []
+
+    def test_missing_index_is_reported(self, urls, run_async, without_click_count_index):
+        report = run_async(run_index_advisor(threshold=0))
+        findings = [finding for finding in report.findings if finding.source == "crud_async.get_top_urls"]
+        assert [(finding.table, finding.rows) for finding in findings] == [("urls", 30)]
+
+    def test_probes_are_rolled_back(self, urls, db_session, run_async):
+        run_async(run_index_advisor(threshold=0))
+        db_session.expire_all()
+        assert db_session.query(URL).count() == 30
+        assert db_session.get(URL, urls[0].id).click_count == 30
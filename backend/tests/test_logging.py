@@ -0,0 +1,82 @@
+"""
+Tests for the queued JSON logging handlers.
+"""
+import json
+import logging
+import queue
+
+from utils.logging import JSONFormatter, LogSampler, NonBlockingQueueHandler
+
+
+def make_record(msg="user %s logged in", args=("alice",), **extra):
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestNonBlockingQueueHandler:
+    """Test NonBlockingQueueHandler."""
+
+    def test_prepare_does_not_modify_the_record(self):
+        """Other handlers that see the same record keep the original msg/args."""
+        handler = NonBlockingQueueHandler(queue.Queue())
+        record = make_record()
+        prepared = handler.prepare(record)
+
+        assert prepared is not record
+        assert prepared.msg == "user alice logged in"
+        assert prepared.args is None
+        assert record.msg == "user %s logged in"
+        assert record.args == ("alice",)
+
+    def test_other_handlers_see_original_record(self):
+        log_queue = queue.Queue()
+        seen = []
+
+        class Capture(logging.Handler):
+            def emit(self, record):
+                seen.append((record.msg, record.args))
+
+        logger = logging.getLogger("tests.logging.shared")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        handlers = [NonBlockingQueueHandler(log_queue), Capture()]
+        for handler in handlers:
+            logger.addHandler(handler)
+        try:
+            logger.info("n=%d", 5)
+        finally:
+            for handler in handlers:
+                logger.removeHandler(handler)
+
+        assert seen == [("n=%d", (5,))]
+        assert log_queue.get_nowait().msg == "n=5"
+
+    def test_full_queue_drops(self):
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+        handler.handle(make_record())
+        handler.handle(make_record())
+        assert handler.dropped == 1
+
+
+class TestJSONFormatter:
+    """Test JSONFormatter."""
+
+    def test_extra_fields(self):
+        line = JSONFormatter().format(make_record(url_id=3, sample_rate=0.01))
+        data = json.loads(line)
+        assert data["message"] == "user alice logged in"
+        assert data["logger"] == "app.test"
+        assert data["url_id"] == 3
+        assert data["sample_rate"] == 0.01
+
+
+class TestLogSampler:
+    """Test LogSampler."""
+
+    def test_longest_prefix(self):
+        sampler = LogSampler({"api": 0.5, "api.redirect": 0.01})
+        assert sampler.rate("api.redirect") == 0.01
+        assert sampler.rate("api.redirect.fast") == 0.01
+        assert sampler.rate("api.urls") == 0.5
+        assert sampler.rate("apix") == 1.0
@@ -0,0 +1,96 @@
+"""
+Tests for the Prometheus metrics registry, middleware and endpoint.
+"""
+import re
+
+import pytest
+
+from utils.metrics import MetricsRegistry, UNMATCHED_ROUTE
+
+
+def sample(text, name, **labels):
+    """Value of the sample with exactly these labels (None if absent)."""
+    for line in text.splitlines():
+        match = re.fullmatch(rf"{re.escape(name)}(?:\{{(.*)\}})? (\S+)", line)
+        if not match:
+            continue
+        found = dict(re.findall(r'(\w+)="((?:[^"\\]|\\.)*)"', match.group(1) or ""))
+        if found == labels:
+            return float(match.group(2))
+    return None
+
+
+class TestRegistry:
+    """Test MetricsRegistry rendering."""
+
+    def test_counter(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests.", ("route",))
+        counter.inc(route="/a")
+        counter.inc(2, route="/a")
+        counter.inc(route='/b"\n')
+        text = registry.render()
+        assert "# HELP requests_total Requests.\n# TYPE requests_total counter\n" in text
+        assert 'requests_total{route="/a"} 3' in text
+        assert 'requests_total{route="/b\\"\\n"} 1' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value)
+        text = registry.render()
+        assert sample(text, "latency_seconds_bucket", le="0.1") == 1
+        assert sample(text, "latency_seconds_bucket", le="1") == 3
+        assert sample(text, "latency_seconds_bucket", le="+Inf") == 4
+        assert sample(text, "latency_seconds_count") == 4
+        assert sample(text, "latency_seconds_sum") == pytest.approx(4.25)
+
+    def test_callback(self):
+        registry = MetricsRegistry()
+        values = {"depth": 7}
+        registry.gauge_callback("queue_depth", "Depth.", lambda: [({}, values["depth"])])
+        assert sample(registry.render(), "queue_depth") == 7
+        values["depth"] = 2
+        assert sample(registry.render(), "queue_depth") == 2
+
+
+class TestMetricsEndpoint:
+    """Test the middleware and GET /api/metrics."""
+
+    def metrics(self, client):
+        response = client.get("/api/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        return response.text
+
+    def test_requests_are_labelled_by_route_template(self, client, auth_headers):
+        before = sample(self.metrics(client), "http_requests_total",
+                        method="GET", route="/api/urls/{url_id}/clicks", status="200") or 0
+        for url_id in (101, 102):
+            client.get(f"/api/urls/{url_id}/clicks", headers=auth_headers)
+        text = self.metrics(client)
+        assert sample(text, "http_requests_total",
+                      method="GET", route="/api/urls/{url_id}/clicks", status="200") == before + 2
+        assert "/api/urls/101/clicks" not in text
+
+    def test_unmatched_paths_share_one_label(self, client):
+        before = sample(self.metrics(client), "http_requests_total",
+                        method="GET", route=UNMATCHED_ROUTE, status="404") or 0
+        client.get("/no/such/path")
+        client.get("/another/missing/path")
+        text = self.metrics(client)
+        assert sample(text, "http_requests_total", method="GET", route=UNMATCHED_ROUTE, status="404") == before + 2
+        assert "/no/such/path" not in text
+
+    def test_queries_per_request(self, client, auth_headers):
+        client.get("/api/urls", headers=auth_headers)
+        text = self.metrics(client)
+        assert sample(text, "db_queries_per_request_count", method="GET", route="/api/urls") >= 1
+        assert sample(text, "db_queries_total", route="/api/urls") >= 1
+
+    def test_cache_and_queue_gauges(self, client):
+        text = self.metrics(client)
+        assert sample(text, "cache_entries", cache="redirect") is not None
+        assert sample(text, "click_queue_depth") is not None
+        assert sample(text, "password_hash_queue_depth") is not None
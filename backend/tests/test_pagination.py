@@ -0,0 +1,104 @@
+"""
+Tests for keyset (cursor) pagination of URL lists and click history.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import crud
+from models import URL
+from utils.pagination import decode_cursor, encode_cursor
+
+
+def add_urls(db_session, created_at_values):
+    urls = [
+        URL(original_url=f"https://example.com/{i}", short_code=f"code{i:04d}", created_at=created_at)
+        for i, created_at in enumerate(created_at_values)
+    ]
+    db_session.add_all(urls)
+    db_session.commit()
+    return [url.id for url in urls]
+
+
+def collect_url_pages(client, headers, limit):
+    ids, cursor, pages = [], None, 0
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        data = client.get("/api/urls", params=params, headers=headers).json()
+        ids.extend(url["id"] for url in data["urls"])
+        pages += 1
+        cursor = data["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+class TestCursor:
+    """Test cursor encoding."""
+
+    def test_round_trip(self):
+        timestamp = datetime(2026, 10, 17, 12, 30, 0, 123456)
+        assert decode_cursor(encode_cursor(timestamp, 42)) == (timestamp.isoformat(), 42)
+
+    @pytest.mark.parametrize("cursor", ["", "!!!", encode_cursor("x", 1)[:-2], "WzEsMl0"])
+    def test_invalid(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+    def test_invalid_cursor_is_rejected(self, client, auth_headers):
+        response = client.get("/api/urls", params={"cursor": "!!!"}, headers=auth_headers)
+        assert response.status_code == 400
+
+
+class TestURLPagination:
+    """Test keyset pagination of the URL list."""
+
+    def test_pages_cover_every_url_once(self, client, auth_headers, db_session):
+        base = datetime(2026, 10, 1)
+        ids = add_urls(db_session, [base + timedelta(minutes=i) for i in range(7)])
+
+        collected, pages = collect_url_pages(client, auth_headers, limit=3)
+        assert collected == list(reversed(ids))
+        assert pages == 3
+
+    def test_ties_on_created_at(self, client, auth_headers, db_session):
+        """Rows with the same timestamp are ordered by id and never skipped or repeated."""
+        same = datetime(2026, 10, 1, 9, 0, 0)
+        ids = add_urls(db_session, [same] * 5 + [same + timedelta(microseconds=500)] * 2)
+
+        collected, _ = collect_url_pages(client, auth_headers, limit=2)
+        assert sorted(collected) == sorted(ids)
+        assert len(collected) == len(set(collected))
+        assert collected[:2] == sorted(ids[5:], reverse=True)
+        assert collected[2:] == sorted(ids[:5], reverse=True)
+
+    def test_include_total_false(self, client, auth_headers, db_session):
+        add_urls(db_session, [datetime(2026, 10, 1)])
+        data = client.get("/api/urls", params={"include_total": "false"}, headers=auth_headers).json()
+        assert data["total"] is None
+        assert len(data["urls"]) == 1
+
+
+class TestClickPagination:
+    """Test keyset pagination of the click history."""
+
+    def test_pages_follow_next_cursor_header(self, client, auth_headers, db_session):
+        url_id = add_urls(db_session, [datetime(2026, 10, 1)])[0]
+        clicked_at = datetime(2026, 10, 2, 12, 0, 0)
+        crud.record_clicks_bulk(db_session, [
+            (url_id, clicked_at + timedelta(seconds=i // 2), "ua", "192.0.2.1", None) for i in range(9)
+        ])
+
+        ids, cursor = [], None
+        while True:
+            params = {"limit": 4, **({"cursor": cursor} if cursor else {})}
+            response = client.get(f"/api/urls/{url_id}/clicks", params=params, headers=auth_headers)
+            assert response.status_code == 200
+            ids.extend(click["id"] for click in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+
+        assert len(ids) == 9
+        assert len(set(ids)) == 9
+        # 新しい順（同時刻はIDの降順）
+        assert ids == sorted(ids, reverse=True)
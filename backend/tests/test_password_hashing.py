@@ -0,0 +1,108 @@
+"""
+Tests for bcrypt hashing in the bounded worker pool.
+"""
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+import crud_async
+from utils.password_hashing import PasswordHasher, PasswordHashingBusy
+
+
+class BlockingContext:
+    """A CryptContext stand-in whose hash() waits until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.threads = set()
+
+    def hash(self, password):
+        self.threads.add(threading.current_thread().name)
+        assert self.release.wait(5)
+        return f"hashed:{password}"
+
+
+@pytest.fixture
+def context():
+    return CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+
+
+class TestPasswordHasher:
+    """Test PasswordHasher."""
+
+    def test_hash_and_verify(self, context):
+        hasher = PasswordHasher(context, max_workers=2, max_queue=2)
+
+        async def run():
+            hashed = await hasher.hash("secret")
+            return hashed, await hasher.verify("secret", hashed), await hasher.verify("wrong", hashed)
+
+        try:
+            hashed, ok, wrong = asyncio.run(run())
+        finally:
+            hasher.shutdown()
+        assert context.identify(hashed) == "bcrypt"
+        assert ok and not wrong
+        assert hasher.stats()["completed"] == 3
+
+    def test_runs_off_the_event_loop(self):
+        blocking = BlockingContext()
+        hasher = PasswordHasher(blocking, max_workers=1, max_queue=0)
+
+        async def run():
+            task = asyncio.ensure_future(hasher.hash("secret"))
+            # ハッシュ処理中もイベントループは止まらない
+            await asyncio.sleep(0.01)
+            assert not task.done()
+            blocking.release.set()
+            return await task
+
+        try:
+            assert asyncio.run(run()) == "hashed:secret"
+        finally:
+            hasher.shutdown()
+        assert all(name.startswith("password-hash") for name in blocking.threads)
+
+    def test_rejects_when_queue_is_full(self):
+        blocking = BlockingContext()
+        hasher = PasswordHasher(blocking, max_workers=1, max_queue=1)
+
+        async def run():
+            running = [asyncio.ensure_future(hasher.hash(str(i))) for i in range(2)]
+            await asyncio.sleep(0.01)
+            with pytest.raises(PasswordHashingBusy):
+                await hasher.hash("overflow")
+            blocking.release.set()
+            return await asyncio.gather(*running)
+
+        try:
+            assert asyncio.run(run()) == ["hashed:0", "hashed:1"]
+        finally:
+            hasher.shutdown()
+        stats = hasher.stats()
+        assert (stats["completed"], stats["rejected"], stats["queue_depth"]) == (2, 1, 0)
+
+    def test_verify_and_update_rehashes_old_rounds(self, context):
+        old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash("secret")
+        hasher = PasswordHasher(context, max_workers=1, max_queue=0)
+        try:
+            verified, new_hash = asyncio.run(hasher.verify_and_update("secret", old_hash))
+        finally:
+            hasher.shutdown()
+        assert verified
+        assert new_hash is not None and context.verify("secret", new_hash)
+
+
+class TestLoginWhenBusy:
+    """Test that login is rejected with 503 when the hashing queue is full."""
+
+    def test_login_busy(self, client, test_user, monkeypatch):
+        async def busy(*args):
+            raise PasswordHashingBusy("password hashing queue is full")
+
+        monkeypatch.setattr(crud_async.password_hasher, "verify_and_update", busy)
+        response = client.post("/api/auth/login", json={"email": test_user.email, "password": "whatever"})
+        assert response.status_code == 503
+        assert response.json()["error"]["code"] == "SERVICE_UNAVAILABLE"
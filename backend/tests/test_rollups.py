@@ -0,0 +1,106 @@
+"""
+Tests for the hourly and daily click rollup tables.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import crud
+from models import URL, ClickRollupDaily, ClickRollupHourly
+
+
+@pytest.fixture
+def urls(db_session):
+    urls = [URL(original_url=f"https://example.com/{i}", short_code=f"code{i}") for i in range(2)]
+    db_session.add_all(urls)
+    db_session.commit()
+    return urls
+
+
+def rollups(db_session, model):
+    db_session.expire_all()
+    return sorted(
+        (row.url_id, row.bucket_start, row.clicks) for row in db_session.query(model).all()
+    )
+
+
+class TestAddClickRollups:
+    """Test that recorded clicks are added to the rollups."""
+
+    def test_buckets(self, db_session, urls):
+        a, b = urls
+        day = datetime(2026, 10, 1)
+        crud.record_clicks_bulk(db_session, [
+            (a.id, day + timedelta(hours=1, minutes=5), None, None, None),
+            (a.id, day + timedelta(hours=1, minutes=55), None, None, None),
+            (a.id, day + timedelta(hours=23, minutes=59), None, None, None),
+            (b.id, day + timedelta(days=1), None, None, None),
+        ])
+        assert rollups(db_session, ClickRollupHourly) == [
+            (a.id, day + timedelta(hours=1), 2),
+            (a.id, day + timedelta(hours=23), 1),
+            (b.id, day + timedelta(days=1), 1),
+        ]
+        assert rollups(db_session, ClickRollupDaily) == [
+            (a.id, day, 3),
+            (b.id, day + timedelta(days=1), 1),
+        ]
+
+    def test_existing_rows_are_incremented(self, db_session, urls):
+        clicked_at = datetime(2026, 10, 1, 12, 0)
+        crud.record_clicks_bulk(db_session, [(urls[0].id, clicked_at, None, None, None)])
+        crud.record_clicks_bulk(db_session, [(urls[0].id, clicked_at, None, None, None)] * 2)
+        assert rollups(db_session, ClickRollupDaily) == [(urls[0].id, datetime(2026, 10, 1), 3)]
+
+
+class TestRebuildClickRollups:
+    """Test rebuild_click_rollups."""
+
+    def test_rebuild_matches_incremental(self, db_session, urls):
+        start = datetime(2026, 10, 1, 22, 30)
+        crud.record_clicks_bulk(db_session, [
+            (urls[i % 2].id, start + timedelta(minutes=17 * i), None, None, None) for i in range(20)
+        ])
+        hourly, daily = rollups(db_session, ClickRollupHourly), rollups(db_session, ClickRollupDaily)
+        db_session.query(ClickRollupHourly).delete()
+        db_session.query(ClickRollupDaily).update({ClickRollupDaily.clicks: 0})
+        db_session.commit()
+
+        assert crud.rebuild_click_rollups(db_session) == (len(hourly), len(daily))
+        assert rollups(db_session, ClickRollupHourly) == hourly
+        assert rollups(db_session, ClickRollupDaily) == daily
+
+    def test_range_leaves_other_days(self, db_session, urls):
+        day = datetime(2026, 10, 1)
+        crud.record_clicks_bulk(db_session, [
+            (urls[0].id, day + timedelta(hours=1), None, None, None),
+            (urls[0].id, day + timedelta(days=1, hours=1), None, None, None),
+        ])
+        db_session.query(ClickRollupDaily).update({ClickRollupDaily.clicks: 9})
+        db_session.commit()
+
+        crud.rebuild_click_rollups(db_session, since=day, until=day + timedelta(days=1))
+        assert rollups(db_session, ClickRollupDaily) == [
+            (urls[0].id, day, 1), (urls[0].id, day + timedelta(days=1), 9),
+        ]
+
+    def test_empty(self, db_session):
+        assert crud.rebuild_click_rollups(db_session) == (0, 0)
+
+
+class TestStatsFromRollups:
+    """Test that the statistics endpoints read the rollups."""
+
+    def test_totals_and_daily(self, client, auth_headers, db_session, urls):
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        crud.record_clicks_bulk(db_session, [
+            (urls[0].id, today + timedelta(minutes=1), None, None, None),
+            (urls[1].id, today + timedelta(minutes=2), None, None, None),
+            (urls[1].id, today - timedelta(days=2), None, None, None),
+        ])
+
+        assert client.get("/api/stats", headers=auth_headers).json()["total_clicks"] == 3
+
+        data = client.get("/api/stats/daily", params={"days": 3}, headers=auth_headers).json()
+        assert [day["clicks"] for day in data["days"]] == [1, 0, 2]
+        assert data["total_clicks"] == 3
@@ -0,0 +1,131 @@
+"""
+Tests for short code generation strategies.
+"""
+import pytest
+
+import crud
+from models import URL
+from utils.short_codes import (
+    ALPHABET, BASE, CounterCodeGenerator, FeistelPermutation, PoolCodeGenerator,
+    RandomCodeGenerator, build_short_code_generator, encode_base62,
+)
+
+
+class TestBase62:
+    """Test encode_base62."""
+
+    def test_fixed_length(self):
+        assert encode_base62(0, 4) == ALPHABET[0] * 4
+        assert encode_base62(BASE ** 4 - 1, 4) == ALPHABET[-1] * 4
+
+    def test_distinct_values_give_distinct_codes(self):
+        codes = {encode_base62(value, 3) for value in range(5000)}
+        assert len(codes) == 5000
+
+    def test_overflow(self):
+        with pytest.raises(ValueError):
+            encode_base62(BASE ** 2, 2)
+
+
+class TestFeistelPermutation:
+    """Test FeistelPermutation."""
+
+    @pytest.mark.parametrize("domain", [2, 62, 1000, BASE ** 2, 3845])
+    def test_bijection(self, domain):
+        permutation = FeistelPermutation(b"key", domain)
+        assert sorted(permutation.permute(value) for value in range(domain)) == list(range(domain))
+
+    def test_key_changes_order(self):
+        a = [FeistelPermutation(b"key-a", 10000).permute(value) for value in range(20)]
+        b = [FeistelPermutation(b"key-b", 10000).permute(value) for value in range(20)]
+        assert a != b
+
+    def test_not_sequential(self):
+        permutation = FeistelPermutation(b"key", BASE ** 6)
+        values = [permutation.permute(value) for value in range(10)]
+        assert values != sorted(values)
+
+    def test_out_of_domain(self):
+        with pytest.raises(ValueError):
+            FeistelPermutation(b"key", 100).permute(100)
+
+
+class TestCounterCodeGenerator:
+    """Test CounterCodeGenerator."""
+
+    def test_unique_across_blocks(self):
+        blocks = []
+
+        def allocate(size):
+            start = sum(blocks)
+            blocks.append(size)
+            return start
+
+        generator = CounterCodeGenerator(4, b"key", block_size=100, allocate_block=allocate)
+        codes = generator.next_codes(250) + [generator.next_code() for _ in range(60)]
+        assert len(set(codes)) == 310
+        assert all(len(code) == 4 for code in codes)
+        assert blocks == [250, 100]
+
+    def test_keyspace_exhausted(self):
+        generator = CounterCodeGenerator(1, b"key", block_size=100, allocate_block=lambda size: 0)
+        with pytest.raises(RuntimeError):
+            generator.next_code()
+
+    def test_database_blocks_do_not_overlap(self, db_session):
+        first = crud.allocate_short_code_block(db_session, "test", 10)
+        second = crud.allocate_short_code_block(db_session, "test", 5)
+        third = crud.allocate_short_code_block(db_session, "test", 10)
+        assert (first, second, third) == (0, 10, 15)
+
+
+class TestPoolCodeGenerator:
+    """Test PoolCodeGenerator and the reserved pool."""
+
+    def test_takes_in_batches(self):
+        pool = [f"code{i}" for i in range(10)]
+        requests = []
+
+        def take(count):
+            requests.append(count)
+            taken, pool[:] = pool[:count], pool[count:]
+            return taken
+
+        generator = PoolCodeGenerator(5, batch_size=4, take_codes=take)
+        assert [generator.next_code() for _ in range(5)] == [f"code{i}" for i in range(5)]
+        assert requests == [4, 4]
+
+    def test_exhausted(self):
+        generator = PoolCodeGenerator(5, batch_size=4, take_codes=lambda count: [])
+        with pytest.raises(RuntimeError):
+            generator.next_code()
+
+    def test_reserved_codes_are_taken_once(self, db_session):
+        db_session.add(URL(original_url="https://example.com", short_code="used01"))
+        db_session.commit()
+        assert crud.add_reserved_short_codes(db_session, ["used01", "free01", "free02", "free03"]) == 3
+        assert crud.add_reserved_short_codes(db_session, ["free01"]) == 0
+
+        first = crud.take_reserved_short_codes(db_session, 2)
+        second = crud.take_reserved_short_codes(db_session, 5)
+        assert sorted(first + second) == ["free01", "free02", "free03"]
+        assert crud.take_reserved_short_codes(db_session, 1) == []
+
+
+class TestBuildGenerator:
+    """Test build_short_code_generator."""
+
+    def test_strategies(self):
+        assert isinstance(build_short_code_generator("random", 8, b"k", 10), RandomCodeGenerator)
+        assert isinstance(build_short_code_generator("counter", 8, b"k", 10, allocate_block=lambda n: 0),
+                          CounterCodeGenerator)
+        assert isinstance(build_short_code_generator("pool", 8, b"k", 10, take_codes=lambda n: []),
+                          PoolCodeGenerator)
+
+    def test_unknown_strategy(self):
+        with pytest.raises(ValueError):
+            build_short_code_generator("sequential", 8, b"k", 10)
+
+    def test_invalid_length(self):
+        with pytest.raises(ValueError):
+            RandomCodeGenerator(17)
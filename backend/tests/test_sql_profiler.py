@@ -0,0 +1,88 @@
+"""
+Tests for the per-request SQL profiler.
+"""
+import pytest
+
+from utils import sql_profiler
+from utils.sql_profiler import ProfileHistory, RequestProfile, statement_shape
+
+
+@pytest.fixture
+def profiler_settings(monkeypatch):
+    monkeypatch.setattr(sql_profiler.settings, "sql_profiler_enabled", False)
+    monkeypatch.setattr(sql_profiler.settings, "sql_profiler_sample_rate", 0.0)
+    monkeypatch.setattr(sql_profiler.settings, "sql_profiler_allow_header", True)
+    monkeypatch.setattr(sql_profiler.settings, "sql_profiler_repeat_threshold", 3)
+    monkeypatch.setattr(sql_profiler.settings, "sql_profiler_slow_ms", 100.0)
+    return sql_profiler.settings
+
+
+class TestStatementShape:
+    """Test statement_shape."""
+
+    def test_literals_and_whitespace(self):
+        assert statement_shape("SELECT *\n  FROM urls WHERE id = 42 AND code = 'it''s'") == \
+            "SELECT * FROM urls WHERE id = ? AND code = ?"
+
+    def test_in_list_length(self):
+        assert statement_shape("SELECT * FROM urls WHERE id IN (?, ?, ?)") == \
+            statement_shape("SELECT * FROM urls WHERE id IN (?)")
+
+    def test_identifiers_with_digits_are_kept(self):
+        assert statement_shape("SELECT t1.id FROM click_rollups_daily t1") == "SELECT t1.id FROM click_rollups_daily t1"
+
+
+class TestRequestProfile:
+    """Test RequestProfile reports."""
+
+    def test_repeated_and_slow(self, profiler_settings):
+        profile = RequestProfile("GET", "/api/urls")
+        for url_id in range(4):
+            profile.record(f"SELECT * FROM clicks WHERE url_id = {url_id}", 0.001, False)
+        profile.record("SELECT count(*) FROM urls", 0.25, False)
+
+        assert profile.repeated() == [{"statement": "SELECT * FROM clicks WHERE url_id = ?", "count": 4}]
+        assert profile.slow() == [{"statement": "SELECT count(*) FROM urls", "ms": 250.0}]
+        assert profile.header_value().startswith("queries=5; total_ms=254.000; repeated=1; slow=1")
+
+    def test_history_is_bounded(self):
+        history = ProfileHistory(maxsize=2)
+        profiles = [RequestProfile("GET", f"/{i}") for i in range(3)]
+        for profile in profiles:
+            history.add(profile)
+        assert history.get(profiles[0].id) is None
+        assert history.recent(10) == [profiles[2], profiles[1]]
+
+
+class TestSQLProfilerMiddleware:
+    """Test SQLProfilerMiddleware and the debug endpoints."""
+
+    def test_not_profiled_by_default(self, client, auth_headers, profiler_settings):
+        response = client.get("/api/urls", headers=auth_headers)
+        assert "x-sql-profile" not in response.headers
+
+    def test_header_opt_in(self, client, auth_headers, profiler_settings):
+        response = client.get("/api/urls", headers={**auth_headers, "X-SQL-Profile": "1"})
+        assert response.status_code == 200
+        assert response.headers["x-sql-profile"].startswith("queries=")
+        profile_id = response.headers["x-sql-profile-id"]
+
+        detail = client.get(f"/api/debug/sql-profiles/{profile_id}", headers=auth_headers).json()
+        assert detail["route"] == "/api/urls"
+        assert detail["queries"] == len(detail["statements"]) >= 1
+        listed = client.get("/api/debug/sql-profiles", headers=auth_headers).json()["profiles"]
+        assert profile_id in [profile["id"] for profile in listed]
+        assert "statements" not in listed[0]
+
+    def test_header_ignored_when_not_allowed(self, client, auth_headers, profiler_settings, monkeypatch):
+        monkeypatch.setattr(profiler_settings, "sql_profiler_allow_header", False)
+        monkeypatch.setattr(profiler_settings, "debug", False)
+        response = client.get("/api/urls", headers={**auth_headers, "X-SQL-Profile": "1"})
+        assert "x-sql-profile" not in response.headers
+
+    def test_sampling(self, client, auth_headers, profiler_settings, monkeypatch):
+        monkeypatch.setattr(profiler_settings, "sql_profiler_sample_rate", 1.0)
+        assert "x-sql-profile" in client.get("/api/urls", headers=auth_headers).headers
+
+    def test_unknown_profile(self, client, auth_headers):
+        assert client.get("/api/debug/sql-profiles/nosuch", headers=auth_headers).status_code == 404
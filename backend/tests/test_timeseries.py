@@ -0,0 +1,109 @@
+"""
+Tests for click time-series bucketing.
+"""
+from datetime import datetime
+
+import pytest
+
+import crud
+import crud_async
+from database import AsyncSessionLocal
+from models import URL
+from utils.timeseries import aligned_to_hours, bucket_range, fold_counts, get_timezone, next_bucket
+
+UTC = get_timezone("UTC")
+BERLIN = get_timezone("Europe/Berlin")
+KOLKATA = get_timezone("Asia/Kolkata")
+LORD_HOWE = get_timezone("Australia/Lord_Howe")
+
+
+class TestBuckets:
+    """Test bucket layout in local time."""
+
+    def test_dst_days(self):
+        """Local days across DST changes are 23 and 25 hours long."""
+        buckets = bucket_range(datetime(2026, 3, 28, 12), datetime(2026, 3, 30), "day", BERLIN, 10)
+        assert [(b - a).total_seconds() / 3600 for a, b in zip(buckets, buckets[1:])] == [24, 23]
+
+        buckets = bucket_range(datetime(2026, 10, 24, 12), datetime(2026, 10, 26), "day", BERLIN, 10)
+        assert [(b - a).total_seconds() / 3600 for a, b in zip(buckets, buckets[1:])] == [24, 25]
+
+    def test_repeated_hour(self):
+        """The repeated local hour at the end of DST is two distinct buckets."""
+        buckets = bucket_range(datetime(2026, 10, 25, 0), datetime(2026, 10, 25, 2), "hour", BERLIN, 10)
+        assert buckets == [datetime(2026, 10, 25, 0), datetime(2026, 10, 25, 1)]
+
+    def test_limit(self):
+        with pytest.raises(ValueError):
+            bucket_range(datetime(2026, 1, 1), datetime(2026, 1, 2), "minute", UTC, 100)
+
+    def test_fold_counts(self):
+        buckets = [datetime(2026, 1, 1, 0), datetime(2026, 1, 1, 1)]
+        counts = [(datetime(2026, 1, 1, 0, 5), 2), (datetime(2026, 1, 1, 1, 59), 3),
+                  (datetime(2025, 12, 31, 23, 59), 7), (datetime(2026, 1, 1, 2), 9)]
+        assert fold_counts(counts, buckets, datetime(2026, 1, 1, 2)) == list(zip(buckets, [2, 3]))
+
+
+class TestAlignedToHours:
+    """Test whether hourly rollups can serve a range."""
+
+    def layout(self, start, end, interval, tz):
+        buckets = bucket_range(start, end, interval, tz, 10000)
+        return buckets, next_bucket(buckets[-1], interval, tz)
+
+    def test_whole_hour_offsets(self):
+        assert aligned_to_hours(*self.layout(datetime(2026, 3, 1), datetime(2026, 11, 1), "day", BERLIN))
+
+    def test_half_hour_offset(self):
+        assert not aligned_to_hours(*self.layout(datetime(2026, 1, 1), datetime(2026, 1, 3), "day", KOLKATA))
+        assert not aligned_to_hours(*self.layout(datetime(2026, 1, 1), datetime(2026, 1, 1, 3), "hour", KOLKATA))
+
+    def test_half_hour_dst_inside_range(self):
+        """Both ends are at +11:00, but the range crosses Lord Howe winter time (+10:30)."""
+        start, end = datetime(2026, 3, 1), datetime(2026, 11, 1)
+        assert LORD_HOWE.utcoffset(start).total_seconds() == 11 * 3600
+        assert LORD_HOWE.utcoffset(end).total_seconds() == 11 * 3600
+        assert not aligned_to_hours(*self.layout(start, end, "day", LORD_HOWE))
+
+
+class TestClickTimeseries:
+    """Test get_click_timeseries against rollups and raw clicks."""
+
+    def test_lord_howe_falls_back_to_clicks(self, db_session, run_async):
+        url = URL(original_url="https://example.com", short_code="tz0001")
+        db_session.add(url)
+        db_session.commit()
+        # 冬時間（+10:30）の 2026-06-01 00:15 は UTC 2026-05-31 13:45。UTC時単位では前日の区間と混ざる
+        clicks = [datetime(2026, 5, 31, 13, 20), datetime(2026, 5, 31, 13, 45), datetime(2026, 3, 10, 2)]
+        crud.record_clicks_bulk(db_session, [(url.id, value, None, None, None) for value in clicks])
+
+        async def timeseries():
+            async with AsyncSessionLocal() as db:
+                return await crud_async.get_click_timeseries(
+                    db, url.id, "day", LORD_HOWE, datetime(2026, 3, 1), datetime(2026, 11, 1), 1000
+                )
+
+        source, points = run_async(timeseries())
+        assert source == "clicks"
+        counts = {bucket: count for bucket, count in points if count}
+        assert counts == {
+            datetime(2026, 3, 9, 13): 1,  # 3/10 00:00 +11:00
+            datetime(2026, 5, 30, 13, 30): 1,  # 5/31 00:00 +10:30
+            datetime(2026, 5, 31, 13, 30): 1,  # 6/1 00:00 +10:30
+        }
+
+    def test_whole_hour_zone_uses_rollups(self, db_session, run_async):
+        url = URL(original_url="https://example.com", short_code="tz0002")
+        db_session.add(url)
+        db_session.commit()
+        crud.record_clicks_bulk(db_session, [(url.id, datetime(2026, 6, 1, 22, 30), None, None, None)])
+
+        async def timeseries():
+            async with AsyncSessionLocal() as db:
+                return await crud_async.get_click_timeseries(
+                    db, url.id, "day", BERLIN, datetime(2026, 5, 31), datetime(2026, 6, 3), 1000
+                )
+
+        source, points = run_async(timeseries())
+        assert source == "hourly_rollups"
+        assert {bucket: count for bucket, count in points if count} == {datetime(2026, 6, 1, 22): 1}
@@ -0,0 +1,188 @@
+"""
+Tests for Space-Saving summaries and the trending URL tracker.
+"""
+import random
+import time
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+from utils.click_queue import click_ingestor
+from utils.trending import SpaceSaving, SlidingTopK, TrendingTracker, merge_items, trending_tracker
+
+
+def summarize(capacity, stream):
+    summary = SpaceSaving(capacity)
+    for key in stream:
+        summary.add(key)
+    return summary
+
+
+def assert_bounds(merged, true_counts):
+    """Every merged count is >= the true count, and count - error is <= it."""
+    for key, count, error in merged:
+        assert count >= true_counts[key]
+        assert count - error <= true_counts[key]
+
+
+class TestSpaceSaving:
+    """Test SpaceSaving."""
+
+    def test_exact_below_capacity(self):
+        summary = summarize(5, [1, 2, 1, 3, 1, 2])
+        assert sorted(summary.items()) == [(1, 3, 0), (2, 2, 0), (3, 1, 0)]
+
+    def test_eviction_inherits_min_count(self):
+        summary = summarize(2, [1, 1, 2, 3])
+        assert sorted(summary.items()) == [(1, 2, 0), (3, 2, 1)]
+
+    def test_weighted_add(self):
+        summary = SpaceSaving(2)
+        summary.add(1, 5)
+        summary.add(2, 3)
+        summary.add(3, 2)
+        assert sorted(summary.items()) == [(1, 5, 0), (3, 5, 3)]
+
+    def test_bounds_hold(self):
+        rng = random.Random(1)
+        stream = [min(int(rng.paretovariate(1.2)), 200) for _ in range(5000)]
+        summary = summarize(20, stream)
+        assert len(summary.items()) == 20
+        assert_bounds(summary.items(), Counter(stream))
+
+    def test_from_items_truncates(self):
+        summary = SpaceSaving.from_items(2, [(1, 1, 0), (2, 5, 0), (3, 3, 1)])
+        assert sorted(summary.items()) == [(2, 5, 0), (3, 3, 1)]
+        summary.add(4)
+        assert sorted(summary.items()) == [(2, 5, 0), (4, 4, 3)]
+
+
+class TestMergeItems:
+    """Test merge_items."""
+
+    def test_not_full_summaries_add_up(self):
+        merged = merge_items([[(1, 2, 0), (2, 1, 0)], [(1, 3, 0)]], capacity=5)
+        assert merged == [(1, 5, 0), (2, 1, 0)]
+
+    def test_missing_key_gets_min_of_full_summary(self):
+        """A key absent from a full summary may have been evicted there."""
+        a = summarize(2, [1, 1, 1, 2, 2, 3])   # 2 evicted by 3
+        b = summarize(2, [2, 2, 2, 2, 4, 4])
+        true_counts = Counter([1, 1, 1, 2, 2, 3, 2, 2, 2, 2, 4, 4])
+        merged = merge_items([a.items(), b.items()], capacity=2)
+        assert_bounds(merged, true_counts)
+        assert dict((key, count) for key, count, _ in merged)[2] >= 6
+
+    def test_bounds_hold_after_merge(self):
+        rng = random.Random(7)
+        true_counts = Counter()
+        summaries = []
+        for _ in range(6):
+            stream = [min(int(rng.paretovariate(1.1)), 300) for _ in range(2000)]
+            true_counts.update(stream)
+            summaries.append(summarize(15, stream).items())
+        merged = merge_items(summaries, capacity=15)
+        assert_bounds(merged, true_counts)
+        assert [count for _, count, _ in merged] == sorted((count for _, count, _ in merged), reverse=True)
+
+    def test_untracked_keys_are_below_the_floor(self):
+        """A key in no summary occurred at most the sum of the full summaries' minimums."""
+        rng = random.Random(3)
+        true_counts = Counter()
+        summaries = []
+        for _ in range(4):
+            stream = [rng.randrange(100) for _ in range(1000)]
+            true_counts.update(stream)
+            summaries.append(summarize(10, stream).items())
+        floor = sum(min(count for _, count, _ in items) for items in summaries)
+        tracked = {key for key, _, _ in merge_items(summaries, capacity=10)}
+        assert all(count <= floor for key, count in true_counts.items() if key not in tracked)
+
+
+class TestSlidingTopK:
+    """Test SlidingTopK."""
+
+    def test_prune_drops_old_slots(self):
+        window = SlidingTopK(window_seconds=300, slots=10, capacity=5)
+        window.add(window.slot_index(1000.0), 1)
+        window.add(window.slot_index(1300.0), 2)
+        window.prune(1300.0)
+        assert list(window.summaries) == [window.slot_index(1300.0)]
+
+    def test_restore_merges_same_slot(self):
+        window = SlidingTopK(window_seconds=300, slots=10, capacity=2)
+        for key in [1, 1, 2]:
+            window.add(7, key)
+        window.restore({"7": [[3, 4, 0], [1, 1, 0]], "8": [[5, 1, 0]]})
+        assert sorted(window.summaries[7].items()) == [(1, 3, 0), (3, 5, 1)]
+        assert window.summaries[8].items() == [(5, 1, 0)]
+
+
+class TestTrendingTracker:
+    """Test TrendingTracker."""
+
+    def test_top_merges_slots_and_peers(self):
+        tracker = TrendingTracker(capacity=10)
+        now = datetime.utcnow()
+        tracker.record([(1, now), (1, now), (2, now)])
+        peer = TrendingTracker(capacity=10)
+        peer.record([(2, now), (2, now), (3, now)])
+
+        top = tracker.top("1h", 2, peers=[peer.snapshot()])
+        assert top == [(2, 3, 0), (1, 2, 0)]
+
+    def test_snapshot_restore(self):
+        tracker = TrendingTracker(capacity=10)
+        tracker.record([(1, datetime.utcnow())])
+        restored = TrendingTracker(capacity=10)
+        restored.restore(tracker.snapshot())
+        assert restored.top("5m", 10) == [(1, 1, 0)]
+
+    def test_old_clicks_leave_the_window(self):
+        tracker = TrendingTracker(capacity=10)
+        tracker.record([(1, datetime.utcnow())])
+        assert tracker.top("5m", 10, now=time.time() + 600) == []
+        assert tracker.top("1h", 10, now=time.time() + 600) == [(1, 1, 0)]
+
+
+class TestTrendingAPI:
+    """Test the trending endpoint and how clicks reach the tracker."""
+
+    def create_url(self, client, auth_headers, path):
+        response = client.post("/api/urls", json={"original_url": f"https://example.com/{path}"},
+                               headers=auth_headers)
+        assert response.status_code == 201
+        return response.json()
+
+    def test_trending_endpoint(self, client, auth_headers):
+        a = self.create_url(client, auth_headers, "a")
+        b = self.create_url(client, auth_headers, "b")
+        now = datetime.utcnow()
+        trending_tracker.record([(b["id"], now)] * 3 + [(a["id"], now)])
+
+        response = client.get("/api/stats/trending", params={"window": "5m"}, headers=auth_headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["window"] == "5m"
+        assert [(item["url"]["id"], item["clicks"], item["error"]) for item in data["urls"]] == [
+            (b["id"], 3, 0), (a["id"], 1, 0),
+        ]
+
+    def test_invalid_window(self, client, auth_headers):
+        response = client.get("/api/stats/trending", params={"window": "7d"}, headers=auth_headers)
+        assert response.status_code == 400
+
+    def test_queued_clicks_are_recorded(self, client, auth_headers, flush_clicks):
+        url = self.create_url(client, auth_headers, "queued")
+        client.get(f"/r/{url['short_code']}", follow_redirects=False)
+        flush_clicks()
+        assert trending_tracker.top("5m", 10) == [(url["id"], 1, 0)]
+
+    def test_fallback_clicks_are_recorded(self, client, auth_headers):
+        """Clicks written synchronously (ingestor stopped or queue full) reach the tracker too."""
+        url = self.create_url(client, auth_headers, "fallback")
+        click_ingestor.stop()
+        response = client.get(f"/r/{url['short_code']}", follow_redirects=False)
+        assert response.status_code == 307
+        assert trending_tracker.top("5m", 10) == [(url["id"], 1, 0)]
@@ -0,0 +1,137 @@
+"""
+Cross-worker cache invalidation.
+
+Each worker process keeps its own in-memory caches. Writes that must
+invalidate an entry everywhere (e.g. deleting a URL) also record a row in
+cache_invalidations within the same transaction; every worker polls that
+table and applies new rows to its local caches.
+
+Ids are assigned when a row is inserted, not when it commits, so on
+PostgreSQL a lower id can become visible after a higher one has been
+read. Each poll therefore re-reads the last `lookback` ids below the
+highest one seen and skips the rows it has already applied.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+
+from sqlalchemy import delete, func, select
+
+import crud
+from config import settings
+from database import async_engine
+from models import CacheInvalidation
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# 全件破棄を表すキー
+ALL_KEYS = "*"
+
+# 1回のポーリングで取得する最大件数
+_BATCH_SIZE = 1000
+
+
+class CacheInvalidationListener:
+    """cache_invalidations を定期的に読み、ローカルのキャッシュに反映する"""
+
+    def __init__(self, caches: Dict[str, TTLCache], interval: float, retention: float, lookback: int = 1000):
+        self.caches = caches
+        self.interval = interval
+        self.retention = retention
+        self.lookback = lookback
+        self.applied = 0
+        self._last_id = 0
+        # 再走査する範囲（_last_id - lookback より後）のうち反映済みのID
+        self._seen: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        """起動時点までのログは読み飛ばしてポーリングを開始する"""
+        if self.running or self.interval <= 0:
+            return
+        async with async_engine.connect() as conn:
+            self._last_id = await conn.scalar(select(func.coalesce(func.max(CacheInvalidation.id), 0)))
+            self._seen = set((await conn.scalars(
+                select(CacheInvalidation.id).where(CacheInvalidation.id > self._last_id - self.lookback)
+            )).all())
+        self._task = asyncio.create_task(self._run(), name="cache-invalidation-listener")
+        logger.info("Cache invalidation listener started (interval=%.2fs)", self.interval)
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        polls = 0
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+                polls += 1
+                # 古いログの削除（ワーカーごとに約1分間隔）
+                if polls * self.interval >= 60:
+                    polls = 0
+                    await self.prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to poll cache invalidations")
+
+    async def poll(self) -> int:
+        """未反映のログをキャッシュに反映し、件数を返す"""
+        # 範囲内の反映済みの行は最大 lookback 件のため、limit に加えて新しい行を必ず読み進める
+        async with async_engine.connect() as conn:
+            rows = (await conn.execute(
+                select(CacheInvalidation.id, CacheInvalidation.cache_name, CacheInvalidation.cache_key)
+                .where(CacheInvalidation.id > self._last_id - self.lookback)
+                .order_by(CacheInvalidation.id)
+                .limit(self.lookback + _BATCH_SIZE)
+            )).all()
+        applied = 0
+        for row in rows:
+            if row.id in self._seen:
+                continue
+            cache = self.caches.get(row.cache_name)
+            if cache is not None:
+                if row.cache_key == ALL_KEYS:
+                    cache.clear()
+                else:
+                    cache.invalidate(row.cache_key)
+            self._seen.add(row.id)
+            self._last_id = max(self._last_id, row.id)
+            applied += 1
+        floor = self._last_id - self.lookback
+        self._seen = {row_id for row_id in self._seen if row_id > floor}
+        self.applied += applied
+        return applied
+
+    async def prune(self) -> None:
+        """保持期間を過ぎたログを削除する"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        async with async_engine.begin() as conn:
+            await conn.execute(delete(CacheInvalidation).where(CacheInvalidation.created_at < cutoff))
+
+
+# アプリケーション共通のインスタンス
+cache_invalidation_listener = CacheInvalidationListener(
+    caches={
+        "redirect": crud.redirect_cache,
+        "url_count": crud.url_count_cache,
+        "user": crud.user_cache,
+    },
+    interval=settings.cache_sync_interval,
+    retention=settings.cache_sync_retention,
+    lookback=settings.cache_sync_lookback,
+)
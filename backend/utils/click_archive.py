@@ -0,0 +1,163 @@
+"""
+Raw click retention and archival.
+
+Clicks older than the retention period are written to one gzip'd NDJSON
+file per UTC day (clicks-YYYY-MM-DD.ndjson.gz, the columns of the NDJSON
+export with clicked_at in UTC) and then deleted from the clicks table in
+bounded batches, one transaction per batch, so the click ingestor is
+never blocked for long. Only whole days before the cutoff are archived.
+
+Rollups and visitor sketches are kept, so statistics do not change.
+Before a day is archived its daily rollups are compared with the raw
+rows and rebuilt for that day if they disagree. The number of archived
+clicks per URL is kept in click_archive_counts so that click-count
+reconciliation still balances.
+
+A day's file is written under a temporary name and renamed once it is
+complete and flushed to disk. If a run is interrupted while deleting,
+the next run finds the file and only finishes the deletion. On SQLite
+the freed pages are then returned to the file system with
+PRAGMA incremental_vacuum.
+"""
+import gzip
+import json
+import logging
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import crud
+from config import settings
+from utils.packed_ip import unpack_ip
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ArchivedDay:
+    """1日分のアーカイブ結果"""
+    day: datetime
+    clicks: int
+    path: str
+    written: bool = False  # False は既存ファイルを使用（前回の削除の再開）
+    rollups_rebuilt: bool = False
+    deleted: int = 0
+
+
+def retention_cutoff(retention_days: int, now: Optional[datetime] = None) -> datetime:
+    """この日時（UTCの日の境界）より前のクリックが保持期間切れ"""
+    today = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=retention_days)
+
+
+def archive_path(archive_dir: str, day: datetime) -> str:
+    return os.path.join(archive_dir, f"clicks-{day:%Y-%m-%d}.ndjson.gz")
+
+
+def _format_row(row) -> str:
+    clicked_at = crud.bucket_value(row.clicked_at)
+    return json.dumps({
+        "id": row.id,
+        "url_id": row.url_id,
+        "short_code": row.short_code,
+        "clicked_at": clicked_at.replace(tzinfo=timezone.utc).isoformat(),
+        "user_agent": row.user_agent,
+        "ip_address": unpack_ip(row.ip),
+        "referrer": row.referrer,
+    }, ensure_ascii=False) + "\n"
+
+
+def write_day(db: Session, day: datetime, path: str) -> int:
+    """1日分のクリックをファイルに書き出す（完成後に一時ファイルから置き換える）"""
+    tmp_path = path + ".tmp"
+    written = 0
+    with open(tmp_path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=settings.export_gzip_level) as archive:
+            result = crud.stream_clicks_for_archive(db, day, day + timedelta(days=1), settings.export_chunk_size)
+            for partition in result.partitions():
+                archive.write("".join(_format_row(row) for row in partition).encode("utf-8"))
+                written += len(partition)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp_path, path)
+    return written
+
+
+def archive_expired_clicks(
+    db: Session,
+    retention_days: int,
+    archive_dir: str,
+    batch_size: int,
+    dry_run: bool = False,
+) -> List[ArchivedDay]:
+    """保持期間を過ぎたクリックを日ごとにアーカイブして削除する"""
+    cutoff = retention_cutoff(retention_days)
+    os.makedirs(archive_dir, exist_ok=True)
+    results = []
+    for day, clicks in crud.get_click_days_before(db, cutoff):
+        item = ArchivedDay(day=day, clicks=clicks, path=archive_path(archive_dir, day))
+        results.append(item)
+        if dry_run:
+            continue
+
+        if os.path.exists(item.path):
+            # 前回の実行がファイル作成後に中断した（集計の確認・書き出しは済んでいる）
+            logger.info("Resuming archive of %s (file exists: %s)", f"{day:%Y-%m-%d}", item.path)
+        else:
+            # 集計がクリックと一致しない場合は、削除する前にその日の集計を作り直す
+            mismatches = crud.find_rollup_mismatches(db, day)
+            if mismatches:
+                logger.warning("Rollups for %s disagree with raw clicks for %d URLs; rebuilding",
+                               f"{day:%Y-%m-%d}", len(mismatches))
+                crud.rebuild_click_rollups(db, since=day, until=day + timedelta(days=1))
+                item.rollups_rebuilt = True
+            write_day(db, day, item.path)
+            db.commit()  # 読み取りトランザクションを終える
+            item.written = True
+
+        while True:
+            deleted = crud.purge_archived_clicks(db, day, day + timedelta(days=1), batch_size)
+            item.deleted += deleted
+            if deleted < batch_size:
+                break
+        logger.info("Archived %d clicks for %s to %s", item.deleted, f"{day:%Y-%m-%d}", item.path)
+    return results
+
+
+def sqlite_auto_vacuum_mode(db: Session) -> Optional[str]:
+    """SQLiteの auto_vacuum の状態（SQLite以外はNone）"""
+    if db.get_bind().dialect.name != "sqlite":
+        return None
+    return {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}.get(db.execute(text("PRAGMA auto_vacuum")).scalar())
+
+
+def incremental_vacuum(db: Session, step_pages: int) -> int:
+    """空きページを step_pages ずつ解放する（auto_vacuum=INCREMENTAL のSQLiteのみ）
+
+    Returns: 解放したページ数
+    """
+    if sqlite_auto_vacuum_mode(db) != "INCREMENTAL":
+        return 0
+    start_pages = free_pages = db.execute(text("PRAGMA freelist_count")).scalar()
+    while free_pages:
+        # 書き込みロックを長時間保持しないよう step_pages ずつコミットする
+        db.execute(text(f"PRAGMA incremental_vacuum({min(free_pages, step_pages)})"))
+        db.commit()
+        remaining = db.execute(text("PRAGMA freelist_count")).scalar()
+        if remaining >= free_pages:
+            break
+        free_pages = remaining
+    return start_pages - free_pages
+
+
+def enable_incremental_vacuum(engine: Engine) -> None:
+    """既存のSQLiteデータベースを auto_vacuum=INCREMENTAL に切り替える（VACUUMでDB全体を書き直す）"""
+    # VACUUM はトランザクション外で実行する必要がある
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
@@ -0,0 +1,171 @@
+"""
+Background click ingestion.
+
+Redirect handlers enqueue click events and return immediately; a worker
+thread drains the queue and writes the events to the database in batches.
+A batch that fails to write (e.g. SQLite "database is locked") is retried
+with exponential backoff before it is dropped.
+"""
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import crud
+from config import settings
+from database import SessionLocal
+from utils.trending import trending_tracker
+
+logger = logging.getLogger(__name__)
+
+# (url_id, clicked_at, user_agent, ip_address, referrer)
+ClickRecord = Tuple[int, datetime, Optional[str], Optional[str], Optional[str]]
+
+# ワーカー停止用の番兵
+_STOP = object()
+
+
+class ClickIngestor:
+    """クリックイベントをキューに溜め、バックグラウンドでバッチ書き込みする"""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue_size: int = 0,
+                 retries: int = 0, retry_backoff: float = 0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self.flushed_clicks = 0
+        self.flush_count = 0
+        self.failed_clicks = 0
+        self.retried_flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def depth(self) -> int:
+        """未書き込みのイベント数"""
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        """ワーカースレッドを起動する"""
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="click-ingestor", daemon=True)
+        self._thread.start()
+        logger.info("Click ingestor started (batch_size=%d, flush_interval=%.2fs)",
+                    self.batch_size, self.flush_interval)
+
+    @property
+    def pending(self) -> int:
+        """キューに残っているイベント数（番兵を除く）"""
+        with self._queue.mutex:
+            return sum(item is not _STOP for item in self._queue.queue)
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """残りのイベントを書き込んでからワーカーを停止する（timeout 秒以内に終わらなければFalse）"""
+        if not self.running:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            # キューが満杯でも停止処理が無期限に待たないようにする
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        if self._thread.is_alive():
+            logger.warning("Click ingestor did not drain within %.1fs; %d events left in queue",
+                           timeout, self.pending)
+            return False
+        self._thread = None
+        logger.info("Click ingestor stopped (flushed=%d, failed=%d)",
+                    self.flushed_clicks, self.failed_clicks)
+        return True
+
+    def enqueue(self, url_id: int, user_agent: Optional[str], ip_address: Optional[str],
+                referrer: Optional[str]) -> bool:
+        """クリックイベントをキューに追加する（キューが満杯の場合はFalse）"""
+        try:
+            self._queue.put_nowait((url_id, datetime.utcnow(), user_agent, ip_address, referrer))
+        except queue.Full:
+            return False
+        return True
+
+    def _run(self) -> None:
+        batch: List[ClickRecord] = []
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+        while not stopping:
+            timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            # サイズまたは時間経過でフラッシュ
+            if stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._flush(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+        # 停止要求以降に積まれたイベントも書き込む
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch: List[ClickRecord]) -> None:
+        attempt = 0
+        while not self._write(batch):
+            if attempt >= self.retries:
+                self.failed_clicks += len(batch)
+                logger.error("Dropped %d click events after %d attempts", len(batch), attempt + 1)
+                return
+            delay = self.retry_backoff * (2 ** attempt)
+            attempt += 1
+            self.retried_flushes += 1
+            logger.warning("Retrying %d click events in %.2fs (attempt %d/%d)",
+                           len(batch), delay, attempt, self.retries)
+            time.sleep(delay)
+        # 書き込めたクリックのみ急上昇URLの集計に加える
+        trending_tracker.record(batch)
+        self.flushed_clicks += len(batch)
+        self.flush_count += 1
+
+    def _write(self, batch: List[ClickRecord]) -> bool:
+        """バッチを1トランザクションで書き込む（失敗時はロールバックしてFalse）"""
+        db = SessionLocal()
+        try:
+            crud.record_clicks_bulk(db, batch)
+            return True
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to write %d click events", len(batch))
+            return False
+        finally:
+            db.close()
+
+
+# アプリケーション共通のインスタンス
+click_ingestor = ClickIngestor(
+    batch_size=settings.click_batch_size,
+    flush_interval=settings.click_flush_interval,
+    max_queue_size=settings.click_queue_max_size,
+    retries=settings.click_flush_retries,
+    retry_backoff=settings.click_flush_retry_backoff,
+)
@@ -0,0 +1,78 @@
+"""
+Conditional GET support for JSON API responses.
+
+The response body is rendered the same way FastAPI renders a returned
+model, a weak ETag is derived from its hash, and If-None-Match /
+If-Modified-Since are answered with 304 Not Modified. The queries still
+run; what an unchanged dashboard saves is the transfer and re-render.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# 毎回再検証させる（認証付きAPIのため共有キャッシュには保存させない）
+CACHE_CONTROL = "private, no-cache"
+
+
+def _as_utc(value: datetime) -> datetime:
+    """タイムゾーンなしの日時はUTCとして扱う"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match の弱い比較"""
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == opaque or tag.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """条件付きリクエストに304で応答できるか判定する（If-None-Match を優先）"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if last_modified is None or if_modified_since is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP日付は秒単位
+    return _as_utc(last_modified).replace(microsecond=0) <= since
+
+
+def cached_json_response(
+    request: Request,
+    content: Any,
+    last_modified: Optional[datetime] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """ETag（と指定時は Last-Modified）付きのJSONレスポンス。内容が変わっていなければ304を返す"""
+    if isinstance(content, BaseModel):
+        # モデルはpydanticで直接JSON化する（jsonable_encoder を経由するより大幅に速い）
+        response = Response(content.model_dump_json(), media_type="application/json", headers=headers)
+    else:
+        response = JSONResponse(jsonable_encoder(content), headers=headers)
+    etag = 'W/"%s"' % hashlib.blake2b(response.body, digest_size=16).hexdigest()
+    cache_headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        cache_headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers={**(headers or {}), **cache_headers})
+    response.headers.update(cache_headers)
+    return response
@@ -0,0 +1,167 @@
+"""
+Index advisor: runs the CRUD queries inside a rolled-back transaction,
+collects the SQL they issue and checks each statement with
+EXPLAIN QUERY PLAN (SQLite), flagging full table scans over large tables.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.orm import Session
+
+import crud
+import crud_async
+from config import settings
+from database import async_engine
+from models import URL, Click, User
+from utils.pagination import encode_cursor
+
+logger = logging.getLogger(__name__)
+
+# "SCAN urls" / "SCAN clicks AS c" のようなインデックスを使わない全件走査
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+
+# 調査対象から除外するステートメント
+_IGNORED_PREFIXES = ("PRAGMA", "SAVEPOINT", "RELEASE", "ROLLBACK", "BEGIN", "COMMIT", "EXPLAIN")
+
+
+@dataclass
+class ScanFinding:
+    """全件走査の検出結果"""
+    source: str
+    table: str
+    rows: int
+    detail: str
+    statement: str
+
+
+@dataclass
+class AdvisorReport:
+    """インデックス診断結果"""
+    threshold: int
+    checked_statements: int = 0
+    findings: List[ScanFinding] = field(default_factory=list)
+    skipped: str = ""
+
+
+def _sync_probes(sample: Dict[str, Any]) -> List[Tuple[str, Callable[[Session], Any]]]:
+    """crud.py の各クエリを実行する関数群"""
+    return [
+        ("crud.get_user_by_email", lambda db: crud.get_user_by_email(db, sample["email"])),
+        ("crud.get_url_by_short_code", lambda db: crud.get_url_by_short_code(db, sample["short_code"])),
+        ("crud.get_url_by_id", lambda db: crud.get_url_by_id(db, sample["url_id"])),
+        ("crud.increment_click_count", lambda db: crud.increment_click_count(db, sample["url_id"])),
+        ("crud.find_click_count_mismatches", lambda db: crud.find_click_count_mismatches(db)),
+        ("crud.get_total_clicks", lambda db: crud.get_total_clicks(db)),
+        ("crud.get_daily_clicks", lambda db: crud.get_daily_clicks(db, sample["since"])),
+        ("crud.get_top_urls", lambda db: crud.get_top_urls(db, limit=5)),
+        ("crud.delete_url", lambda db: crud.delete_url(db, sample["url_id"])),
+    ]
+
+
+def _async_probes(sample: Dict[str, Any]) -> List[Tuple[str, Callable[[AsyncSession], Awaitable[Any]]]]:
+    """crud_async.py（ルートハンドラーが使用）の各クエリを実行する関数群"""
+    return [
+        ("crud_async.get_user_by_email", lambda db: crud_async.get_user_by_email(db, sample["email"])),
+        ("crud_async.get_url_by_short_code", lambda db: crud_async.get_url_by_short_code(db, sample["short_code"])),
+        ("crud_async.get_url_by_id", lambda db: crud_async.get_url_by_id(db, sample["url_id"])),
+        ("crud_async.get_urls_page", lambda db: crud_async.get_urls_page(db, limit=20, cursor=sample["url_cursor"])),
+        ("crud_async.get_clicks_by_url", lambda db: crud_async.get_clicks_by_url(db, sample["url_id"], cursor=sample["click_cursor"])),
+        ("crud_async.get_total_clicks", lambda db: crud_async.get_total_clicks(db)),
+        ("crud_async.get_daily_clicks", lambda db: crud_async.get_daily_clicks(db, sample["since"])),
+        ("crud_async.get_top_urls", lambda db: crud_async.get_top_urls(db, limit=5)),
+        ("crud_async.delete_url", lambda db: crud_async.delete_url(db, sample["url_id"])),
+    ]
+
+
+async def _sample_values(conn: AsyncConnection) -> Dict[str, Any]:
+    """実データに近いパラメータを取得する（データがない場合はダミー値）"""
+    url_row = (await conn.execute(select(URL.id, URL.short_code, URL.created_at).limit(1))).first()
+    email = await conn.scalar(select(User.email).limit(1))
+    click_row = (await conn.execute(select(Click.id, Click.clicked_at).limit(1))).first()
+    now = datetime.utcnow()
+    return {
+        "email": email or "advisor@example.com",
+        "url_id": url_row.id if url_row else 0,
+        "short_code": url_row.short_code if url_row else "advisor0",
+        "url_cursor": encode_cursor(url_row.created_at if url_row and url_row.created_at else now, 0),
+        "click_cursor": encode_cursor(click_row.clicked_at if click_row and click_row.clicked_at else now, 0),
+        "since": now - timedelta(days=30),
+    }
+
+
+async def run_index_advisor(threshold: Optional[int] = None) -> AdvisorReport:
+    """CRUDクエリの実行計画を調べ、閾値を超える行数のテーブルの全件走査を検出する"""
+    report = AdvisorReport(threshold=settings.index_advisor_row_threshold if threshold is None else threshold)
+    if async_engine.dialect.name != "sqlite":
+        report.skipped = "EXPLAIN QUERY PLAN による診断はSQLiteのみ対応しています"
+        return report
+
+    captured: List[Tuple[str, str, Any]] = []
+    current = {"source": ""}
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not conn.info.get("index_advisor") or executemany:
+            return
+        if not statement.lstrip().upper().startswith(_IGNORED_PREFIXES):
+            captured.append((current["source"], statement, parameters))
+
+    sync_engine = async_engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        async with async_engine.connect() as conn:
+            # 書き込みを含むため、外側のトランザクションは必ずロールバックする
+            await conn.begin()
+            sample = await _sample_values(conn)
+            table_names = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+            table_rows = {}
+            for table in table_names:
+                result = await conn.exec_driver_sql(f'SELECT COUNT(*) FROM "{table}"')
+                table_rows[table] = result.scalar()
+
+            conn.sync_connection.info["index_advisor"] = True
+            try:
+                def run_sync_probes(sync_conn):
+                    for source, probe in _sync_probes(sample):
+                        current["source"] = source
+                        with Session(bind=sync_conn, join_transaction_mode="create_savepoint") as db:
+                            probe(db)
+
+                await conn.run_sync(run_sync_probes)
+
+                for source, probe in _async_probes(sample):
+                    current["source"] = source
+                    async with AsyncSession(bind=conn, join_transaction_mode="create_savepoint") as db:
+                        await probe(db)
+            finally:
+                conn.sync_connection.info.pop("index_advisor", None)
+
+            seen = set()
+            for source, statement, parameters in captured:
+                key = (source, statement)
+                if key in seen:
+                    continue
+                seen.add(key)
+                report.checked_statements += 1
+                plan = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                for row in plan.all():
+                    detail = row[-1]
+                    match = _FULL_SCAN.match(detail)
+                    if not match:
+                        continue
+                    table = match.group(1)
+                    rows = table_rows.get(table, 0)
+                    if rows > report.threshold:
+                        report.findings.append(ScanFinding(source, table, rows, detail, " ".join(statement.split())))
+            await conn.rollback()
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    for finding in report.findings:
+        logger.warning("Full table scan in %s on %s (%d rows): %s",
+                       finding.source, finding.table, finding.rows, finding.statement)
+    return report
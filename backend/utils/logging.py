@@ -1,12 +1,129 @@
 """
 Logging configuration and utilities.
+
+Records are put on a bounded in-memory queue by a QueueHandler and
+formatted/written by a QueueListener thread, so request handlers never
+block on log I/O. Output is one JSON object per line (settings.log_json)
+with any `extra` fields included.
+
+High-volume events are sampled per logger (settings.log_sample_rates,
+matched by logger-name prefix). Sampling applies to INFO and below; a
+sampled record carries its rate in the "sample_rate" field so counts can
+be scaled back up. Hot paths call log_sampled(), which decides before the
+LogRecord is even created.
 """
+import atexit
+import copy
+import json
 import logging
+import queue
+import random
 import sys
-from typing import Optional
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
 
 from config import settings
 
+# LogRecord 標準の属性（これ以外は extra としてJSONに含める）
+_RESERVED_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "color_message"}
+
+# uvicorn のロガー（JSON出力時はアプリケーションと同じハンドラーに集約）
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
+
+_listener: Optional[QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """ログレコードを1行のJSONに変換する"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LogSampler:
+    """ロガー名（前方一致）ごとの出力割合"""
+
+    def __init__(self, rates: Dict[str, float]):
+        self.rates = dict(rates)
+        self._resolved: Dict[str, float] = {}
+
+    def rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = 1.0
+            best = -1
+            for prefix, value in self.rates.items():
+                if (name == prefix or name.startswith(prefix + ".")) and len(prefix) > best:
+                    rate, best = value, len(prefix)
+            self._resolved[name] = rate
+        return rate
+
+
+sampler = LogSampler(settings.log_sample_rates)
+
+
+class SamplingFilter(logging.Filter):
+    """INFO以下のレコードをロガーごとの割合で間引く（log_sampled() で判定済みのものは通す）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or hasattr(record, "sample_rate"):
+            return True
+        rate = sampler.rate(record.name)
+        if rate >= 1.0:
+            return True
+        if random.random() < rate:
+            record.sample_rate = rate
+            return True
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """キューが満杯の場合はレコードを破棄する QueueHandler"""
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 同一プロセス内のキューなのでpickle用の整形は不要。
+        # 引数だけ確定させ、JSON化・例外の整形は出力スレッドで行う。
+        # 同じレコードを他のハンドラー・フィルターも参照するため、コピーを変更する
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def log_sampled(logger: logging.Logger, level: int, msg: str, *args, **fields) -> None:
+    """高頻度のイベントをサンプリングして出力する（対象外の場合はレコードを生成しない）"""
+    if not logger.isEnabledFor(level):
+        return
+    rate = sampler.rate(logger.name)
+    if rate < 1.0 and random.random() >= rate:
+        return
+    fields["sample_rate"] = rate
+    logger.log(level, msg, *args, extra=fields)
+
 
 def setup_logging(
     level: Optional[str] = None,
@@ -14,40 +131,77 @@ def setup_logging(
 ) -> logging.Logger:
     """
     Setup application logging configuration.
-    
+
     Args:
         level: Log level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
-        format_string: Custom log format string
-        
+        format_string: Custom log format string (used when settings.log_json is False)
+
     Returns:
         Configured logger instance
     """
-    log_level = level or settings.log_level
-    log_format = format_string or settings.log_format
-    
-    # Configure root logger
-    logging.basicConfig(
-        level=getattr(logging, log_level.upper()),
-        format=log_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
-    
+    global _listener
+
+    log_level = getattr(logging, (level or settings.log_level).upper())
+    if _listener is None:
+        if settings.log_json:
+            formatter = JSONFormatter()
+        else:
+            formatter = logging.Formatter(format_string or settings.log_format)
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(formatter)
+
+        log_queue: "queue.Queue" = queue.Queue(maxsize=settings.log_queue_size)
+        queue_handler = NonBlockingQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter())
+
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        if settings.log_json:
+            # uvicorn が設定した独自ハンドラーを外し、ルートロガー経由で出力する
+            for name in _UVICORN_LOGGERS:
+                uvicorn_logger = logging.getLogger(name)
+                uvicorn_logger.handlers.clear()
+                uvicorn_logger.propagate = True
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        # 終了時に出力待ちのレコードを書き出す
+        atexit.register(shutdown_logging)
+
+    logging.getLogger().setLevel(log_level)
+
     # Get application logger
     logger = logging.getLogger("url_shortener")
-    
+
     return logger
 
 
+def shutdown_logging() -> None:
+    """出力スレッドを停止する（キューに残ったレコードは書き出される）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    """キュー満杯で破棄されたレコード数"""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            return handler.dropped
+    return 0
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     Get a logger instance for a specific module.
-    
+
     Args:
         name: Logger name (usually __name__)
-        
+
     Returns:
         Logger instance
     """
-    return logging.getLogger(f"url_shortener.{name}") 
\ No newline at end of file
+    return logging.getLogger(f"url_shortener.{name}")
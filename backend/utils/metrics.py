@@ -0,0 +1,292 @@
+"""
+Prometheus-style metrics.
+
+A small in-process registry (counters, gauges, histograms) rendered in the
+Prometheus text exposition format, an ASGI middleware that records request
+count and latency per route template, and SQLAlchemy event hooks that
+count queries and query time per request.
+
+Metrics are per process; with several workers each one is scraped (or
+aggregated) separately.
+"""
+import contextvars
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# レイテンシ用のバケット（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# リクエストあたりのクエリ数用のバケット
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """バケット別の累積件数・合計・件数を持つヒストグラム"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベル値 → [バケット別件数..., 合計, 件数]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0.0
+            for index, bound in enumerate(self.buckets):
+                cumulative += state[index]
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+            labels = _format_labels(self.labelnames, key, ("le", "+Inf"))
+            yield f"{self.name}_bucket{labels} {_format_value(state[-1])}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(state[-2])}"
+            yield f"{self.name}_count{labels} {_format_value(state[-1])}"
+
+
+class CallbackMetric(_Metric):
+    """出力時に関数を呼んで値を取得するメトリクス（キャッシュやキューの状態用）"""
+
+    def __init__(self, name: str, documentation: str, type_name: str,
+                 callback: Callable[[], Iterable[Tuple[Dict[str, str], float]]], labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.type_name = type_name
+        self._callback = callback
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._callback():
+            yield f"{self.name}{_format_labels(self.labelnames, self._key(labels))} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """メトリクスの登録とテキスト形式での出力"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_callback(self, name: str, documentation: str,
+                       callback: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+                       labelnames: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, "gauge", callback, labelnames))
+
+    def counter_callback(self, name: str, documentation: str,
+                         callback: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+                         labelnames: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, "counter", callback, labelnames))
+
+    def render(self) -> str:
+        """Prometheusのテキスト形式で出力する"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# アプリケーション共通のレジストリ
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")
+)
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route")
+)
+db_queries_total = registry.counter(
+    "db_queries_total", "SQL statements executed, by route template.", ("route",)
+)
+db_query_duration_seconds = registry.histogram(
+    "db_query_duration_seconds", "SQL statement execution time.", ("route",)
+)
+db_queries_per_request = registry.histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request.", ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+db_time_per_request_seconds = registry.histogram(
+    "db_time_per_request_seconds", "Total SQL execution time per HTTP request.", ("method", "route")
+)
+
+
+# ルートに一致しないリクエスト（404など）のラベル。パスをそのまま使うとラベルが無制限に増える
+UNMATCHED_ROUTE = "unmatched"
+
+# リクエスト外（バックグラウンド処理など）のクエリのラベル
+BACKGROUND_ROUTE = "background"
+
+
+class RequestStats:
+    """リクエスト処理中のDBクエリ集計"""
+    __slots__ = ("scope", "queries", "query_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        """一致したルートのテンプレート（ルーティング前・不一致の場合は UNMATCHED_ROUTE）"""
+        return getattr(self.scope.get("route"), "path", None) or UNMATCHED_ROUTE
+
+
+# 処理中のリクエストの集計（リクエスト外のクエリではNone）
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "metrics_current_request", default=None
+)
+
+class MetricsMiddleware:
+    """ルートテンプレート別のリクエスト数・レイテンシ・DBクエリ数を記録するASGIミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route_path = stats.route
+            method = scope.get("method", "")
+            http_requests_total.inc(method=method, route=route_path, status=str(status_code))
+            http_request_duration_seconds.observe(elapsed, method=method, route=route_path)
+            db_queries_per_request.observe(stats.queries, method=method, route=route_path)
+            db_time_per_request_seconds.observe(stats.query_seconds, method=method, route=route_path)
+
+
+def instrument_engine(engine: Engine) -> None:
+    """エンジンにクエリ数・実行時間を記録するイベントを登録する（非同期エンジンは sync_engine を渡す）"""
+    if getattr(engine, "_metrics_instrumented", False):
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        stats = current_request.get()
+        route = stats.route if stats is not None else BACKGROUND_ROUTE
+        db_queries_total.inc(route=route)
+        db_query_duration_seconds.observe(elapsed, route=route)
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    engine._metrics_instrumented = True
@@ -0,0 +1,32 @@
+"""
+Packed IP address storage.
+
+Click IPs are stored as their binary form (4 bytes for IPv4, 16 for
+IPv6) instead of text. Values that are not IP addresses (e.g. the
+"unknown" placeholder used when the client address is missing) are
+stored as NULL. IPv6 addresses come back in compressed, lower-case form
+without a zone index.
+"""
+import ipaddress
+from typing import Optional
+
+
+def pack_ip(value: Optional[str]) -> Optional[bytes]:
+    """IPアドレスの文字列をバイト列にする（IPアドレスでない場合はNone）"""
+    if not value:
+        return None
+    try:
+        return ipaddress.ip_address(value).packed
+    except ValueError:
+        return None
+
+
+def unpack_ip(value: Optional[bytes]) -> Optional[str]:
+    """バイト列をIPアドレスの文字列に戻す"""
+    if value is None:
+        return None
+    address = ipaddress.ip_address(bytes(value))
+    # IPv4射影アドレスは元の表記（::ffff:192.0.2.1）に合わせる
+    if address.version == 6 and address.ipv4_mapped is not None:
+        return f"::ffff:{address.ipv4_mapped}"
+    return str(address)
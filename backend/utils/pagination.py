@@ -0,0 +1,55 @@
+"""
+Keyset (cursor) pagination utilities.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Tuple
+
+from sqlalchemy import String, tuple_, type_coerce
+
+
+def encode_cursor(timestamp: Any, row_id: int) -> str:
+    """(タイムスタンプ, ID) を不透明なカーソル文字列に変換する"""
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    payload = json.dumps([timestamp, row_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """カーソル文字列を (タイムスタンプ, ID) に戻す（不正な場合はValueError）"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError("invalid cursor") from e
+    if not isinstance(timestamp, str) or not isinstance(row_id, int):
+        raise ValueError("invalid cursor")
+    return timestamp, row_id
+
+
+def keyset_column(column, dialect_name: str):
+    """カーソルに使うタイムスタンプ列
+
+    SQLiteでは日時が文字列で格納され、格納形式（マイクロ秒の有無）が
+    行によって異なるため、格納値そのままで比較する。
+    """
+    if dialect_name == "sqlite":
+        return type_coerce(column, String)
+    return column
+
+
+def keyset_value(timestamp: str, dialect_name: str) -> Any:
+    """カーソルのタイムスタンプを比較用の値に変換する"""
+    if dialect_name == "sqlite":
+        return timestamp
+    return datetime.fromisoformat(timestamp)
+
+
+def keyset_before(column, id_column, cursor: str, dialect_name: str):
+    """降順ページングで、カーソル位置より後ろの行を選ぶ条件"""
+    timestamp, row_id = decode_cursor(cursor)
+    return tuple_(keyset_column(column, dialect_name), id_column) < tuple_(
+        keyset_value(timestamp, dialect_name), row_id
+    )
@@ -0,0 +1,98 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow (hundreds of milliseconds per call), so async
+handlers hand the work to a bounded thread pool. bcrypt releases the GIL
+while hashing, so threads run in parallel. Requests beyond the pool size
+wait in a bounded queue; when that is full the call is rejected instead of
+piling up.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+
+class PasswordHashingBusy(RuntimeError):
+    """ハッシュ処理の待ち行列が上限に達した"""
+
+
+class PasswordHasher:
+    """bcryptのハッシュ化・検証をスレッドプールで実行する"""
+
+    def __init__(self, context: CryptContext, max_workers: int, max_queue: int):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.hash_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """実行待ちの件数"""
+        return self._pending - self._running
+
+    async def _submit(self, func: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHashingBusy("password hashing queue is full")
+            self._pending += 1
+        enqueued_at = time.perf_counter()
+
+        def run() -> Any:
+            started_at = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self.wait_seconds += started_at - enqueued_at
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+                    self.hash_seconds += time.perf_counter() - started_at
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, run)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        """パスワードをハッシュ化する"""
+        return await self._submit(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """パスワードを検証する"""
+        return await self._submit(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """パスワードを検証し、設定（ラウンド数など）が古いハッシュの場合は新しいハッシュも返す"""
+        return await self._submit(self.context.verify_and_update, password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        """処理状況の統計を取得する"""
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._running,
+            "queue_depth": self.queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": self.wait_seconds / self.completed * 1000 if self.completed else 0.0,
+            "avg_hash_ms": self.hash_seconds / self.completed * 1000 if self.completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        """スレッドプールを停止する"""
+        self._executor.shutdown(wait=True)
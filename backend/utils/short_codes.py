@@ -0,0 +1,172 @@
+"""
+Short code generation strategies.
+
+- random:  secrets-based random codes; uniqueness is enforced by the
+           database constraint and the caller retries on conflict.
+- counter: a block-allocated counter passed through a keyed Feistel
+           permutation and base62-encoded. Codes are unique and
+           non-sequential without any lookup per code.
+- pool:    codes taken in batches from a pre-generated reserved pool.
+"""
+import hashlib
+import hmac
+import secrets
+import string
+import threading
+from typing import Callable, List, Optional
+
+# 短縮コードに使用する文字（62種）
+ALPHABET = string.ascii_letters + string.digits
+BASE = len(ALPHABET)
+
+# URL.short_code の列長
+MAX_CODE_LENGTH = 16
+
+
+def generate_random_code(length: int) -> str:
+    """ランダムな短縮コードを生成する"""
+    return ''.join(secrets.choice(ALPHABET) for _ in range(length))
+
+
+def encode_base62(value: int, length: int) -> str:
+    """整数を固定長のbase62文字列に変換する"""
+    chars = []
+    for _ in range(length):
+        value, remainder = divmod(value, BASE)
+        chars.append(ALPHABET[remainder])
+    if value:
+        raise ValueError("value does not fit in the requested length")
+    return ''.join(reversed(chars))
+
+
+class FeistelPermutation:
+    """[0, domain) 上の鍵付き全単射（Feistel構造 + cycle walking）"""
+
+    def __init__(self, key: bytes, domain: int, rounds: int = 4):
+        self.domain = domain
+        self.rounds = rounds
+        self._key = key
+        bits = max((domain - 1).bit_length(), 2)
+        self._half_bits = (bits + 1) // 2
+        self._mask = (1 << self._half_bits) - 1
+
+    def _round(self, round_index: int, value: int) -> int:
+        digest = hmac.new(
+            self._key, round_index.to_bytes(1, "big") + value.to_bytes(8, "big"), hashlib.sha256
+        ).digest()
+        return int.from_bytes(digest[:8], "big") & self._mask
+
+    def _encrypt_block(self, value: int) -> int:
+        left, right = value >> self._half_bits, value & self._mask
+        for round_index in range(self.rounds):
+            left, right = right, left ^ self._round(round_index, right)
+        return (left << self._half_bits) | right
+
+    def permute(self, value: int) -> int:
+        """値を置換する（結果も [0, domain) に収まるまで繰り返す）"""
+        if not 0 <= value < self.domain:
+            raise ValueError("value out of domain")
+        value = self._encrypt_block(value)
+        while value >= self.domain:
+            value = self._encrypt_block(value)
+        return value
+
+
+class ShortCodeGenerator:
+    """短縮コード生成器の基底クラス"""
+
+    # コード払い出し時にデータベースアクセスが発生しうるか
+    uses_database = False
+
+    def __init__(self, length: int):
+        if not 1 <= length <= MAX_CODE_LENGTH:
+            raise ValueError(f"short code length must be between 1 and {MAX_CODE_LENGTH}")
+        self.length = length
+
+    def next_codes(self, count: int) -> List[str]:
+        raise NotImplementedError
+
+    def next_code(self) -> str:
+        return self.next_codes(1)[0]
+
+
+class RandomCodeGenerator(ShortCodeGenerator):
+    """ランダム生成（衝突時は呼び出し側で再試行）"""
+
+    def next_codes(self, count: int) -> List[str]:
+        return [generate_random_code(self.length) for _ in range(count)]
+
+
+class CounterCodeGenerator(ShortCodeGenerator):
+    """ブロック割り当てカウンター + Feistel置換による生成"""
+
+    uses_database = True
+
+    def __init__(self, length: int, key: bytes, block_size: int,
+                 allocate_block: Callable[[int], int]):
+        super().__init__(length)
+        self.block_size = block_size
+        self._permutation = FeistelPermutation(key, BASE ** length)
+        self._allocate_block = allocate_block
+        self._next = 0
+        self._end = 0
+        self._lock = threading.Lock()
+
+    def next_codes(self, count: int) -> List[str]:
+        codes = []
+        with self._lock:
+            while len(codes) < count:
+                if self._next >= self._end:
+                    size = max(self.block_size, count - len(codes))
+                    self._next = self._allocate_block(size)
+                    self._end = self._next + size
+                    if self._end > self._permutation.domain:
+                        raise RuntimeError("short code keyspace exhausted")
+                take = min(count - len(codes), self._end - self._next)
+                codes.extend(
+                    encode_base62(self._permutation.permute(value), self.length)
+                    for value in range(self._next, self._next + take)
+                )
+                self._next += take
+        return codes
+
+
+class PoolCodeGenerator(ShortCodeGenerator):
+    """事前生成した予約コードのプールから払い出す"""
+
+    uses_database = True
+
+    def __init__(self, length: int, batch_size: int, take_codes: Callable[[int], List[str]]):
+        super().__init__(length)
+        self.batch_size = batch_size
+        self._take_codes = take_codes
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+
+    def next_codes(self, count: int) -> List[str]:
+        with self._lock:
+            if len(self._buffer) < count:
+                needed = max(self.batch_size, count - len(self._buffer))
+                self._buffer.extend(self._take_codes(needed))
+                if len(self._buffer) < count:
+                    raise RuntimeError("reserved short code pool is exhausted")
+            codes, self._buffer = self._buffer[:count], self._buffer[count:]
+        return codes
+
+
+def build_short_code_generator(
+    strategy: str,
+    length: int,
+    key: bytes,
+    block_size: int,
+    allocate_block: Optional[Callable[[int], int]] = None,
+    take_codes: Optional[Callable[[int], List[str]]] = None,
+) -> ShortCodeGenerator:
+    """設定に応じた短縮コード生成器を作成する"""
+    if strategy == "random":
+        return RandomCodeGenerator(length)
+    if strategy == "counter":
+        return CounterCodeGenerator(length, key, block_size, allocate_block)
+    if strategy == "pool":
+        return PoolCodeGenerator(length, block_size, take_codes)
+    raise ValueError(f"unknown short code strategy: {strategy}")
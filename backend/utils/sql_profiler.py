@@ -0,0 +1,226 @@
+"""
+Per-request SQL profiler.
+
+When a request is profiled (settings.sql_profiler_enabled, the sampling
+rate, or an X-SQL-Profile request header), every SQL statement it issues
+is recorded with its timing. Statements are grouped by shape (the SQL
+text with literals and IN-list lengths normalized); a shape executed many
+times in one request is reported as a likely N+1, and statements over the
+slow threshold are reported individually.
+
+A one-line summary is returned in the X-SQL-Profile response header and
+the full profile is kept in a bounded in-memory history, referenced by the
+X-SQL-Profile-Id header.
+
+Requests that are not profiled pay one contextvar lookup per statement.
+"""
+import contextvars
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# プロファイル要求・結果のヘッダー
+PROFILE_HEADER = "x-sql-profile"
+PROFILE_ID_HEADER = "x-sql-profile-id"
+
+_IN_LIST = re.compile(r"\bIN \((?:\s*\?\s*,)+\s*\?\s*\)", re.IGNORECASE)
+_NUMBER = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL文を形（リテラル・IN句の要素数を正規化した文字列）に変換する"""
+    shape = _SPACES.sub(" ", statement).strip()
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _IN_LIST.sub("IN (?)", shape)
+
+
+class RequestProfile:
+    """1リクエスト分のSQL実行記録"""
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.route = ""
+        self.status_code = 0
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.statements: List[Dict[str, Any]] = []
+
+    def record(self, statement: str, elapsed: float, executemany: bool) -> None:
+        self.statements.append({
+            "shape": statement_shape(statement),
+            "ms": elapsed * 1000,
+            "executemany": executemany,
+        })
+
+    @property
+    def total_ms(self) -> float:
+        return sum(entry["ms"] for entry in self.statements)
+
+    def repeated(self) -> List[Dict[str, Any]]:
+        """同じ形のSQLが閾値以上繰り返されたもの（N+1の疑い）"""
+        counts = Counter(entry["shape"] for entry in self.statements)
+        return [
+            {"statement": shape, "count": count}
+            for shape, count in counts.most_common()
+            if count >= settings.sql_profiler_repeat_threshold
+        ]
+
+    def slow(self) -> List[Dict[str, Any]]:
+        """閾値を超えたSQL"""
+        return [
+            {"statement": entry["shape"], "ms": round(entry["ms"], 3)}
+            for entry in self.statements
+            if entry["ms"] >= settings.sql_profiler_slow_ms
+        ]
+
+    def header_value(self) -> str:
+        """レスポンスヘッダー用の要約"""
+        return (
+            f"queries={len(self.statements)}; total_ms={self.total_ms:.3f}; "
+            f"repeated={len(self.repeated())}; slow={len(self.slow())}"
+        )
+
+    def to_dict(self, include_statements: bool = True) -> Dict[str, Any]:
+        data = {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 3),
+            "queries": len(self.statements),
+            "total_ms": round(self.total_ms, 3),
+            "repeated": self.repeated(),
+            "slow": self.slow(),
+        }
+        if include_statements:
+            data["statements"] = [
+                {**entry, "ms": round(entry["ms"], 3)} for entry in self.statements
+            ]
+        return data
+
+
+class ProfileHistory:
+    """直近のプロファイル結果（件数上限付き）"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.maxsize:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def recent(self, limit: int) -> List[RequestProfile]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return list(reversed(profiles[-limit:]))
+
+
+profile_history = ProfileHistory(settings.sql_profiler_history_size)
+
+# プロファイル中のリクエスト（対象外の場合はNone）
+current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "sql_profiler_current_profile", default=None
+)
+
+
+def _should_profile(scope) -> bool:
+    if settings.sql_profiler_enabled:
+        return True
+    if settings.sql_profiler_allow_header or settings.debug:
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER.encode() and value.strip().lower() in (b"1", b"true", b"on"):
+                return True
+    rate = settings.sql_profiler_sample_rate
+    return rate > 0 and random.random() < rate
+
+
+class SQLProfilerMiddleware:
+    """対象リクエストのSQLを記録し、要約をレスポンスヘッダーに付けるASGIミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope.get("method", ""), scope.get("path", ""))
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                # ストリーミングレスポンスでは送信開始までのSQLが対象
+                profile.status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_HEADER.encode(), profile.header_value().encode()))
+                headers.append((PROFILE_ID_HEADER.encode(), profile.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            profile.route = getattr(scope.get("route"), "path", "")
+            profile_history.add(profile)
+            repeated, slow = profile.repeated(), profile.slow()
+            if repeated or slow:
+                logger.warning(
+                    "SQL profile %s %s: %d queries in %.1f ms, repeated=%s, slow=%s (profile id %s)",
+                    profile.method, profile.path, len(profile.statements), profile.total_ms,
+                    [(item["count"], item["statement"][:120]) for item in repeated],
+                    [(item["ms"], item["statement"][:120]) for item in slow],
+                    profile.id,
+                )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """エンジンにSQL記録用のイベントを登録する（非同期エンジンは sync_engine を渡す）"""
+    if getattr(engine, "_sql_profiler_instrumented", False):
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and current_profile.get() is not None:
+            context._sql_profiler_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_sql_profiler_start", None)
+        if started is None:
+            return
+        profile = current_profile.get()
+        if profile is not None:
+            profile.record(statement, time.perf_counter() - started, executemany)
+
+    engine._sql_profiler_instrumented = True
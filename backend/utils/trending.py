@@ -0,0 +1,329 @@
+"""
+Trending links over sliding time windows.
+
+The click ingestor feeds every flushed batch into per-window Space-Saving
+summaries (Metwally et al.), which track the most-clicked URLs in bounded
+memory: each summary keeps at most `capacity` counters, and a counter's
+value overestimates the true count by at most its recorded error. A
+window is split into fixed slots, each with its own summary; slots that
+fall out of the window are dropped, so a window is exact to one slot
+(30 s for 5m, 5 min for 1h, 1 h for 24h).
+
+Summaries (slots, and the same slot from several workers) are merged
+with the mergeable Space-Saving rule: a full summary that does not track
+a key contributes its smallest counter to that key's count and error,
+since the key can have occurred at most that often there. The merged
+count therefore never falls below the true count, and count - error
+never rises above it.
+
+Each worker only sees the clicks it served, so workers periodically write
+their summaries to trending_checkpoints. The trending endpoint merges the
+local summaries with the other workers' recent checkpoints, and a worker
+that starts up adopts checkpoints left behind by workers that stopped
+(released at shutdown, or not refreshed for a few intervals after a
+crash), so a restart does not lose the current windows.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, or_, select, update
+
+from config import settings
+from database import async_engine
+from models import TrendingCheckpoint
+
+logger = logging.getLogger(__name__)
+
+# 時間窓名 → (窓の秒数, スロット数)
+WINDOWS = {
+    "5m": (300, 10),
+    "1h": (3600, 12),
+    "24h": (86400, 24),
+}
+
+# (url_id, クリック数の推定値, 推定値の誤差の上限)
+TrendingItem = Tuple[int, int, int]
+
+
+def _epoch(value: datetime) -> float:
+    """タイムゾーンなしUTCの日時をUNIX時刻にする"""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+class SpaceSaving:
+    """Space-Saving による頻出要素の近似カウント（重み付き）"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[int, int] = {}
+        self.errors: Dict[int, int] = {}
+        # (件数, キー) の最小ヒープ。件数が古いエントリは取り出し時に読み飛ばす
+        self._heap: List[Tuple[int, int]] = []
+
+    def add(self, key: int, weight: int = 1) -> None:
+        count = self.counts.get(key)
+        if count is not None:
+            count += weight
+        elif len(self.counts) < self.capacity:
+            count = weight
+            self.errors[key] = 0
+        else:
+            # 最小の要素を置き換え、その件数を誤差として引き継ぐ
+            floor, victim = self._pop_min()
+            del self.counts[victim]
+            del self.errors[victim]
+            count = floor + weight
+            self.errors[key] = floor
+        self.counts[key] = count
+        heapq.heappush(self._heap, (count, key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[int, int]:
+        while True:
+            count, key = heapq.heappop(self._heap)
+            # 件数は増える一方のため、一致しないエントリは古い
+            if self.counts.get(key) == count:
+                return count, key
+
+    def items(self) -> List[TrendingItem]:
+        return [(key, count, self.errors[key]) for key, count in self.counts.items()]
+
+    @classmethod
+    def from_items(cls, capacity: int, items: Iterable[TrendingItem]) -> "SpaceSaving":
+        """(キー, 件数, 誤差) から復元する（容量を超える分は件数の少ない順に捨てる）
+
+        items のキーは重複しないこと（複数の集計は merge_items で合算する）。
+        """
+        summary = cls(capacity)
+        for key, count, error in sorted(items, key=lambda item: item[1], reverse=True)[:capacity]:
+            summary.counts[key] = count
+            summary.errors[key] = error
+        summary._heap = [(count, key) for key, count in summary.counts.items()]
+        heapq.heapify(summary._heap)
+        return summary
+
+
+def merge_items(summaries: Iterable[Sequence[TrendingItem]], capacity: int) -> List[TrendingItem]:
+    """複数の集計の (キー, 件数, 誤差) を合算する（件数の多い順）
+
+    集計に含まれないキーには、その集計が満杯であれば最小の件数を件数・誤差の両方に加える
+    （追い出された要素の件数は最小の件数以下のため）。満杯でない集計は何も追い出していない。
+    """
+    counts: Counter = Counter()
+    errors: Counter = Counter()
+    total_floor = 0
+    for items in summaries:
+        floor = min(item[1] for item in items) if len(items) >= capacity else 0
+        total_floor += floor
+        # 全キーに floor を加えておき、含まれるキーは floor の代わりに件数を加える
+        for key, count, error in items:
+            counts[key] += count - floor
+            errors[key] += error - floor
+    return [
+        (key, count + total_floor, errors[key] + total_floor)
+        for key, count in counts.most_common()
+    ]
+
+
+class SlidingTopK:
+    """時間窓をスロットに分け、スロットごとの Space-Saving で上位を追跡する"""
+
+    def __init__(self, window_seconds: int, slots: int, capacity: int):
+        self.slot_seconds = window_seconds / slots
+        self.slots = slots
+        self.capacity = capacity
+        self.summaries: Dict[int, SpaceSaving] = {}
+
+    def slot_index(self, timestamp: float) -> int:
+        return int(timestamp // self.slot_seconds)
+
+    def add(self, index: int, key: int, weight: int = 1) -> None:
+        """スロット index に加算する"""
+        summary = self.summaries.get(index)
+        if summary is None:
+            summary = self.summaries[index] = SpaceSaving(self.capacity)
+        summary.add(key, weight)
+
+    def oldest_slot(self, now: float) -> int:
+        return self.slot_index(now) - self.slots + 1
+
+    def prune(self, now: float) -> None:
+        """時間窓から外れたスロットを捨てる"""
+        oldest = self.oldest_slot(now)
+        for index in [index for index in self.summaries if index < oldest]:
+            del self.summaries[index]
+
+    def snapshot(self) -> Dict[str, List[TrendingItem]]:
+        return {str(index): summary.items() for index, summary in self.summaries.items()}
+
+    def restore(self, snapshot: Dict[str, List[TrendingItem]]) -> None:
+        """チェックポイントのスロットを取り込む（同じスロットは合算）"""
+        for index, items in snapshot.items():
+            index = int(index)
+            items = [tuple(item) for item in items]
+            existing = self.summaries.get(index)
+            if existing is not None:
+                items = merge_items([existing.items(), items], self.capacity)
+            self.summaries[index] = SpaceSaving.from_items(self.capacity, items)
+
+
+class TrendingTracker:
+    """時間窓ごとのクリック上位URL（スレッドセーフ）"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.windows = {name: SlidingTopK(seconds, slots, capacity) for name, (seconds, slots) in WINDOWS.items()}
+        self._lock = threading.Lock()
+
+    def record(self, clicks: Sequence[tuple]) -> None:
+        """クリック (url_id, clicked_at, ...) を加算する"""
+        timestamps = [(record[0], _epoch(record[1])) for record in clicks]
+        now = time.time()
+        with self._lock:
+            for window in self.windows.values():
+                window.prune(now)
+                # 同じスロットの同じURLはまとめて加算する
+                weights = Counter((url_id, window.slot_index(ts)) for url_id, ts in timestamps)
+                for (url_id, index), weight in weights.items():
+                    window.add(index, url_id, weight)
+
+    def top(self, window: str, limit: int, peers: Sequence[dict] = (), now: Optional[float] = None) -> List[TrendingItem]:
+        """時間窓内のクリック上位（peers は他のワーカーのスナップショット。集計の容量は全ワーカーで共通）"""
+        now = time.time() if now is None else now
+        with self._lock:
+            tracker = self.windows[window]
+            tracker.prune(now)
+            summaries = [summary.items() for summary in tracker.summaries.values()]
+        oldest = tracker.oldest_slot(now)
+        for peer in peers:
+            for index, slot_items in peer.get(window, {}).items():
+                if int(index) >= oldest and slot_items:
+                    summaries.append(slot_items)
+        return merge_items(summaries, self.capacity)[:limit]
+
+    def snapshot(self, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        with self._lock:
+            for window in self.windows.values():
+                window.prune(now)
+            return {name: window.snapshot() for name, window in self.windows.items()}
+
+    def restore(self, snapshot: dict) -> None:
+        with self._lock:
+            for name, window in self.windows.items():
+                window.restore(snapshot.get(name, {}))
+
+
+def encode_snapshot(snapshot: dict) -> bytes:
+    return zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode())
+
+
+def decode_snapshot(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data))
+
+
+class TrendingCheckpointer:
+    """集計状態を定期的に trending_checkpoints に保存し、他のワーカーの状態を読む"""
+
+    def __init__(self, tracker: TrendingTracker, interval: float):
+        self.tracker = tracker
+        self.interval = interval
+        # 再起動のたびに新しいIDを使う（停止したワーカーの行は起動時に引き継ぐ）
+        self.worker_id = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _stale_before(self) -> datetime:
+        """この時刻より前に保存された行の持ち主は停止したとみなす"""
+        return datetime.utcnow() - timedelta(seconds=self.interval * 3)
+
+    async def start(self) -> None:
+        """停止したワーカーの状態を引き継いでから定期保存を開始する"""
+        if self.running or self.interval <= 0:
+            return
+        adopted = await self.adopt()
+        self._task = asyncio.create_task(self._run(), name="trending-checkpointer")
+        logger.info("Trending checkpointer started (interval=%.1fs, adopted=%d)", self.interval, adopted)
+
+    async def stop(self) -> None:
+        """定期保存を止め、最終状態を引き継ぎ可能として保存する"""
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await self.save(released=True)
+        except Exception:
+            logger.exception("Failed to save trending checkpoint")
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to save trending checkpoint")
+
+    async def save(self, released: bool = False) -> None:
+        data = encode_snapshot(self.tracker.snapshot())
+        table = TrendingCheckpoint.__table__
+        values = {"state": data, "saved_at": datetime.utcnow(), "released": released}
+        async with async_engine.begin() as conn:
+            result = await conn.execute(update(table).where(table.c.worker_id == self.worker_id).values(**values))
+            if result.rowcount == 0:
+                await conn.execute(table.insert().values(worker_id=self.worker_id, **values))
+
+    async def adopt(self) -> int:
+        """停止したワーカーの行を削除して状態を取り込む（同時に起動したワーカーとは削除できた方が取り込む）"""
+        table = TrendingCheckpoint.__table__
+        orphaned = or_(table.c.released.is_(True), table.c.saved_at < self._stale_before())
+        async with async_engine.connect() as conn:
+            rows = (await conn.execute(select(table.c.worker_id, table.c.state).where(orphaned))).all()
+        adopted = 0
+        for worker_id, data in rows:
+            async with async_engine.begin() as conn:
+                result = await conn.execute(delete(table).where(table.c.worker_id == worker_id, orphaned))
+            if result.rowcount == 1:
+                self.tracker.restore(decode_snapshot(data))
+                adopted += 1
+        return adopted
+
+    async def peer_snapshots(self) -> List[dict]:
+        """稼働中の他のワーカーの最新の状態"""
+        if self.interval <= 0:
+            return []
+        table = TrendingCheckpoint.__table__
+        async with async_engine.connect() as conn:
+            rows = (await conn.execute(
+                select(table.c.state).where(
+                    table.c.worker_id != self.worker_id,
+                    table.c.released.is_(False),
+                    table.c.saved_at >= self._stale_before(),
+                )
+            )).all()
+        return [decode_snapshot(data) for data, in rows]
+
+
+# アプリケーション共通のインスタンス
+trending_tracker = TrendingTracker(capacity=settings.trending_capacity)
+trending_checkpointer = TrendingCheckpointer(trending_tracker, interval=settings.trending_checkpoint_interval)
@@ -8,6 +8,7 @@ export interface URLResponse {
   short_code: string;
   original_url: string;
   click_count: number;
+  redirect_policy: 'tracked' | 'permanent';
   created_at: string;
   updated_at: string;
 }